@@ -0,0 +1,5 @@
+# Benchmarks for Dialogix
+"""
+Micro-benchmarks for the NLP hot path, with a fixed synthetic corpus and a
+stored baseline to compare against.
+"""
@@ -0,0 +1,77 @@
+"""
+Fixed synthetic corpus for the NLP benchmarks.
+
+Texts are generated from a seeded random generator, so every run and every
+machine benchmarks exactly the same input. The sentences mix chat phrasing,
+sentiment words, intent keywords and capitalized names, places, organizations
+and dates, which gives VADER, the intent matcher, spaCy's NER and the
+summarizer realistic work at every size.
+"""
+import random
+from typing import Dict, List
+
+# Target size in characters of each corpus entry
+SIZES = {
+    "message": 80,
+    "paragraph": 1_000,
+    "document": 64_000,
+    "large": 1_000_000,
+    "huge": 4_000_000,
+}
+
+_PEOPLE = ["Alice Johnson", "Captain Morgan", "Dr. Watson", "Maria Garcia", "Kenji Tanaka", "Olivia Brown"]
+_PLACES = ["London", "Paris", "Tokyo", "the Pacific Ocean", "New York", "Lisbon", "Mount Everest"]
+_ORGS = ["Google", "the United Nations", "Oxford University", "Microsoft", "the Royal Navy"]
+_DATES = ["on Monday", "in March 2021", "last summer", "on 4 July 1776", "next week", "in 1999"]
+_SUBJECTS = ["the report", "my code", "this recipe", "the meeting", "our journey", "the experiment"]
+_VERBS = ["explains", "describes", "questions", "changes", "improves", "ignores", "celebrates"]
+_OBJECTS = ["the results", "a new idea", "the old map", "the budget", "the storm", "every detail"]
+_MOODS = ["I love it", "this is terrible", "I'm not sure", "that was wonderful", "I feel confused",
+          "this is great news", "I hate waiting", "it seems fine"]
+_OPENERS = ["Hello", "Thanks", "Can you help", "Could you explain", "Please tell me", "I think",
+            "What do you mean", "Goodbye"]
+
+
+def _cap(text: str) -> str:
+    return text[0].upper() + text[1:]
+
+
+def _sentence(rng: random.Random) -> str:
+    kind = rng.random()
+    if kind < 0.25:
+        return f"{rng.choice(_PEOPLE)} met {rng.choice(_PEOPLE)} in {rng.choice(_PLACES)} {rng.choice(_DATES)}."
+    if kind < 0.45:
+        return f"{_cap(rng.choice(_ORGS))} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)} {rng.choice(_DATES)}."
+    if kind < 0.7:
+        return f"{_cap(rng.choice(_SUBJECTS))} {rng.choice(_VERBS)} {rng.choice(_OBJECTS)}, and {rng.choice(_MOODS)}."
+    if kind < 0.85:
+        return f"{rng.choice(_OPENERS)}, why does {rng.choice(_SUBJECTS)} matter to {rng.choice(_PEOPLE)}?"
+    return f"{_cap(rng.choice(_MOODS))}!"
+
+
+def generate_text(size: int, seed: int = 0) -> str:
+    """Roughly ``size`` characters of paragraphs of synthetic sentences."""
+    rng = random.Random(seed)
+    paragraphs: List[str] = []
+    length = 0
+    while length < size:
+        sentences = [_sentence(rng) for _ in range(rng.randint(3, 8))]
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 2
+    return "\n\n".join(paragraphs)[:max(size, 1)].rstrip()
+
+
+def generate_message(seed: int = 0) -> str:
+    """A short chat message."""
+    rng = random.Random(seed)
+    return f"{rng.choice(_OPENERS)}, {rng.choice(_MOODS)} about {rng.choice(_SUBJECTS)} in {rng.choice(_PLACES)}?"
+
+
+def build_corpus(seed: int = 0) -> Dict[str, str]:
+    """One text per entry of SIZES, the same for a given seed."""
+    corpus = {"message": generate_message(seed)}
+    for name, size in SIZES.items():
+        if name != "message":
+            corpus[name] = generate_text(size, seed)
+    return corpus
@@ -0,0 +1,215 @@
+"""
+Micro-benchmarks for ``nlp_utils.text_analysis``.
+
+Each function is timed on the corpus sizes it sees in production, from a
+short chat message to multi-megabyte documents for the summarizer. For every
+case the report gives latency (mean, p50, p95), throughput in calls and
+megabytes per second, and the peak Python heap allocated during one call as
+measured by ``tracemalloc`` in a separate, untimed run. Native allocations
+inside spaCy or NumPy are not included in that figure.
+
+The analysis cache is disabled unless ``NLP_CACHE_BACKEND`` is set, so every
+call does the full work. Results can be saved as a baseline and later runs
+compared against it; the run fails when a case got slower or allocates more
+than the tolerance allows.
+
+No baseline ships with the repository: timings are only comparable on the
+same machine and Python version, so each deploy target records its own. The
+baseline file stores the Python version, architecture and platform it was
+recorded on, and ``--compare`` warns when they differ from the current run.
+Run from the repository root, first once on the target machine, then before
+every deploy::
+
+    python -m backend.benchmarks.nlp_bench --save-baseline
+    python -m backend.benchmarks.nlp_bench --compare
+"""
+import os
+
+# Must be set before the analysis cache is created on import
+os.environ.setdefault("NLP_CACHE_BACKEND", "none")
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+from backend.benchmarks.corpus import SIZES, build_corpus
+from backend.nlp_utils import text_analysis
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# Function name -> corpus entries it is benchmarked on
+CASES = {
+    "analyze_sentiment": ["message", "paragraph", "document"],
+    "identify_intent": ["message", "paragraph", "document", "large"],
+    "extract_entities": ["message", "paragraph", "document"],
+    "analyze_message": ["message", "paragraph", "document"],
+    "summarize_text": ["paragraph", "document", "large", "huge"],
+}
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def _uncached(name: str) -> Callable[[str], Any]:
+    func = getattr(text_analysis, name)
+    return getattr(func, "__wrapped__", func)
+
+
+def bench_case(func: Callable[[str], Any], text: str, min_rounds: int = 3,
+               min_time: float = 1.0, max_rounds: int = 10_000) -> Dict[str, Any]:
+    """Time ``func(text)`` for at least ``min_rounds`` calls and ``min_time`` seconds."""
+    func(text)  # warm-up, also loads any model the function needs
+
+    timings: List[float] = []
+    started = time.perf_counter()
+    while len(timings) < max_rounds and (len(timings) < min_rounds or time.perf_counter() - started < min_time):
+        t0 = time.perf_counter()
+        func(text)
+        timings.append(time.perf_counter() - t0)
+
+    tracemalloc.start()
+    try:
+        func(text)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    mean = sum(timings) / len(timings)
+    size = len(text.encode("utf-8"))
+    return {
+        "size_bytes": size,
+        "rounds": len(timings),
+        "mean_ms": mean * 1000,
+        "p50_ms": _percentile(timings, 50) * 1000,
+        "p95_ms": _percentile(timings, 95) * 1000,
+        "min_ms": min(timings) * 1000,
+        "calls_per_s": 1 / mean if mean else 0.0,
+        "mb_per_s": size / mean / 1e6 if mean else 0.0,
+        "peak_memory_bytes": peak,
+    }
+
+
+def run_benchmarks(functions: Optional[List[str]] = None, sizes: Optional[List[str]] = None,
+                   min_time: float = 1.0, seed: int = 0) -> Dict[str, Any]:
+    corpus = build_corpus(seed)
+    cases: Dict[str, Any] = {}
+    for name, case_sizes in CASES.items():
+        if functions and name not in functions:
+            continue
+        func = _uncached(name)
+        for size in case_sizes:
+            if sizes and size not in sizes:
+                continue
+            case = f"{name}[{size}]"
+            try:
+                cases[case] = bench_case(func, corpus[size], min_time=min_time)
+            except Exception as e:
+                # NLTK wraps its messages in banner lines, so keep the first line with words
+                message = next((line.strip() for line in str(e).splitlines() if any(c.isalpha() for c in line)), "")
+                cases[case] = {"error": f"{type(e).__name__}: {message}"}
+            print(format_case(case, cases[case]), file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+            "seed": seed,
+        },
+        "cases": cases,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2,
+            memory_tolerance: float = 0.2, min_delta_ms: float = 0.05) -> List[str]:
+    """
+    Regressions of ``results`` against ``baseline``: cases whose p50 latency or
+    peak memory grew by more than the tolerance (a fraction of the baseline),
+    and cases that now fail. Latency changes under ``min_delta_ms`` are noise.
+    """
+    regressions = []
+    for case, base in baseline.get("cases", {}).items():
+        current = results["cases"].get(case)
+        if current is None or "error" in base:
+            continue
+        if "error" in current:
+            regressions.append(f"{case}: now fails ({current['error']})")
+            continue
+        limit = base["p50_ms"] * (1 + tolerance)
+        if current["p50_ms"] > limit and current["p50_ms"] - base["p50_ms"] > min_delta_ms:
+            regressions.append(
+                f"{case}: p50 {current['p50_ms']:.3f} ms vs {base['p50_ms']:.3f} ms baseline"
+            )
+        if current["peak_memory_bytes"] > base["peak_memory_bytes"] * (1 + memory_tolerance):
+            regressions.append(
+                f"{case}: peak memory {current['peak_memory_bytes']} B vs {base['peak_memory_bytes']} B baseline"
+            )
+    return regressions
+
+
+def format_case(case: str, stats: Dict[str, Any]) -> str:
+    if "error" in stats:
+        return f"{case:<32} error: {stats['error']}"
+    return (
+        f"{case:<32}{stats['p50_ms']:>11.3f} ms p50{stats['p95_ms']:>11.3f} ms p95"
+        f"{stats['calls_per_s']:>11.1f} calls/s{stats['mb_per_s']:>9.2f} MB/s"
+        f"{stats['peak_memory_bytes'] / 1024:>10.0f} KiB peak"
+    )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the NLP functions on a fixed corpus.")
+    parser.add_argument("--function", action="append", choices=sorted(CASES),
+                        help="only benchmark this function (repeatable)")
+    parser.add_argument("--size", action="append", choices=list(SIZES),
+                        help="only benchmark this corpus size (repeatable)")
+    parser.add_argument("--min-time", type=float, default=1.0, help="seconds to time each case for")
+    parser.add_argument("--seed", type=int, default=0, help="corpus seed")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--compare", action="store_true", help="fail if a case regressed against the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p50 slowdown, as a fraction")
+    parser.add_argument("--memory-tolerance", type=float, default=0.2, help="allowed peak memory growth, as a fraction")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except FileNotFoundError:
+            print(f"No baseline at {args.baseline}; record one on this machine first with "
+                  "python -m backend.benchmarks.nlp_bench --save-baseline", file=sys.stderr)
+            return 2
+
+    results = run_benchmarks(args.function, args.size, args.min_time, args.seed)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline written to {args.baseline}")
+    if baseline is not None:
+        recorded = baseline.get("meta", {})
+        for key in ("python", "machine", "platform"):
+            if recorded.get(key) != results["meta"][key]:
+                print(f"Warning: the baseline was recorded with {key} {recorded.get(key)}, "
+                      f"this run uses {results['meta'][key]}; timings may not be comparable", file=sys.stderr)
+        regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print("No regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,15 +1,34 @@
-from pydantic import BaseModel
-from typing import List, Optional, Dict, Any
+import os
 
-class Message(BaseModel):
+from pydantic import BaseModel, Field
+from typing import List, Optional, Dict
+
+from typing_extensions import Annotated, NotRequired, TypedDict
+
+from .nlp_utils.schema import Analysis, Entity
+
+# A TypedDict rather than a model: long histories are validated as plain
+# dictionaries without creating an object per message
+class Message(TypedDict):
     sender: str  # "user" or "ai"
     message: str
-    timestamp: Optional[str] = None
+    timestamp: NotRequired[Optional[str]]
 
 class ChatRequest(BaseModel):
     user_message: str
-    conversation_history: List[Message]
+    conversation_history: List[Message] = []  # Not needed when a session_id is given
+    session_id: Optional[str] = None  # Server-side session created via /api/sessions
     document_context: Optional[str] = None  # For uploaded document content
+    document_id: Optional[str] = None  # Document previously stored via /api/documents
+
+class SessionCreateRequest(BaseModel):
+    persona_id: str  # The session can only be used to chat with this persona
+    conversation_history: List[Message] = []
+
+class SessionResponse(BaseModel):
+    session_id: str
+    persona_id: Optional[str] = None
+    turns: List[Message]
 
 class ChatResponse(BaseModel):
     response: str
@@ -20,7 +39,37 @@ class NLPAnalysisRequest(BaseModel):
 
 class NLPAnalysisResponse(BaseModel):
     sentiment: Dict[str, float]
-    entities: List[Dict[str, Any]]
+    entities: List[Entity]
     intents: Dict[str, float]
     document_summary: Optional[str] = None
-    document_entities: Optional[List[Dict[str, Any]]] = None
+    document_entities: Optional[List[Entity]] = None
+
+class ChatWithAnalysisResponse(BaseModel):
+    response: str
+    analysis: NLPAnalysisResponse
+
+# One batch runs as a handful of worker jobs, so its size is capped to keep
+# a single request from holding the NLP pool
+BATCH_MAX_TEXTS = int(os.environ.get("NLP_BATCH_MAX_TEXTS", "1000"))
+BATCH_MAX_TEXT_CHARS = int(os.environ.get("NLP_BATCH_MAX_TEXT_CHARS", "10000"))
+
+class NLPBatchAnalysisRequest(BaseModel):
+    texts: List[Annotated[str, Field(max_length=BATCH_MAX_TEXT_CHARS)]] = Field(max_length=BATCH_MAX_TEXTS)
+    batch_size: int = Field(default=64, ge=1, le=256)
+
+class NLPBatchAnalysisResponse(BaseModel):
+    results: List[Analysis]  # Checked as dictionaries, not a model per result
+
+class DocumentUploadRequest(BaseModel):
+    content: str
+    filename: Optional[str] = None
+
+class DocumentResponse(BaseModel):
+    document_id: str
+    filename: Optional[str] = None
+    status: str  # "processing", "ready" or "failed"
+    size: int
+    sentence_count: int
+    chunk_count: int
+    summary: Optional[str] = None
+    error: Optional[str] = None
@@ -0,0 +1,5 @@
+# LLM execution utilities for Dialogix
+"""
+This module runs persona crews against the LLM provider without blocking
+the event loop, and holds the shared plumbing around those calls.
+"""
@@ -0,0 +1,140 @@
+"""
+Cache of persona replies for repeated prompts.
+
+Greetings, farewells and "Please analyze this file" requests produce
+near-identical prompts, and each one used to wait for a full completion.
+Replies are cached under a key made of the persona, a fingerprint of its
+configuration, the model and temperature, and the prompt with whitespace
+normalized. Case is kept, since prompts differing only in case (code, names,
+acronyms) may need different replies. Crew replies and streamed replies are
+cached apart, since the two paths send the provider different prompts for the
+same task. Storage reuses the analysis cache
+backends, so entries expire after a TTL and the least recently used are
+evicted once the size cap is reached.
+
+Replaying one sampled reply changes how a persona behaves, so caching is off
+unless a persona opts in with ``"response_cache": true`` in the registry,
+which suits personas with a low temperature.
+
+Configuration (environment variables):
+
+- ``LLM_CACHE_BACKEND`` - ``memory`` (default), ``sqlite`` or ``none``
+- ``LLM_CACHE_PATH`` - SQLite file (default: ``dialogix_llm_cache.sqlite3`` in the temp dir)
+- ``LLM_CACHE_TTL`` - seconds a cached reply stays valid (default: 600)
+- ``LLM_CACHE_MAX_BYTES`` - size cap for cached replies (default: 16 MB)
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from ..nlp_utils.cache import CacheBackend, MemoryBackend, NullBackend, SQLiteBackend
+from ..nlp_utils.metrics import registry
+
+# Bump when the prompt format changes so replies to old prompts are ignored
+CACHE_VERSION = "3"
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalize_prompt(prompt: str) -> str:
+    return _WHITESPACE_RE.sub(" ", prompt).strip()
+
+
+class ResponseCache:
+    """Stores persona replies by persona, model settings and normalized prompt."""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._personas: Dict[str, Dict[str, Any]] = {}
+
+    @staticmethod
+    def make_key(persona: Any, prompt: str, path: str = "crew") -> str:
+        payload = json.dumps([
+            CACHE_VERSION, persona.id, persona.fingerprint, persona.llm_config["model"],
+            persona.temperature, path, normalize_prompt(prompt),
+        ])
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _record(self, persona: Any, hit: bool) -> None:
+        with self._lock:
+            stats = self._personas.setdefault(
+                persona.id, {"temperature": persona.temperature, "hits": 0, "misses": 0}
+            )
+            stats["hits" if hit else "misses"] += 1
+
+    def get(self, persona: Any, prompt: str, path: str = "crew") -> Optional[str]:
+        """
+        The cached reply for ``prompt`` generated through ``path`` (``crew`` or
+        ``stream``), or None. Personas that haven't opted in always miss.
+        """
+        if not persona.cache_responses:
+            return None
+        try:
+            stored = self.backend.get(self.make_key(persona, prompt, path))
+        except sqlite3.Error:
+            stored = None
+        self._record(persona, stored is not None)
+        return stored.decode("utf-8") if stored is not None else None
+
+    def set(self, persona: Any, prompt: str, response: str, path: str = "crew") -> None:
+        if not persona.cache_responses or not response:
+            return
+        try:
+            self.backend.set(self.make_key(persona, prompt, path), response.encode("utf-8"))
+        except sqlite3.Error:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            personas = {persona_id: dict(stats) for persona_id, stats in self._personas.items()}
+        hits = sum(stats["hits"] for stats in personas.values())
+        lookups = hits + sum(stats["misses"] for stats in personas.values())
+        for stats in personas.values():
+            total = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = stats["hits"] / total if total else 0.0
+        stats = {
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+            "personas": personas,
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+
+def backend_from_env() -> CacheBackend:
+    """Create the reply cache backend selected by ``LLM_CACHE_BACKEND``."""
+    kind = os.environ.get("LLM_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.environ.get("LLM_CACHE_TTL", "600"))
+    max_bytes = int(os.environ.get("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+    if kind == "none":
+        return NullBackend()
+    if kind == "sqlite":
+        path = os.environ.get(
+            "LLM_CACHE_PATH", os.path.join(tempfile.gettempdir(), "dialogix_llm_cache.sqlite3")
+        )
+        try:
+            return SQLiteBackend(path, ttl=ttl, max_bytes=max_bytes)
+        except sqlite3.Error:
+            pass
+    return MemoryBackend(ttl=ttl, max_bytes=max_bytes)
+
+
+response_cache = ResponseCache(backend_from_env())
+
+
+def _cache_samples(field: str) -> Dict[Tuple[str, ...], float]:
+    return {(persona_id,): stats[field] for persona_id, stats in response_cache.stats()["personas"].items()}
+
+
+registry.sampled("dialogix_llm_cache_hits_total", "Persona replies served from the response cache.",
+                 "counter", ["persona"], lambda: _cache_samples("hits"))
+registry.sampled("dialogix_llm_cache_misses_total", "Persona replies not found in the response cache.",
+                 "counter", ["persona"], lambda: _cache_samples("misses"))
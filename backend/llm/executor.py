@@ -0,0 +1,314 @@
+"""
+Non-blocking, concurrency-limited execution of persona crews.
+
+``Crew.kickoff()`` makes a synchronous HTTP call to the LLM provider. Running
+it on the event loop means one slow completion freezes the worker for every
+user, so crews are kicked off on a dedicated thread pool instead. A global
+cap protects the provider and the process, and a per-persona cap keeps one
+busy persona from starving the rest.
+
+Crews are expensive to assemble and can't run two kickoffs at once, so each
+persona keeps a pool of idle crews whose task description is a template; a
+request checks one out, kicks it off with its prompt as an input and returns
+it. The pool never grows past the persona's concurrency cap.
+
+A kickoff already running on a thread can't be stopped, so it outlives a
+request that is cancelled while awaiting it. It keeps its slots until the
+thread is done with it, so the caps count the calls actually running. Callers
+that account for the work they cause register with ``track_llm_calls`` to
+learn when each call actually finishes.
+
+Configuration (environment variables):
+
+- ``LLM_MAX_CONCURRENCY`` - LLM calls in flight across all personas (default: 32)
+- ``LLM_PERSONA_CONCURRENCY`` - LLM calls in flight per persona (default: 8)
+- ``LLM_CONCURRENCY_<PERSONA>`` - per-persona override, e.g. ``LLM_CONCURRENCY_PROFESSOR=4``
+"""
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..nlp_utils.metrics import registry
+
+_call_started: contextvars.ContextVar[Optional[Callable[[Future], None]]] = contextvars.ContextVar(
+    "dialogix_llm_call_started", default=None
+)
+
+
+@contextmanager
+def track_llm_calls(on_start: Callable[[Future], None]) -> Iterator[None]:
+    """
+    Call ``on_start`` with the future of every blocking LLM call started from
+    this context, including tasks created from it, on the event loop thread.
+    """
+    token = _call_started.set(on_start)
+    try:
+        yield
+    finally:
+        _call_started.reset(token)
+
+
+def crew_output_text(result: Any) -> str:
+    """Extract the raw response text from whatever ``crew.kickoff()`` returned."""
+    if hasattr(result, 'raw'):
+        # If result is a CrewOutput object
+        return result.raw
+    elif hasattr(result, 'tasks_output') and result.tasks_output:
+        # If result has tasks_output list with content
+        return result.tasks_output[0].raw
+    # Convert whatever was returned to a string
+    return str(result)
+
+
+class CrewPool:
+    """
+    Idle crews for one persona. ``checkout()`` reuses an idle crew, builds a
+    new one while fewer than ``max_size`` exist, and otherwise waits for one
+    to be returned. Called from the LLM worker threads.
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_size: int):
+        self.factory = factory
+        self.max_size = max_size
+        self._idle: List[Any] = []
+        self._created = 0
+        self._cond = threading.Condition()
+        self.hits = 0
+        self.misses = 0
+        self.waits = 0
+
+    def _acquire(self) -> Any:
+        with self._cond:
+            while not self._idle and self._created >= self.max_size:
+                self.waits += 1
+                self._cond.wait()
+            if self._idle:
+                self.hits += 1
+                return self._idle.pop()
+            self._created += 1
+            self.misses += 1
+        try:
+            return self.factory()
+        except BaseException:
+            self._release(None)
+            raise
+
+    def _release(self, crew: Any) -> None:
+        with self._cond:
+            if crew is None:
+                self._created -= 1
+            else:
+                self._idle.append(crew)
+            self._cond.notify()
+
+    @contextmanager
+    def checkout(self) -> Iterator[Any]:
+        crew = self._acquire()
+        try:
+            yield crew
+        except BaseException:
+            # A crew that failed mid-run may hold half-finished state; build a fresh one next time
+            self._release(None)
+            raise
+        self._release(crew)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "size": self._created,
+            "idle": len(self._idle),
+            "hits": self.hits,
+            "misses": self.misses,
+            "waits": self.waits,
+        }
+
+
+class LLMExecutor:
+    """
+    Runs blocking crew kickoffs on a thread pool sized to the global cap,
+    gated by a global semaphore and one semaphore per persona.
+    """
+
+    def __init__(self, max_concurrency: int = 32, persona_concurrency: int = 8,
+                 persona_overrides: Optional[Dict[str, int]] = None):
+        self.max_concurrency = max_concurrency
+        self.persona_concurrency = persona_concurrency
+        self.persona_overrides = persona_overrides or {}
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="llm-worker")
+        self._global_slots = asyncio.Semaphore(max_concurrency)
+        self._persona_slots: Dict[str, asyncio.Semaphore] = {}
+        self._in_flight: Dict[str, int] = {}
+        self._waiting: Dict[str, int] = {}
+        self._crew_pools: Dict[str, CrewPool] = {}
+
+    def persona_limit(self, persona_id: str) -> int:
+        return self.persona_overrides.get(persona_id, self.persona_concurrency)
+
+    def _slots_for(self, persona_id: str) -> asyncio.Semaphore:
+        slots = self._persona_slots.get(persona_id)
+        if slots is None:
+            slots = asyncio.Semaphore(self.persona_limit(persona_id))
+            self._persona_slots[persona_id] = slots
+        return slots
+
+    async def _acquire(self, persona_id: str) -> None:
+        """Take one persona slot and one global slot."""
+        self._waiting[persona_id] = self._waiting.get(persona_id, 0) + 1
+        try:
+            # Take the persona slot first so a saturated persona queues on its
+            # own semaphore instead of holding global slots other personas need
+            persona_slots = self._slots_for(persona_id)
+            await persona_slots.acquire()
+            try:
+                await self._global_slots.acquire()
+            except BaseException:
+                persona_slots.release()
+                raise
+        finally:
+            self._waiting[persona_id] -= 1
+        self._in_flight[persona_id] = self._in_flight.get(persona_id, 0) + 1
+
+    def _release(self, persona_id: str) -> None:
+        self._in_flight[persona_id] -= 1
+        self._global_slots.release()
+        self._persona_slots[persona_id].release()
+
+    @asynccontextmanager
+    async def slot(self, persona_id: str) -> AsyncIterator[None]:
+        """Hold one persona slot and one global slot for the duration of the block."""
+        await self._acquire(persona_id)
+        try:
+            yield
+        finally:
+            self._release(persona_id)
+
+    async def run(self, persona_id: str, func, *args: Any) -> Any:
+        """Run a blocking LLM call for ``persona_id`` once both caps allow it."""
+        await self._acquire(persona_id)
+        try:
+            future = self._pool.submit(func, *args)
+        except BaseException:
+            self._release(persona_id)
+            raise
+        loop = asyncio.get_running_loop()
+
+        # The call outlives a caller cancelled while awaiting it, so its slots
+        # are only freed once the worker thread is done with it
+        def done(_: Future) -> None:
+            try:
+                loop.call_soon_threadsafe(self._release, persona_id)
+            except RuntimeError:
+                # The loop is gone; nothing else can be touching the slots
+                self._release(persona_id)
+
+        future.add_done_callback(done)
+        on_start = _call_started.get()
+        if on_start is not None:
+            on_start(future)
+        return await asyncio.wrap_future(future)
+
+    async def kickoff(self, persona_id: str, crew: Any) -> Any:
+        """Kick off a crew without blocking the event loop."""
+        return await self.run(persona_id, crew.kickoff)
+
+    def crew_pool(self, persona_id: str, factory: Callable[[], Any]) -> CrewPool:
+        pool = self._crew_pools.get(persona_id)
+        if pool is None:
+            pool = CrewPool(factory, self.persona_limit(persona_id))
+            self._crew_pools[persona_id] = pool
+        return pool
+
+    async def kickoff_pooled(self, persona_id: str, factory: Callable[[], Any],
+                             inputs: Dict[str, Any]) -> Any:
+        """Kick off a pooled crew for ``persona_id`` with ``inputs`` interpolated into its task."""
+        pool = self.crew_pool(persona_id, factory)
+
+        def kickoff() -> Any:
+            with pool.checkout() as crew:
+                return crew.kickoff(inputs=inputs)
+
+        return await self.run(persona_id, kickoff)
+
+    def stats(self) -> Dict[str, Any]:
+        personas = set(self._in_flight) | set(self._waiting) | set(self._crew_pools)
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": sum(self._in_flight.values()),
+            "personas": {
+                persona_id: {
+                    "limit": self.persona_limit(persona_id),
+                    "in_flight": self._in_flight.get(persona_id, 0),
+                    "waiting": self._waiting.get(persona_id, 0),
+                    "crew_pool": self._crew_pools[persona_id].stats() if persona_id in self._crew_pools else None,
+                }
+                for persona_id in sorted(personas)
+            },
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._pool.shutdown(wait=wait)
+
+
+_default_executor: Optional[LLMExecutor] = None
+
+
+def _persona_overrides_from_env() -> Dict[str, int]:
+    prefix = "LLM_CONCURRENCY_"
+    return {
+        key[len(prefix):].lower(): int(value)
+        for key, value in os.environ.items()
+        if key.startswith(prefix) and value
+    }
+
+
+def get_llm_executor() -> LLMExecutor:
+    """Return the process-wide LLM executor, configured from the environment."""
+    global _default_executor
+    if _default_executor is None:
+        _default_executor = LLMExecutor(
+            max_concurrency=int(os.environ.get("LLM_MAX_CONCURRENCY", "32")),
+            persona_concurrency=int(os.environ.get("LLM_PERSONA_CONCURRENCY", "8")),
+            persona_overrides=_persona_overrides_from_env(),
+        )
+    return _default_executor
+
+
+async def run_crew(persona_id: str, crew: Any) -> Any:
+    """Kick off ``crew`` on the shared LLM executor."""
+    return await get_llm_executor().kickoff(persona_id, crew)
+
+
+async def run_pooled_crew(persona_id: str, factory: Callable[[], Any], inputs: Dict[str, Any]) -> Any:
+    """Kick off one of ``persona_id``'s pooled crews on the shared LLM executor."""
+    return await get_llm_executor().kickoff_pooled(persona_id, factory, inputs)
+
+
+def _persona_samples(field: str, pool: bool = False) -> Dict[Tuple[str, ...], float]:
+    if _default_executor is None:
+        return {}
+    samples = {}
+    for persona_id, stats in _default_executor.stats()["personas"].items():
+        if pool:
+            stats = stats["crew_pool"]
+            if stats is None:
+                continue
+        samples[(persona_id,)] = stats[field]
+    return samples
+
+
+registry.sampled("dialogix_llm_in_flight", "LLM calls in progress.", "gauge", ["persona"],
+                 lambda: _persona_samples("in_flight"))
+registry.sampled("dialogix_llm_waiting", "LLM calls waiting for a concurrency slot.", "gauge", ["persona"],
+                 lambda: _persona_samples("waiting"))
+registry.sampled("dialogix_llm_crew_pool_size", "Crews built for each persona's pool.", "gauge", ["persona"],
+                 lambda: _persona_samples("size", pool=True))
+
+
+def shutdown_llm_executor() -> None:
+    global _default_executor
+    if _default_executor is not None:
+        _default_executor.shutdown()
+        _default_executor = None
@@ -0,0 +1,146 @@
+"""
+Offline stand-in for the LLM provider, for benchmarks and load tests.
+
+With ``LLM_BACKEND=fake`` no persona talks to Gemini. Crews, agents and
+streamed replies are backed by ``FakeLLM`` instead, which waits for a sampled
+latency and returns filler text of a configured length. Everything around
+the call still runs as usual: the LLM thread pool, concurrency caps, crew
+pools, response cache and coalescing. So a load test on a laptop measures
+the service and not the network.
+
+The time to the first token is drawn from a log-normal distribution, with its
+median and spread set by the environment, and tokens then arrive at a fixed
+rate. Replies depend only on the prompt, and latencies on the seed and call
+order, so runs are repeatable.
+
+Configuration (environment variables):
+
+- ``LLM_BACKEND`` - ``provider`` (default) or ``fake``
+- ``FAKE_LLM_LATENCY_MS`` - median time to the first token (default: 800)
+- ``FAKE_LLM_LATENCY_SIGMA`` - log-normal spread of that time; 0 makes it constant (default: 0.5)
+- ``FAKE_LLM_OUTPUT_TOKENS`` - words in every reply (default: 120)
+- ``FAKE_LLM_TOKENS_PER_SECOND`` - generation speed after the first token; 0 is instant (default: 100)
+- ``FAKE_LLM_SEED`` - seed for the latency samples (default: 0)
+"""
+import asyncio
+import hashlib
+import math
+import os
+import random
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+_WORDS = (
+    "the a of and to in is that it for on with as this was by be at from or an are "
+    "sea star tea code leaf clue bread book wind lamp river stone cloud ship song "
+    "quiet bright gentle curious patient careful simple hidden ancient golden"
+).split()
+
+
+def fake_llm_enabled() -> bool:
+    return os.environ.get("LLM_BACKEND", "provider").lower() == "fake"
+
+
+class FakeLLM:
+    """Deterministic replies after a simulated provider latency."""
+
+    def __init__(self, model: str = "fake", temperature: float = 0.7, latency_ms: float = 800,
+                 latency_sigma: float = 0.5, output_tokens: int = 120,
+                 tokens_per_second: float = 100, seed: int = 0):
+        self.model = model
+        self.temperature = temperature
+        self.latency_ms = latency_ms
+        self.latency_sigma = latency_sigma
+        self.output_tokens = output_tokens
+        self.tokens_per_second = tokens_per_second
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.calls = 0
+
+    def first_token_delay(self) -> float:
+        """Seconds until the first token of the next call."""
+        with self._lock:
+            self.calls += 1
+            if self.latency_sigma <= 0:
+                return self.latency_ms / 1000
+            return self._rng.lognormvariate(math.log(self.latency_ms / 1000), self.latency_sigma)
+
+    def token_delay(self) -> float:
+        return 1 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+    def tokens(self, prompt: str) -> List[str]:
+        """The reply to ``prompt``, split into tokens."""
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+        rng = random.Random(seed)
+        words = [rng.choice(_WORDS) for _ in range(self.output_tokens)]
+        return [word if i == 0 else " " + word for i, word in enumerate(words)]
+
+    def complete(self, prompt: str) -> str:
+        """Block like a provider call and return the whole reply."""
+        tokens = self.tokens(prompt)
+        time.sleep(self.first_token_delay() + self.token_delay() * max(0, len(tokens) - 1))
+        return "".join(tokens)
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the reply token by token at the configured rate."""
+        await asyncio.sleep(self.first_token_delay())
+        delay = self.token_delay()
+        for i, token in enumerate(self.tokens(prompt)):
+            if i and delay:
+                await asyncio.sleep(delay)
+            yield token
+
+    def call(self, messages: Any, **kwargs: Any) -> str:
+        if isinstance(messages, str):
+            return self.complete(messages)
+        return self.complete("\n".join(m["content"] for m in messages))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "latency_ms": self.latency_ms,
+            "latency_sigma": self.latency_sigma,
+            "output_tokens": self.output_tokens,
+            "tokens_per_second": self.tokens_per_second,
+        }
+
+
+class FakeAgent:
+    """The agent fields the persona endpoints read, without a crewai ``Agent``."""
+
+    def __init__(self, name: str, role: str, goal: str, backstory: str, llm: FakeLLM):
+        self.name = name
+        self.role = role
+        self.goal = goal
+        self.backstory = backstory
+        self.llm = llm
+
+
+class FakeCrew:
+    """A single-task crew whose kickoff fills in the task description and calls the fake LLM."""
+
+    def __init__(self, agent: FakeAgent, description: str):
+        self.agent = agent
+        self.description = description
+
+    def kickoff(self, inputs: Optional[Dict[str, Any]] = None) -> str:
+        prompt = self.description.format(**inputs) if inputs else self.description
+        return self.agent.llm.complete(prompt)
+
+
+_default_llm: Optional[FakeLLM] = None
+
+
+def get_fake_llm() -> FakeLLM:
+    """Return the process-wide fake LLM, configured from the environment."""
+    global _default_llm
+    if _default_llm is None:
+        _default_llm = FakeLLM(
+            latency_ms=float(os.environ.get("FAKE_LLM_LATENCY_MS", "800")),
+            latency_sigma=float(os.environ.get("FAKE_LLM_LATENCY_SIGMA", "0.5")),
+            output_tokens=int(os.environ.get("FAKE_LLM_OUTPUT_TOKENS", "120")),
+            tokens_per_second=float(os.environ.get("FAKE_LLM_TOKENS_PER_SECOND", "100")),
+            seed=int(os.environ.get("FAKE_LLM_SEED", "0")),
+        )
+    return _default_llm
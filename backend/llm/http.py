@@ -0,0 +1,140 @@
+"""
+Shared keep-alive HTTP connections to the LLM provider.
+
+Left to itself, every ``LLM`` object and streaming call may end up with its
+own HTTP client, paying a TCP connect and TLS handshake whenever a client's
+connections are not warm. All personas share one pooled client per I/O model
+instead: a synchronous ``httpx.Client`` for crew kickoffs on the LLM worker
+threads and litellm's async handler for streamed replies. Both are handed to
+litellm through its ``client`` argument.
+
+Every request is traced through httpcore's ``trace`` extension, so the stats
+show how many requests were sent over an already-open connection.
+
+Configuration (environment variables):
+
+- ``LLM_HTTP_MAX_CONNECTIONS`` - connections open to the provider at once (default: 100)
+- ``LLM_HTTP_MAX_KEEPALIVE`` - idle connections kept open for reuse (default: 32)
+- ``LLM_HTTP_KEEPALIVE_EXPIRY`` - seconds an idle connection is kept (default: 120)
+- ``LLM_HTTP_TIMEOUT`` - seconds before a provider request times out (default: 600)
+"""
+import os
+import threading
+from typing import Any, Dict, Optional
+
+
+class LLMConnectionPool:
+    """Process-wide HTTP clients for LLM calls, with connection reuse metrics."""
+
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 32,
+                 keepalive_expiry: float = 120, timeout: float = 600):
+        import httpx
+
+        self.timeout = timeout
+        self._limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self._lock = threading.Lock()
+        self._sync_handler = None
+        self._async_handler = None
+        self.async_client: Optional[Any] = None
+        self.requests = 0
+        self.connections_opened = 0
+        self.tls_handshakes = 0
+
+        self.client = httpx.Client(
+            limits=self._limits,
+            timeout=timeout,
+            event_hooks={"request": [self._trace_request]},
+        )
+
+    def _count(self, event_name: str) -> None:
+        with self._lock:
+            if event_name == "connection.connect_tcp.complete":
+                self.connections_opened += 1
+            elif event_name == "connection.start_tls.complete":
+                self.tls_handshakes += 1
+            elif event_name.endswith(".send_request_headers.started"):
+                self.requests += 1
+
+    def _trace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self._count(event_name)
+
+    async def _atrace(self, event_name: str, info: Dict[str, Any]) -> None:
+        self._count(event_name)
+
+    def _trace_request(self, request: Any) -> None:
+        request.extensions["trace"] = self._trace
+
+    async def _atrace_request(self, request: Any) -> None:
+        request.extensions["trace"] = self._atrace
+
+    def sync_handler(self) -> Any:
+        """litellm handler for blocking calls, backed by the shared client."""
+        from litellm.llms.custom_httpx.http_handler import HTTPHandler
+
+        with self._lock:
+            if self._sync_handler is None:
+                self._sync_handler = HTTPHandler(timeout=self.timeout, client=self.client)
+        return self._sync_handler
+
+    async def async_handler(self) -> Any:
+        """litellm handler for streamed calls; created once so its connections are reused."""
+        if self._async_handler is None:
+            import httpx
+            from litellm.llms.custom_httpx.http_handler import AsyncHTTPHandler
+
+            handler = AsyncHTTPHandler(timeout=self.timeout, concurrent_limit=self._limits.max_connections)
+            # AsyncHTTPHandler takes no client argument, so swap in one with the
+            # same limits, keep-alive and timeout as the sync client. The pool
+            # owns it, and the handler's own client is closed unused
+            original = handler.client
+            self.async_client = httpx.AsyncClient(
+                limits=self._limits,
+                timeout=self.timeout,
+                event_hooks={"request": [self._atrace_request]},
+            )
+            handler.client = self.async_client
+            self._async_handler = handler
+            await original.aclose()
+        return self._async_handler
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_connections": self._limits.max_connections,
+            "max_keepalive": self._limits.max_keepalive_connections,
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "tls_handshakes": self.tls_handshakes,
+            "reused_connections": max(0, self.requests - self.connections_opened),
+        }
+
+    async def aclose(self) -> None:
+        self.client.close()
+        if self.async_client is not None:
+            await self.async_client.aclose()
+
+
+_default_pool: Optional[LLMConnectionPool] = None
+
+
+def get_llm_http() -> LLMConnectionPool:
+    """Return the process-wide LLM connection pool, configured from the environment."""
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = LLMConnectionPool(
+            max_connections=int(os.environ.get("LLM_HTTP_MAX_CONNECTIONS", "100")),
+            max_keepalive=int(os.environ.get("LLM_HTTP_MAX_KEEPALIVE", "32")),
+            keepalive_expiry=float(os.environ.get("LLM_HTTP_KEEPALIVE_EXPIRY", "120")),
+            timeout=float(os.environ.get("LLM_HTTP_TIMEOUT", "600")),
+        )
+    return _default_pool
+
+
+async def close_llm_http() -> None:
+    global _default_pool
+    if _default_pool is not None:
+        await _default_pool.aclose()
+        _default_pool = None
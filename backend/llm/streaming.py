@@ -0,0 +1,168 @@
+"""
+Server-sent-event streaming of persona replies.
+
+``Crew.kickoff()`` only returns once the whole completion is done, so the
+streaming endpoints talk to the provider through litellm (the client crewai
+itself uses) with ``stream=True``, using the same agent role, goal, backstory
+and LLM settings the crew would. Tokens are forwarded as ``token`` events as
+they arrive and a final ``done`` event carries the full reply and the NLP
+analysis of the user's message. When the analysis is already known before
+generation starts it can also be sent up front as an ``analysis`` event.
+Identical replies already being streamed to another request are awaited and
+sent whole instead of being generated twice. If the request streaming that
+reply goes away first, the ones waiting on it generate the reply themselves.
+"""
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+import litellm
+from fastapi.responses import StreamingResponse
+
+from .executor import get_llm_executor
+from .fake import FakeLLM
+from .http import get_llm_http
+from ..nlp_utils.executor import run_nlp_shared
+from ..nlp_utils.metrics import STAGE_CANCELLED, STAGE_ERRORS, STAGE_SECONDS
+from ..nlp_utils.responses import dumps
+from ..nlp_utils.singleflight import LeaderGone, SingleFlight
+from ..nlp_utils.text_analysis import analyze_message
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one server-sent event."""
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+
+def agent_messages(agent: Any, task_description: str, expected_output: str) -> list:
+    """Build the chat messages crewai would send for a single-task crew."""
+    system_prompt = (
+        f"You are {agent.role}. {agent.backstory}\n"
+        f"Your personal goal is: {agent.goal}"
+    )
+    user_prompt = (
+        f"{task_description}\n\n"
+        f"This is the expected criteria for your final answer: {expected_output}\n"
+        "You MUST return the actual complete content as the final answer, not a summary."
+    )
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+async def stream_agent_completion(persona_id: str, agent: Any, task_description: str,
+                                  expected_output: str) -> AsyncIterator[str]:
+    """Yield reply tokens from the provider as they are generated."""
+    llm = agent.llm
+    async with get_llm_executor().slot(persona_id):
+        if isinstance(llm, FakeLLM):
+            async for token in llm.stream(task_description):
+                yield token
+            return
+        stream = await litellm.acompletion(
+            model=llm.model,
+            messages=agent_messages(agent, task_description, expected_output),
+            temperature=llm.temperature,
+            api_key=getattr(llm, "api_key", None),
+            client=await get_llm_http().async_handler(),
+            stream=True,
+        )
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+
+
+async def persona_event_stream(persona_id: str, agent: Any, task_description: str,
+                               expected_output: str, user_message: str,
+                               nlp_analysis: Optional[Dict[str, Any]] = None,
+                               announce_analysis: bool = False,
+                               on_complete: Optional[Callable[[str], None]] = None,
+                               cached_response: Optional[str] = None,
+                               flight: Optional[SingleFlight] = None,
+                               flight_key: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Yield SSE ``token`` events for the reply, then a ``done`` event with the NLP metadata.
+    ``on_complete`` is called with the full reply once generation has finished.
+    A ``cached_response`` is sent as a single token without calling the provider,
+    and so is a reply another request is already generating under ``flight_key``.
+    """
+    if announce_analysis and nlp_analysis is not None:
+        yield sse_event("analysis", nlp_analysis)
+
+    # Personas that don't analyze the message themselves get it done alongside generation
+    analysis_task = None
+    if nlp_analysis is None:
+        analysis_task = asyncio.ensure_future(run_nlp_shared(analyze_message, user_message))
+
+    tokens = []
+    leading = None
+    # Only generated or shared replies count as LLM time, not cache hits
+    started = time.perf_counter() if cached_response is None else None
+    stage = "llm"
+    try:
+        while cached_response is None and flight is not None and leading is None:
+            shared = flight.join(flight_key)
+            if shared is None:
+                leading = flight.lead(flight_key)
+                break
+            try:
+                cached_response = await asyncio.shield(shared)
+            except LeaderGone:
+                # Its client went away; lead the reply or follow whoever does now
+                continue
+        if cached_response is not None:
+            tokens.append(cached_response)
+            yield sse_event("token", {"token": cached_response})
+        else:
+            async for token in stream_agent_completion(persona_id, agent, task_description, expected_output):
+                tokens.append(token)
+                yield sse_event("token", {"token": token})
+
+        response = "".join(tokens)
+        if started is not None:
+            STAGE_SECONDS.observe(time.perf_counter() - started, "llm", persona_id)
+        if leading is not None:
+            leading.set_result(response)
+        if on_complete is not None:
+            on_complete(response)
+        if analysis_task is not None:
+            stage = "nlp"
+            nlp_analysis = await analysis_task
+        yield sse_event("done", {"response": response, "nlp_analysis": nlp_analysis})
+    except (asyncio.CancelledError, GeneratorExit):
+        # The client went away mid-stream
+        STAGE_CANCELLED.inc(stage, persona_id)
+        raise
+    except Exception as e:
+        STAGE_ERRORS.inc(stage, persona_id)
+        if leading is not None and not leading.done():
+            leading.set_exception(e)
+        yield sse_event("error", {"detail": str(e)})
+    finally:
+        # Requests waiting on this reply must not hang, or fail, if the client went away mid-stream
+        if leading is not None and not leading.done():
+            flight.abandon(flight_key, leading)
+        if analysis_task is not None and not analysis_task.done():
+            analysis_task.cancel()
+
+
+def stream_persona_response(persona_id: str, agent: Any, task_description: str,
+                            expected_output: str, user_message: str,
+                            nlp_analysis: Optional[Dict[str, Any]] = None,
+                            announce_analysis: bool = False,
+                            on_complete: Optional[Callable[[str], None]] = None,
+                            cached_response: Optional[str] = None,
+                            flight: Optional[SingleFlight] = None,
+                            flight_key: Optional[str] = None) -> StreamingResponse:
+    """Wrap a persona reply stream in an SSE response."""
+    return StreamingResponse(
+        persona_event_stream(persona_id, agent, task_description, expected_output,
+                             user_message, nlp_analysis, announce_analysis, on_complete,
+                             cached_response, flight, flight_key),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
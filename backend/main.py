@@ -1,35 +1,51 @@
 import os
 import sys
-from fastapi import FastAPI, HTTPException, APIRouter
+from fastapi import FastAPI, HTTPException, APIRouter, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from typing import Dict, List, Optional
 
 # Add the current directory to the Python path so imports work correctly
 current_dir = os.path.dirname(os.path.abspath(__file__))
 sys.path.append(current_dir)
 
-# Import all persona endpoints
-from backend.persona_agents.captain import router as captain_router
-from backend.persona_agents.zen import router as zen_router
-from backend.persona_agents.dev import router as dev_router
-from backend.persona_agents.chef import router as chef_router
-from backend.persona_agents.professor import router as professor_router
-from backend.persona_agents.poet import router as poet_router
-from backend.persona_agents.detective import router as detective_router
+# Import the persona registry and the chat endpoints shared by all personas
+from backend.persona_agents.registry import persona_registry
+from backend.persona_agents.router import reply_flight, router as persona_router
 
 # Import NLP analysis utilities
-from backend.nlp_utils.text_analysis import analyze_message, summarize_text
+from backend.nlp_utils.text_analysis import (
+    analyze_batch, analyze_with_document, model_status, warm_up_in_background
+)
+from backend.nlp_utils.executor import NLPQueueFullError, map_nlp, nlp_flight, run_nlp_shared, shutdown_nlp_executor
+from backend.nlp_utils.metrics import instrument_app
+from backend.nlp_utils.profiling import enable_profiling
+from backend.nlp_utils.responses import enable_compression, json_response_class
+from backend.nlp_utils.documents import DocumentNotFoundError, document_store
+from backend.llm.executor import get_llm_executor, shutdown_llm_executor
+from backend.llm.cache import response_cache
+from backend.llm.fake import fake_llm_enabled, get_fake_llm
+from backend.llm.http import close_llm_http, get_llm_http
+from backend.sessions import SessionNotFoundError, session_store
+from backend.uploads import MultipartFile, UploadError, UploadTooLargeError
 
 # Import common models
-from backend.common_models import ChatRequest, ChatResponse, NLPAnalysisRequest, NLPAnalysisResponse
+from backend.common_models import (
+    ChatRequest, ChatResponse, DocumentResponse, DocumentUploadRequest, NLPAnalysisRequest,
+    NLPAnalysisResponse, NLPBatchAnalysisRequest, NLPBatchAnalysisResponse,
+    SessionCreateRequest, SessionResponse
+)
 
-# Create NLP router
+# Create NLP, document and session routers
 nlp_router = APIRouter()
+document_router = APIRouter()
+session_router = APIRouter()
 
 app = FastAPI(
     title="Dialogix API",
     description="Multi-persona conversational AI service",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=json_response_class(),
 )
 
 # Configure CORS
@@ -41,17 +57,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include all persona routers
-app.include_router(captain_router, prefix="/api/personas/captain", tags=["Captain Grumblebeard"])
-app.include_router(zen_router, prefix="/api/personas/zen", tags=["Master Serenity"])
-app.include_router(dev_router, prefix="/api/personas/dev", tags=["Caffeine Coder"])
-app.include_router(chef_router, prefix="/api/personas/chef", tags=["Chef Gusteau"])
-app.include_router(professor_router, prefix="/api/personas/professor", tags=["Professor Knowitall"])
-app.include_router(poet_router, prefix="/api/personas/poet", tags=["Lyra Versecraft"])
-app.include_router(detective_router, prefix="/api/personas/detective", tags=["Sherlock Holmes"])
+# Compress large responses for clients that accept gzip or brotli
+enable_compression(app)
+# Time every request and serve Prometheus metrics at /metrics
+instrument_app(app)
+# Profile single requests that ask for it with X-Profile: 1 or ?profile=1
+enable_profiling(app)
 
-# Include NLP analysis router
-app.include_router(nlp_router, prefix="/api/nlp", tags=["NLP Analysis"])
+# Include the persona chat router; personas themselves are defined in persona_agents/personas.json
+app.include_router(persona_router, prefix="/api/personas", tags=["Personas"])
+
+@app.exception_handler(NLPQueueFullError)
+async def nlp_queue_full_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "NLP workers are busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.on_event("startup")
+def warm_up_models():
+    # Load the NLP models in the background so the server starts accepting
+    # connections immediately; /ready reports when they are usable
+    warm_up_in_background()
+
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 200 once the NLP models are loaded, 503 until then."""
+    status = model_status()
+    if status["state"] != "ready":
+        return JSONResponse(status_code=503, content={"status": status["state"], "models": status})
+    return {"status": "ready", "models": status}
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    shutdown_nlp_executor()
+    shutdown_llm_executor()
+
+@app.on_event("shutdown")
+async def close_llm_connections():
+    await close_llm_http()
+
+@app.get("/api/llm/stats")
+def llm_stats():
+    """Concurrency, crew pool, connection reuse, response cache and coalescing metrics for LLM calls."""
+    stats = {
+        "executor": get_llm_executor().stats(),
+        "http": get_llm_http().stats(),
+        "response_cache": response_cache.stats(),
+        "coalescing": {"nlp": nlp_flight.stats(), "replies": reply_flight.stats()},
+    }
+    if fake_llm_enabled():
+        stats["fake_llm"] = get_fake_llm().stats()
+    return stats
 
 @app.get("/")
 def read_root():
@@ -65,67 +123,93 @@ async def analyze_text(request: NLPAnalysisRequest):
     This endpoint is primarily used for demonstration purposes.
     """
     try:
-        # Analyze the main text content
-        analysis = analyze_message(request.text)
-        
-        # If document is provided, include a summary
-        if request.document:
-            summary = summarize_text(request.document, max_length=500)
-            analysis["document_summary"] = summary
-            
-            # Also analyze key entities in the document
-            doc_entities = analyze_message(summary)["entities"]
-            analysis["document_entities"] = doc_entities
+        # Analyze the main text content, plus a summary of the document if one is provided
+        analysis = await run_nlp_shared(analyze_with_document, request.text, request.document)
         
         return analysis
+    except NLPQueueFullError:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing text: {str(e)}")
 
+@nlp_router.post("/analyze_batch", response_model=NLPBatchAnalysisResponse)
+async def analyze_text_batch(request: NLPBatchAnalysisRequest):
+    """
+    Analyze a list of messages in one request.
+    spaCy runs over the texts with nlp.pipe and results come back in input order.
+    """
+    try:
+        results = await map_nlp(analyze_batch, request.texts, batch_size=request.batch_size)
+        return {"results": results}
+    except NLPQueueFullError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing batch: {str(e)}")
+
+# Document upload endpoints
+@document_router.post("", response_model=DocumentResponse, status_code=202)
+async def upload_document(request: DocumentUploadRequest):
+    """
+    Store a document once and start precomputing its summary, entities and chunks.
+    Chat requests can then pass the returned document_id instead of the text.
+    """
+    # Async so ingest runs on the event loop, where it schedules the processing
+    return document_store.ingest(request.content, request.filename).info()
+
+@document_router.post("/upload", response_model=DocumentResponse, status_code=202)
+async def upload_document_file(request: Request):
+    """
+    Stream a UTF-8 text file sent as multipart/form-data in the ``file`` field.
+    The file is segmented, summarized and indexed while it arrives instead of
+    being read into memory first.
+    """
+    try:
+        upload = await MultipartFile(request).start()
+        document = await document_store.ingest_stream(upload.chunks(), upload.filename)
+    except UploadTooLargeError as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return document.info()
+
+@document_router.get("/{document_id}", response_model=DocumentResponse)
+def get_document(document_id: str):
+    """Return the processing status and summary of an uploaded document."""
+    try:
+        return document_store.get(document_id).info()
+    except DocumentNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown document_id: {document_id}")
+
+# Conversation session endpoints
+@session_router.post("", response_model=SessionResponse, status_code=201)
+def create_session(request: SessionCreateRequest):
+    """
+    Start a server-side conversation. Chat requests that pass the returned
+    session_id only need to send the new message.
+    """
+    session = session_store.create(
+        request.persona_id, [(msg["sender"], msg["message"]) for msg in request.conversation_history]
+    )
+    return session.info()
+
+@session_router.get("/{session_id}", response_model=SessionResponse)
+def get_session(session_id: str):
+    """Return the conversation recorded for a session."""
+    try:
+        return session_store.get(session_id).info()
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown session_id: {session_id}")
+
+@session_router.delete("/{session_id}", status_code=204)
+def delete_session(session_id: str):
+    session_store.delete(session_id)
+
+# Include NLP analysis, document and session routers once their routes are registered
+app.include_router(nlp_router, prefix="/api/nlp", tags=["NLP Analysis"])
+app.include_router(document_router, prefix="/api/documents", tags=["Documents"])
+app.include_router(session_router, prefix="/api/sessions", tags=["Sessions"])
+
 @app.get("/api/personas")
 def get_personas():
     """Returns information about all available personas"""
-    personas = [
-        {
-            "id": "captain",
-            "name": "Captain Grumblebeard",
-            "role": "Grumpy Pirate",
-            "description": "A salty old sea dog with a flair for the dramatic and a disdain for landlubbers."
-        },
-        {
-            "id": "zen",
-            "name": "Master Serenity",
-            "role": "Zen Monk",
-            "description": "Find your center with this peaceful guide who speaks in koans and gentle wisdom."
-        },
-        {
-            "id": "dev",
-            "name": "Caffeine Coder",
-            "role": "Energetic Developer",
-            "description": "A hyperactive programmer who solves problems fast and talks even faster."
-        },
-        {
-            "id": "chef",
-            "name": "Chef Gusteau",
-            "role": "Culinary Expert",
-            "description": "A passionate chef who believes anyone can cook with the right guidance."
-        },
-        {
-            "id": "professor",
-            "name": "Professor Knowitall",
-            "role": "Academic Expert",
-            "description": "A scholarly type who provides detailed, citation-heavy explanations."
-        },
-        {
-            "id": "poet",
-            "name": "Lyra Versecraft",
-            "role": "Poetic Soul",
-            "description": "Expresses everything through beautiful, flowing verse and metaphor."
-        },
-        {
-            "id": "detective",
-            "name": "Sherlock Holmes",
-            "role": "Deductive Genius",
-            "description": "Observes the details others miss and makes surprising deductions."
-        }
-    ]
-    return {"personas": personas}
+    return {"personas": persona_registry.list()}
@@ -2,6 +2,7 @@ import os
 import sys
 from fastapi import FastAPI, HTTPException, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from typing import Dict, List, Optional
 from pydantic import BaseModel
 
@@ -11,8 +12,17 @@ project_root = os.path.dirname(current_dir)
 sys.path.append(project_root)
 
 # Import common models and NLP utilities
-from backend.common_models import ChatRequest, ChatResponse, NLPAnalysisRequest, NLPAnalysisResponse
-from backend.nlp_utils.text_analysis import analyze_message, summarize_text
+from backend.common_models import (
+    ChatRequest, ChatResponse, NLPAnalysisRequest, NLPAnalysisResponse,
+    NLPBatchAnalysisRequest, NLPBatchAnalysisResponse
+)
+from backend.nlp_utils.text_analysis import (
+    analyze_batch, analyze_with_document, model_status, warm_up_in_background
+)
+from backend.nlp_utils.executor import NLPQueueFullError, map_nlp, run_nlp_shared, shutdown_nlp_executor
+from backend.nlp_utils.metrics import instrument_app
+from backend.nlp_utils.profiling import enable_profiling
+from backend.nlp_utils.responses import enable_compression, json_response_class
 
 # Create NLP router
 nlp_router = APIRouter()
@@ -20,7 +30,8 @@ nlp_router = APIRouter()
 app = FastAPI(
     title="Dialogix NLP Visualizer",
     description="NLP visualization service for Dialogix",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=json_response_class(),
 )
 
 # Configure CORS
@@ -32,8 +43,38 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Include NLP analysis router
-app.include_router(nlp_router, prefix="/api/nlp", tags=["NLP Analysis"])
+# Compress large responses for clients that accept gzip or brotli
+enable_compression(app)
+# Time every request and serve Prometheus metrics at /metrics
+instrument_app(app)
+# Profile single requests that ask for it with X-Profile: 1 or ?profile=1
+enable_profiling(app)
+
+@app.exception_handler(NLPQueueFullError)
+async def nlp_queue_full_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "NLP workers are busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.on_event("startup")
+def warm_up_models():
+    # Load the NLP models in the background so the server starts accepting
+    # connections immediately; /ready reports when they are usable
+    warm_up_in_background()
+
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 200 once the NLP models are loaded, 503 until then."""
+    status = model_status()
+    if status["state"] != "ready":
+        return JSONResponse(status_code=503, content={"status": status["state"], "models": status})
+    return {"status": "ready", "models": status}
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    shutdown_nlp_executor()
 
 @app.get("/")
 def read_root():
@@ -47,23 +88,33 @@ async def analyze_text(request: NLPAnalysisRequest):
     This endpoint is primarily used for demonstration purposes.
     """
     try:
-        # Analyze the main text content
-        analysis = analyze_message(request.text)
-        
-        # If document is provided, include a summary
-        if request.document:
-            summary = summarize_text(request.document, max_length=500)
-            analysis["document_summary"] = summary
-            
-            # Also analyze key entities in the document
-            doc_entities = analyze_message(summary)["entities"]
-            analysis["document_entities"] = doc_entities
+        # Analyze the main text content, plus a summary of the document if one is provided
+        analysis = await run_nlp_shared(analyze_with_document, request.text, request.document)
         
         return analysis
+    except NLPQueueFullError:
+        raise
     except Exception as e:
         print(f"Error in NLP analysis: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Error analyzing text: {str(e)}")
 
+@nlp_router.post("/analyze_batch", response_model=NLPBatchAnalysisResponse)
+async def analyze_text_batch(request: NLPBatchAnalysisRequest):
+    """
+    Analyze a list of messages in one request.
+    spaCy runs over the texts with nlp.pipe and results come back in input order.
+    """
+    try:
+        results = await map_nlp(analyze_batch, request.texts, batch_size=request.batch_size)
+        return {"results": results}
+    except NLPQueueFullError:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing batch: {str(e)}")
+
+# Include NLP analysis router once its routes are registered
+app.include_router(nlp_router, prefix="/api/nlp", tags=["NLP Analysis"])
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="127.0.0.1", port=8001)
\ No newline at end of file
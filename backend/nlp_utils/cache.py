@@ -0,0 +1,316 @@
+"""
+Content-addressed cache for NLP analysis results.
+
+The same user message is analyzed by the NLP server and again by the persona
+endpoint, and an uploaded document is summarized by both. Results are keyed
+by a SHA-256 of the function name and its arguments, stored as JSON, and
+expire after a TTL. Two backends are available:
+
+- ``memory`` - an in-process LRU bounded by total payload size
+- ``sqlite`` - a local SQLite file that every process on the host shares,
+  so main.py and the NLP server reuse each other's results
+
+Cached results include summaries of conversations, so nothing is written to
+disk unless ``NLP_CACHE_PATH`` names the file explicitly; the file is created
+readable by its owner only.
+
+Configuration (environment variables):
+
+- ``NLP_CACHE_BACKEND`` - ``memory`` (default), ``sqlite`` or ``none``
+- ``NLP_CACHE_PATH`` - SQLite file, required for ``sqlite`` (default: unset)
+- ``NLP_CACHE_TTL`` - seconds an entry stays valid (default: 3600)
+- ``NLP_CACHE_MAX_BYTES`` - payload size cap per backend (default: 64 MB)
+"""
+import functools
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .metrics import registry
+
+# Bump when an analysis function changes its output so stale entries are ignored
+CACHE_VERSION = "2"
+
+
+class CacheBackend:
+    """Interface for analysis cache storage. Values are opaque bytes."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class NullBackend(CacheBackend):
+    """Backend that stores nothing, used when caching is disabled."""
+
+    def get(self, key: str) -> Optional[bytes]:
+        return None
+
+    def set(self, key: str, value: bytes) -> None:
+        pass
+
+    def clear(self) -> None:
+        pass
+
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU cache with a TTL and a cap on total stored bytes."""
+
+    def __init__(self, ttl: float = 3600, max_bytes: int = 64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[float, bytes]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._bytes += size
+            # Evict least recently used entries until we fit again
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str) -> None:
+        _, value = self._entries.pop(key)
+        self._bytes -= len(key) + len(value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "entries": len(self._entries), "bytes": self._bytes}
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Cache stored in a local SQLite file shared by every process on the host.
+    Entries are evicted least-recently-used first once the stored payload
+    exceeds ``max_bytes``.
+    """
+
+    # Only rewrite the access time of a hit once per this many seconds
+    TOUCH_INTERVAL = 60
+    # Check the size cap every this many writes
+    EVICT_EVERY = 32
+
+    def __init__(self, path: str, ttl: float = 3600, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        if hasattr(os, "register_at_fork"):
+            # A connection must not be used across fork; forked workers open their own
+            os.register_at_fork(after_in_child=self._forget_connections)
+        # Create the file before SQLite does, so only its owner can read it
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, "
+                "expires REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def _forget_connections(self) -> None:
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections can't be shared between threads, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._connection()
+        now = time.time()
+        row = conn.execute(
+            "SELECT value, expires, accessed FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires, accessed = row
+        if expires < now:
+            with conn:
+                conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            return None
+        if now - accessed > self.TOUCH_INTERVAL:
+            with conn:
+                conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        size = len(key) + len(value)
+        if size > self.max_bytes:
+            return
+        conn = self._connection()
+        now = time.time()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, expires, accessed) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (key, value, size, now + self.ttl, now),
+            )
+        self._writes += 1
+        if self._writes % self.EVICT_EVERY == 0:
+            self._evict(conn, now)
+
+    def _evict(self, conn: sqlite3.Connection, now: float) -> None:
+        with conn:
+            conn.execute("DELETE FROM entries WHERE expires < ?", (now,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            if total <= self.max_bytes:
+                return
+            excess = total - self.max_bytes
+            doomed = []
+            for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+                doomed.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            conn.executemany("DELETE FROM entries WHERE key = ?", doomed)
+
+    def clear(self) -> None:
+        conn = self._connection()
+        with conn:
+            conn.execute("DELETE FROM entries")
+
+    def stats(self) -> Dict[str, Any]:
+        entries, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        return {"backend": "sqlite", "path": self.path, "entries": entries, "bytes": size}
+
+
+class AnalysisCache:
+    """Memoizes JSON-serializable NLP results in a pluggable backend."""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        # Cached functions run on many NLP worker threads at once
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(name: str, args: tuple, kwargs: Dict[str, Any]) -> str:
+        payload = json.dumps([CACHE_VERSION, name, args, sorted(kwargs.items())], default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def cached(self, func: Optional[Callable] = None, *,
+               version: Optional[Callable[[], str]] = None) -> Callable:
+        """
+        Decorator that serves repeated calls with the same arguments from the cache.
+        ``version`` may return a string that is mixed into the key, for results that
+        also depend on state other than the arguments.
+        """
+        if func is None:
+            return functools.partial(self.cached, version=version)
+
+        name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key_name = f"{name}@{version()}" if version is not None else name
+            key = self.make_key(key_name, args, kwargs)
+            try:
+                stored = self.backend.get(key)
+            except sqlite3.Error:
+                stored = None
+            if stored is not None:
+                with self._lock:
+                    self.hits += 1
+                return json.loads(stored)
+
+            with self._lock:
+                self.misses += 1
+            result = func(*args, **kwargs)
+            try:
+                self.backend.set(key, json.dumps(result).encode("utf-8"))
+            except sqlite3.Error:
+                pass
+            return result
+
+        return wrapper
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        lookups = hits + misses
+        stats = {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / lookups if lookups else 0.0,
+        }
+        stats.update(self.backend.stats())
+        return stats
+
+
+def backend_from_env() -> CacheBackend:
+    """Create the cache backend selected by ``NLP_CACHE_BACKEND``."""
+    kind = os.environ.get("NLP_CACHE_BACKEND", "memory").lower()
+    ttl = float(os.environ.get("NLP_CACHE_TTL", "3600"))
+    max_bytes = int(os.environ.get("NLP_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+
+    if kind == "none":
+        return NullBackend()
+    if kind == "sqlite":
+        path = os.environ.get("NLP_CACHE_PATH")
+        if not path:
+            print("NLP_CACHE_BACKEND=sqlite needs NLP_CACHE_PATH; caching NLP results in memory instead")
+            return MemoryBackend(ttl=ttl, max_bytes=max_bytes)
+        try:
+            return SQLiteBackend(path, ttl=ttl, max_bytes=max_bytes)
+        except (OSError, sqlite3.Error):
+            # Fall back to a private cache if the shared file can't be opened
+            pass
+    return MemoryBackend(ttl=ttl, max_bytes=max_bytes)
+
+
+analysis_cache = AnalysisCache(backend_from_env())
+
+registry.sampled("dialogix_nlp_cache_hits_total", "NLP results served from the analysis cache.",
+                 "counter", [], lambda: {(): analysis_cache.hits})
+registry.sampled("dialogix_nlp_cache_misses_total", "NLP results computed because they were not cached.",
+                 "counter", [], lambda: {(): analysis_cache.misses})
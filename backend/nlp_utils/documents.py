@@ -0,0 +1,702 @@
+"""
+Upload-once document store with precomputed NLP artifacts.
+
+A document is ingested once and gets a content-addressed ``document_id``.
+Its summary, entities and a BM25 index over its passages are computed in the background on the
+NLP executor, so chat requests can reference the id instead of resending the
+text and re-running summarization and entity extraction on every turn.
+
+Uploads can also be streamed in with ``ingest_stream``. The text is then
+segmented, summarized, split into passages and scanned for entities piece by
+piece while it arrives, so processing starts before the last byte and the
+upload never exists in memory as one string. Only the passages (which the
+index needs anyway) are kept for a long streamed document, not its full text.
+
+With ``DOCUMENT_DIR`` set, processed documents are also written to that
+directory, so worker processes sharing it can each use a document uploaded to
+any of them. A process that is asked for a document it doesn't hold loads it
+from the directory, or waits for the process still working on it to finish.
+Each process keeps its own LRU of loaded documents on top.
+
+Configuration (environment variables):
+
+- ``DOCUMENT_STORE_MAX_DOCUMENTS`` - documents kept before the least recently
+  used is evicted (default: 128)
+- ``DOCUMENT_STORE_MAX_CHARS`` - total characters kept across documents (default: 200000000)
+- ``DOCUMENT_DIR`` - directory shared by worker processes (default: unset,
+  documents are only kept by the process they were uploaded to)
+- ``DOCUMENT_DIR_MAX_DOCUMENTS`` - documents kept in ``DOCUMENT_DIR`` before
+  the oldest is deleted (default: 1024)
+- ``DOCUMENT_PROCESSING_TIMEOUT`` - seconds to wait for a document another
+  process is processing (default: 300)
+"""
+import asyncio
+import codecs
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from .executor import NLPQueueFullError, run_nlp
+from .retrieval import ChunkIndex, document_context
+from .schema import Entity
+from .summarizer import ExtractiveSummarizer, SentenceSplitter, iter_sentences
+from .text_analysis import extract_entities, get_nlp
+
+# Characters handed to spaCy at once; well under its default max_length
+ENTITY_BLOCK_CHARS = 50000
+# Target size of the passages in the chunk index
+CHUNK_TARGET_CHARS = 600
+# Characters of a streamed upload handed to the NLP workers at once
+STREAM_PIECE_CHARS = 256 * 1024
+# Streamed documents up to this size keep their full text; it is only ever
+# used verbatim when a document is this short
+STREAM_KEEP_TEXT_CHARS = 64 * 1024
+# Seconds between checks on a document another process is processing
+SHARED_POLL_SECONDS = 0.25
+# Shared documents written between two sweeps of DOCUMENT_DIR
+SHARED_SWEEP_EVERY = 16
+
+DOCUMENT_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+# The files a DocumentStore writes to DOCUMENT_DIR: records, markers and their
+# temporary files. The sweep leaves anything else in the directory alone.
+SHARED_FILE_RE = re.compile(r"^[0-9a-f]{32}\.(json|processing)(\.\d+\.\d+\.tmp)?$")
+
+
+class DocumentNotFoundError(KeyError):
+    """Raised when a document id is unknown or has been evicted."""
+
+
+class DocumentProcessingError(RuntimeError):
+    """Raised when waiting on a document whose preprocessing failed."""
+
+
+def _text_blocks(text: str, size: int) -> Iterator[Tuple[int, str]]:
+    """Yield ``(offset, block)`` slices of at most ``size`` chars, cut at whitespace."""
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = text.rfind("\n", start, end)
+            if cut <= start:
+                cut = text.rfind(" ", start, end)
+            if cut > start:
+                end = cut + 1
+        yield start, text[start:end]
+        start = end
+
+
+def _block_entities(blocks: List[Tuple[int, str]]) -> List[Entity]:
+    """Entities of ``(offset, block)`` slices, with positions in the whole text."""
+    entities = []
+    for (offset, _), doc in zip(blocks, get_nlp().pipe(block for _, block in blocks)):
+        for ent in doc.ents:
+            entities.append({
+                "text": ent.text,
+                "label": ent.label_,
+                "start": offset + ent.start_char,
+                "end": offset + ent.end_char
+            })
+    return entities
+
+
+def document_entities(text: str) -> List[Entity]:
+    """Extract entities from text of any length, in blocks that fit spaCy's limits."""
+    return _block_entities(list(_text_blocks(text, ENTITY_BLOCK_CHARS)))
+
+
+def chunk_sentences(sentences: List[str], target_chars: int = CHUNK_TARGET_CHARS) -> List[str]:
+    """Group consecutive sentences into passages of roughly ``target_chars``."""
+    chunks = []
+    current: List[str] = []
+    size = 0
+    for sentence in sentences:
+        current.append(sentence)
+        size += len(sentence)
+        if size >= target_chars:
+            chunks.append(" ".join(current))
+            current = []
+            size = 0
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
+
+
+def build_document_artifacts(text: str) -> Dict[str, Any]:
+    """Compute everything the personas need from a document in one pass over its sentences."""
+    sentences = list(iter_sentences(text))
+    summarizer = ExtractiveSummarizer()
+    summarizer.add_all(sentences)
+    summary = text if summarizer.sentence_count <= summarizer.num_sentences else summarizer.summary()
+    chunks = chunk_sentences(sentences)
+
+    return {
+        "summary": summary,
+        "entities": document_entities(text),
+        "summary_entities": extract_entities(summary),
+        "chunks": chunks,
+        "index": ChunkIndex(chunks),
+        "sentence_count": len(sentences),
+    }
+
+
+class DocumentStream:
+    """
+    Incremental counterpart of build_document_artifacts for text that arrives
+    in pieces. It holds at most one sentence window, one summarizer chunk, one
+    passage and one entity block; finished passages and entities are handed
+    back from ``feed``, so its size doesn't grow with the document and it can
+    be sent to a process pool worker and back with every piece.
+    """
+
+    def __init__(self):
+        self.splitter = SentenceSplitter()
+        self.summarizer = ExtractiveSummarizer()
+        self._passage: List[str] = []
+        self._passage_chars = 0
+        self._entity_text = ""
+        self._entity_offset = 0
+
+    @property
+    def sentence_count(self) -> int:
+        return self.summarizer.sentence_count
+
+    def feed(self, text: str, final: bool = False) -> Tuple[List[str], List[Entity]]:
+        """Process the next piece of text; returns the passages and entities it completed."""
+        sentences = self.splitter.feed(text) if text else []
+        if final:
+            sentences += self.splitter.close()
+        passages = []
+        for sentence in sentences:
+            self.summarizer.add(sentence)
+            # Same grouping as chunk_sentences
+            self._passage.append(sentence)
+            self._passage_chars += len(sentence)
+            if self._passage_chars >= CHUNK_TARGET_CHARS:
+                passages.append(" ".join(self._passage))
+                self._passage = []
+                self._passage_chars = 0
+        if final and self._passage:
+            passages.append(" ".join(self._passage))
+            self._passage = []
+
+        self._entity_text += text
+        blocks = []
+        for offset, block in _text_blocks(self._entity_text, ENTITY_BLOCK_CHARS):
+            if not final and offset + len(block) == len(self._entity_text):
+                # The last block may be cut mid-word; it waits for more text
+                break
+            blocks.append((self._entity_offset + offset, block))
+        consumed = sum(len(block) for _, block in blocks)
+        self._entity_text = self._entity_text[consumed:]
+        self._entity_offset += consumed
+        return passages, _block_entities(blocks) if blocks else []
+
+
+def feed_document_stream(stream: DocumentStream, text: str,
+                         final: bool = False) -> Tuple[List[str], List[Entity], DocumentStream]:
+    """Run ``stream.feed`` on an NLP worker; the stream comes back with the results."""
+    passages, entities = stream.feed(text, final)
+    return passages, entities, stream
+
+
+def finish_document_stream(stream: DocumentStream, chunks: List[str], text: Optional[str]) -> Dict[str, Any]:
+    """The artifacts of a fully streamed document, as build_document_artifacts returns them."""
+    summarizer = stream.summarizer
+    if summarizer.sentence_count > summarizer.num_sentences or text is None:
+        summary = summarizer.summary()
+    else:
+        summary = text
+    return {
+        "summary": summary,
+        "summary_entities": extract_entities(summary),
+        "chunks": chunks,
+        "index": ChunkIndex(chunks),
+        "sentence_count": summarizer.sentence_count,
+    }
+
+
+def _write_json(path: str, data: Dict[str, Any]) -> None:
+    """Write ``data`` to ``path`` in one step, so readers never see half a file."""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def artifacts_from_record(record: Dict[str, Any], with_index: bool = True) -> Dict[str, Any]:
+    """The artifacts of a document another process stored, with its index rebuilt."""
+    return {
+        "summary": record["summary"],
+        "entities": record["entities"],
+        "summary_entities": record["summary_entities"],
+        "chunks": record["chunks"],
+        "index": ChunkIndex(record["chunks"]) if with_index else None,
+        "sentence_count": record["sentence_count"],
+    }
+
+
+class StoredDocument:
+    """A document and the artifacts precomputed for it."""
+
+    def __init__(self, document_id: str, text: Optional[str], filename: Optional[str] = None,
+                 size: Optional[int] = None):
+        self.document_id = document_id
+        # None for long streamed uploads, which only keep their passages
+        self.text = text
+        self.size = len(text) if size is None else size
+        self.filename = filename
+        self.status = "processing"  # processing, ready or failed
+        self.error: Optional[str] = None
+        self._exception: Optional[BaseException] = None
+        self.created_at = time.time()
+        self.summary: Optional[str] = None
+        self.entities: List[Entity] = []
+        self.summary_entities: List[Entity] = []
+        self.chunks: List[str] = []
+        self.index: Optional[ChunkIndex] = None
+        self.sentence_count = 0
+        self._ready = asyncio.Event()
+
+    def summary_for(self, max_length: int) -> str:
+        """Mirror summarize_text: short documents are used verbatim."""
+        if self.text is not None and self.size <= max_length:
+            return self.text
+        return self.summary
+
+    def summary_entities_for(self, max_length: int) -> List[Entity]:
+        """Entities of ``summary_for(max_length)``."""
+        if self.text is not None and self.size <= max_length:
+            return self.entities
+        return self.summary_entities
+
+    def context_for(self, query: str) -> str:
+        """The passages relevant to ``query``, or the whole text if it is short."""
+        return document_context(self.text, self.index, query, self.summary)
+
+    def apply_artifacts(self, artifacts: Dict[str, Any]) -> None:
+        self.summary = artifacts["summary"]
+        self.entities = artifacts["entities"]
+        self.summary_entities = artifacts["summary_entities"]
+        self.chunks = artifacts["chunks"]
+        self.index = artifacts["index"]
+        self.sentence_count = artifacts["sentence_count"]
+        self.status = "ready"
+        self._ready.set()
+
+    def record(self) -> Dict[str, Any]:
+        """Everything but the index, which other processes rebuild from the chunks."""
+        return {
+            "document_id": self.document_id,
+            "filename": self.filename,
+            "size": self.size,
+            "text": self.text,
+            "created_at": self.created_at,
+            "summary": self.summary,
+            "entities": self.entities,
+            "summary_entities": self.summary_entities,
+            "chunks": self.chunks,
+            "sentence_count": self.sentence_count,
+        }
+
+    def fail(self, exc: BaseException) -> None:
+        self.status = "failed"
+        self.error = str(exc)
+        self._exception = exc
+        self._ready.set()
+
+    async def wait_ready(self) -> "StoredDocument":
+        await self._ready.wait()
+        if self.status == "failed":
+            if isinstance(self._exception, NLPQueueFullError):
+                # Overload is transient; let callers answer with a retryable error
+                raise self._exception
+            raise DocumentProcessingError(f"Document {self.document_id} could not be processed: {self.error}")
+        return self
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "document_id": self.document_id,
+            "filename": self.filename,
+            "status": self.status,
+            "size": self.size,
+            "sentence_count": self.sentence_count,
+            "chunk_count": len(self.chunks),
+            "summary": self.summary,
+            "error": self.error,
+        }
+
+
+class DocumentStore:
+    """
+    In-memory LRU of ingested documents, bounded by count and total size, and
+    optionally backed by a directory shared with other worker processes.
+    """
+
+    def __init__(self, max_documents: int = 128, max_chars: int = 200_000_000, directory: Optional[str] = None,
+                 max_shared: int = 1024, processing_timeout: float = 300):
+        self.max_documents = max_documents
+        self.max_chars = max_chars
+        self.directory = directory
+        self.max_shared = max_shared
+        self.processing_timeout = processing_timeout
+        self._documents: "OrderedDict[str, StoredDocument]" = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+        self._tasks = set()
+        self._shared_writes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def document_id_for(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:32]
+
+    def ingest(self, text: str, filename: Optional[str] = None) -> StoredDocument:
+        """
+        Store ``text`` and start computing its artifacts in the background.
+        Ingesting the same text again returns the existing document. Must be
+        called from the event loop thread.
+        """
+        document_id = self.document_id_for(text)
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is not None and document.status != "failed":
+                self._documents.move_to_end(document_id)
+                return document
+            if document is not None:
+                # Give documents whose processing failed another try
+                del self._documents[document_id]
+                self._chars -= document.size
+            document = StoredDocument(document_id, text, filename)
+            self._add(document)
+
+        # Before the id is handed out, so other processes know to wait for it
+        self._mark(document)
+        self._start(self._process(document))
+        return document
+
+    def _start(self, coroutine: Any) -> None:
+        task = asyncio.ensure_future(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _add(self, document: StoredDocument) -> None:
+        self._documents[document.document_id] = document
+        self._chars += document.size
+        while len(self._documents) > 1 and (
+            len(self._documents) > self.max_documents or self._chars > self.max_chars
+        ):
+            _, evicted = self._documents.popitem(last=False)
+            self._chars -= evicted.size
+
+    def _discard(self, document: StoredDocument) -> None:
+        with self._lock:
+            if self._documents.get(document.document_id) is document:
+                del self._documents[document.document_id]
+                self._chars -= document.size
+
+    async def _process(self, document: StoredDocument) -> None:
+        record = None
+        if self.directory is not None:
+            loop = asyncio.get_running_loop()
+            record = await loop.run_in_executor(None, _read_json, self._path(document.document_id, "json"))
+        try:
+            if record is not None:
+                # Another process already did the work
+                artifacts = await run_nlp(artifacts_from_record, record)
+                _remove(self._path(document.document_id, "processing"))
+            else:
+                artifacts = await run_nlp(build_document_artifacts, document.text)
+        except Exception as e:
+            document.fail(e)
+            self._mark(document)
+            return
+        document.apply_artifacts(artifacts)
+        if record is None:
+            await self._share(document)
+
+    async def ingest_stream(self, data: AsyncIterable[bytes], filename: Optional[str] = None) -> StoredDocument:
+        """
+        Store a UTF-8 document read from ``data`` and process it while it arrives.
+        Each piece is analysed on the NLP executor while the next one is read, so
+        at most two pieces of raw text are in memory at once; the passages and
+        entities the document keeps grow with it, which is why callers should
+        cap the size of ``data``. The document is added to the
+        store once its last byte is in, and its index is finished in the background;
+        if the same text is already stored, that document is returned instead.
+        """
+        decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+        digest = hashlib.sha256()
+        stream = DocumentStream()
+        kept: Optional[List[str]] = []
+        size = 0
+        chunks: List[str] = []
+        entities: List[Entity] = []
+        pending: Optional[asyncio.Future] = None
+
+        async def collect() -> None:
+            nonlocal stream
+            passages, found, stream = await pending
+            chunks.extend(passages)
+            entities.extend(found)
+
+        async def pieces() -> AsyncIterator[str]:
+            buffered: List[str] = []
+            buffered_chars = 0
+            async for raw in data:
+                text = decoder.decode(raw)
+                buffered.append(text)
+                buffered_chars += len(text)
+                if buffered_chars >= STREAM_PIECE_CHARS:
+                    yield "".join(buffered)
+                    buffered = []
+                    buffered_chars = 0
+            buffered.append(decoder.decode(b"", final=True))
+            yield "".join(buffered)
+
+        try:
+            async for piece in pieces():
+                if not piece:
+                    continue
+                digest.update(piece.encode("utf-8"))
+                size += len(piece)
+                if kept is not None:
+                    kept.append(piece)
+                    if size > STREAM_KEEP_TEXT_CHARS:
+                        kept = None
+                if pending is not None:
+                    await collect()
+                pending = asyncio.ensure_future(run_nlp(feed_document_stream, stream, piece))
+            if pending is not None:
+                await collect()
+            pending = asyncio.ensure_future(run_nlp(feed_document_stream, stream, "", True))
+            await collect()
+        finally:
+            if pending is not None and not pending.done():
+                # The upload failed; let the piece being analysed finish unobserved
+                pending.add_done_callback(lambda future: future.cancelled() or future.exception())
+
+        text = "".join(kept) if kept is not None else None
+        # Same id as ingest() gives the same text
+        document_id = digest.hexdigest()[:32]
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is not None and document.status != "failed":
+                self._documents.move_to_end(document_id)
+                return document
+            if document is not None:
+                del self._documents[document_id]
+                self._chars -= document.size
+            document = StoredDocument(document_id, text, filename, size=size)
+            self._add(document)
+
+        self._mark(document)
+        self._start(self._finish_stream(document, stream, chunks, entities))
+        return document
+
+    async def _finish_stream(self, document: StoredDocument, stream: DocumentStream,
+                             chunks: List[str], entities: List[Entity]) -> None:
+        try:
+            artifacts = await run_nlp(finish_document_stream, stream, chunks, document.text)
+        except Exception as e:
+            document.fail(e)
+            self._mark(document)
+            return
+        artifacts["entities"] = entities
+        document.apply_artifacts(artifacts)
+        await self._share(document)
+
+    def _local(self, document_id: str) -> Optional[StoredDocument]:
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is not None:
+                self._documents.move_to_end(document_id)
+            return document
+
+    def get(self, document_id: str) -> StoredDocument:
+        """
+        The stored document. One that another process stored is returned as a
+        snapshot of its state on disk, without loading it into this process.
+        """
+        document = self._local(document_id)
+        if document is not None:
+            return document
+        found = self._read_shared(document_id)
+        if found is None:
+            raise DocumentNotFoundError(document_id)
+        document, record = found
+        if record is not None:
+            document.apply_artifacts(artifacts_from_record(record, with_index=False))
+        return document
+
+    async def get_ready(self, document_id: str) -> StoredDocument:
+        """
+        Return the document once its artifacts are available, loading it from
+        the shared directory if another process stored it.
+        """
+        document = self._local(document_id)
+        if document is None:
+            document = await self._open_shared(document_id)
+        return await document.wait_ready()
+
+    # Sharing documents through DOCUMENT_DIR. Each document is a <id>.json
+    # record once processed, and a small <id>.processing marker before that
+    # (which also carries the error if processing failed).
+
+    def _path(self, document_id: str, kind: str) -> str:
+        return os.path.join(self.directory, f"{document_id}.{kind}")
+
+    def _read_shared(self, document_id: str) -> Optional[Tuple[StoredDocument, Optional[Dict[str, Any]]]]:
+        """
+        A document another process stored, and its record if it is processed.
+        The document is still processing or already failed otherwise.
+        """
+        if self.directory is None or not DOCUMENT_ID_RE.match(document_id):
+            return None
+        record = _read_json(self._path(document_id, "json"))
+        if record is not None:
+            document = StoredDocument(document_id, record["text"], record["filename"], size=record["size"])
+            document.created_at = record["created_at"]
+            return document, record
+        marker = _read_json(self._path(document_id, "processing"))
+        if marker is None:
+            return None
+        document = StoredDocument(document_id, None, marker["filename"], size=marker["size"])
+        document.created_at = marker["created_at"]
+        if marker["error"] is not None:
+            document.fail(DocumentProcessingError(marker["error"]))
+        elif time.time() - marker["updated_at"] > self.processing_timeout:
+            document.fail(DocumentProcessingError("the worker processing it did not finish"))
+        return document, None
+
+    async def _open_shared(self, document_id: str) -> StoredDocument:
+        loop = asyncio.get_running_loop()
+        found = await loop.run_in_executor(None, self._read_shared, document_id)
+        if found is None:
+            raise DocumentNotFoundError(document_id)
+        shared, record = found
+        if shared.status == "failed":
+            return shared
+        with self._lock:
+            document = self._documents.get(document_id)
+            if document is not None:
+                # Loaded by a concurrent request in the meantime
+                return document
+            self._add(shared)
+        self._start(self._follow(shared, record))
+        return shared
+
+    async def _follow(self, document: StoredDocument, record: Optional[Dict[str, Any]]) -> None:
+        """Load a shared document, waiting for the process working on it to store it first."""
+        loop = asyncio.get_running_loop()
+        try:
+            while record is None:
+                await asyncio.sleep(SHARED_POLL_SECONDS)
+                found = await loop.run_in_executor(None, self._read_shared, document.document_id)
+                if found is None:
+                    raise DocumentNotFoundError(document.document_id)
+                shared, record = found
+                if shared.status == "failed":
+                    raise DocumentProcessingError(shared.error)
+            artifacts = await run_nlp(artifacts_from_record, record)
+        except Exception as e:
+            document.fail(e)
+            # The next request looks at the directory again
+            self._discard(document)
+            return
+        document.text = record["text"]
+        document.apply_artifacts(artifacts)
+
+    def _mark(self, document: StoredDocument) -> None:
+        """Tell other processes that ``document`` is being processed here, or that it failed."""
+        if self.directory is None:
+            return
+        marker = {
+            "filename": document.filename,
+            "size": document.size,
+            "created_at": document.created_at,
+            "error": document.error,
+            "updated_at": time.time(),
+        }
+        try:
+            _write_json(self._path(document.document_id, "processing"), marker)
+        except OSError as e:
+            print(f"Could not share document {document.document_id}: {str(e)}")
+
+    async def _share(self, document: StoredDocument) -> None:
+        """Store a processed document for other processes."""
+        if self.directory is None:
+            return
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._write_shared, document.record())
+        except OSError as e:
+            print(f"Could not share document {document.document_id}: {str(e)}")
+
+    def _write_shared(self, record: Dict[str, Any]) -> None:
+        _write_json(self._path(record["document_id"], "json"), record)
+        _remove(self._path(record["document_id"], "processing"))
+        with self._lock:
+            self._shared_writes += 1
+            sweep = self._shared_writes % SHARED_SWEEP_EVERY == 0
+        if sweep:
+            self._sweep_shared()
+
+    def _sweep_shared(self) -> None:
+        """
+        Delete the oldest records beyond ``max_shared``, and the markers and
+        temporary files of processing that was abandoned.
+        """
+        now = time.time()
+        records = []
+        stale = []
+        for entry in os.scandir(self.directory):
+            match = SHARED_FILE_RE.match(entry.name)
+            try:
+                if match is None or not entry.is_file(follow_symlinks=False):
+                    continue
+                modified = entry.stat(follow_symlinks=False).st_mtime
+            except OSError:
+                continue
+            if match.group(1) == "json" and match.group(2) is None:
+                records.append((modified, entry.path))
+            elif now - modified > self.processing_timeout:
+                stale.append(entry.path)
+        records.sort()
+        for path in stale + [path for _, path in records[:max(0, len(records) - self.max_shared)]]:
+            try:
+                _remove(path)
+            except OSError as e:
+                print(f"Could not remove shared document file {path}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"documents": len(self._documents), "chars": self._chars}
+
+
+document_store = DocumentStore(
+    max_documents=int(os.environ.get("DOCUMENT_STORE_MAX_DOCUMENTS", "128")),
+    max_chars=int(os.environ.get("DOCUMENT_STORE_MAX_CHARS", "200000000")),
+    directory=os.environ.get("DOCUMENT_DIR") or None,
+    max_shared=int(os.environ.get("DOCUMENT_DIR_MAX_DOCUMENTS", "1024")),
+    processing_timeout=float(os.environ.get("DOCUMENT_PROCESSING_TIMEOUT", "300")),
+)
@@ -0,0 +1,198 @@
+"""
+Worker pool for running the blocking NLP functions off the event loop.
+
+spaCy, VADER and TF-IDF are CPU-bound, so calling them directly from an
+``async def`` handler stalls every other request on the uvicorn loop. This
+module hands those calls to a thread or process pool and caps the number of
+calls that may be running or waiting at once. ``run_nlp_shared`` additionally
+coalesces identical calls that are in flight at the same time.
+
+Configuration (environment variables):
+
+- ``NLP_EXECUTOR`` - ``thread`` (default) or ``process``
+- ``NLP_WORKERS`` - number of pool workers (default: CPU count)
+- ``NLP_MAX_QUEUE`` - calls allowed to wait for a free worker (default: 64)
+"""
+import asyncio
+import functools
+import hashlib
+import json
+import multiprocessing
+import os
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+from .metrics import NLP_CALL_SECONDS, NLP_REJECTED, registry
+from .profiling import profiled
+from .singleflight import SingleFlight
+
+T = TypeVar("T")
+
+
+class NLPQueueFullError(RuntimeError):
+    """Raised when the NLP pool already has the maximum number of pending calls."""
+
+
+class NLPExecutor:
+    """
+    Runs NLP functions in a thread or process pool with a bounded backlog.
+    Calls beyond ``max_workers + max_queue`` are rejected immediately with
+    NLPQueueFullError instead of piling up behind a slow document.
+    """
+
+    def __init__(self, mode: str = "thread", max_workers: Optional[int] = None, max_queue: int = 64):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown NLP executor mode: {mode}")
+        self.mode = mode
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                # Workers are started on demand, possibly while the model warm-up
+                # thread holds a lock; a forked child would inherit it held
+                # forever, so they are started from a clean forkserver instead
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="nlp-worker"
+                )
+        return self._executor
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.max_queue
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run ``func(*args, **kwargs)`` in the pool and await its result."""
+        # The counter is only touched from the event loop thread, so no lock is needed
+        if self._pending >= self.capacity:
+            NLP_REJECTED.inc()
+            raise NLPQueueFullError(
+                f"NLP queue is full ({self._pending} pending, capacity {self.capacity})"
+            )
+        loop = asyncio.get_running_loop()
+        call = functools.partial(func, *args, **kwargs)
+        if self.mode == "thread":
+            # Profiled in the worker when the request asked for a profile
+            call = profiled(call)
+        self._pending += 1
+        try:
+            future = self._get_executor().submit(call)
+        except BaseException:
+            self._pending -= 1
+            raise
+
+        # A call already running in a worker can't be stopped, so it outlives a
+        # caller that is cancelled while awaiting it; its slot is only freed
+        # once the worker is done with it
+        def done(_: Future) -> None:
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                # The loop is gone; nothing else can be touching the counter
+                self._release()
+
+        future.add_done_callback(done)
+        with NLP_CALL_SECONDS.time(getattr(func, "__name__", "unknown")):
+            return await asyncio.wrap_future(future)
+
+    def _release(self) -> None:
+        self._pending -= 1
+
+    async def map_chunks(self, func: Callable[..., List[T]], items: Sequence[Any],
+                         min_chunk_size: int = 64, **kwargs: Any) -> List[T]:
+        """
+        Split ``items`` into at most one chunk per worker, run ``func(chunk, **kwargs)``
+        on each chunk in parallel and concatenate the results in input order.
+        """
+        if not items:
+            return []
+        chunk_size = max(min_chunk_size, -(-len(items) // self.max_workers))
+        chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+        results = await asyncio.gather(*(self.run(func, chunk, **kwargs) for chunk in chunks))
+        return [item for chunk_result in results for item in chunk_result]
+
+    def stats(self) -> Dict[str, Any]:
+        """Return the pool configuration and the current number of pending calls."""
+        return {
+            "mode": self.mode,
+            "workers": self.max_workers,
+            "max_queue": self.max_queue,
+            "pending": self._pending,
+            "queued": max(0, self._pending - self.max_workers),
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+
+_default_executor: Optional[NLPExecutor] = None
+
+
+def get_nlp_executor() -> NLPExecutor:
+    """Return the process-wide NLP executor, configured from the environment."""
+    global _default_executor
+    if _default_executor is None:
+        workers = os.environ.get("NLP_WORKERS")
+        _default_executor = NLPExecutor(
+            mode=os.environ.get("NLP_EXECUTOR", "thread"),
+            max_workers=int(workers) if workers else None,
+            max_queue=int(os.environ.get("NLP_MAX_QUEUE", "64")),
+        )
+    return _default_executor
+
+
+async def run_nlp(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run an NLP function on the shared executor."""
+    return await get_nlp_executor().run(func, *args, **kwargs)
+
+
+nlp_flight = SingleFlight()
+
+
+async def run_nlp_shared(func: Callable[..., T], *args: Any) -> T:
+    """
+    Like ``run_nlp``, but concurrent calls with the same function and arguments
+    share one run. Each caller gets its own copy of the result.
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+    key = hashlib.sha256(json.dumps([name, args], default=str).encode("utf-8")).hexdigest()
+    return await nlp_flight.do(key, lambda: run_nlp(func, *args))
+
+
+async def map_nlp(func: Callable[..., List[T]], items: Sequence[Any], **kwargs: Any) -> List[T]:
+    """Run a batch NLP function over ``items`` in parallel chunks on the shared executor."""
+    return await get_nlp_executor().map_chunks(func, items, **kwargs)
+
+
+def _executor_samples(field: str) -> Dict[Tuple[str, ...], float]:
+    if _default_executor is None:
+        return {}
+    return {(): _default_executor.stats()[field]}
+
+
+def _flight_samples(field: str) -> Dict[Tuple[str, ...], float]:
+    return {(): nlp_flight.stats()[field]}
+
+
+registry.sampled("dialogix_nlp_pending", "NLP calls running or waiting for a worker.", "gauge", [],
+                 lambda: _executor_samples("pending"))
+registry.sampled("dialogix_nlp_queued", "NLP calls waiting for a free worker.", "gauge", [],
+                 lambda: _executor_samples("queued"))
+registry.sampled("dialogix_nlp_coalesced_total", "NLP calls that shared an identical call in flight.",
+                 "counter", [], lambda: _flight_samples("coalesced"))
+
+
+def shutdown_nlp_executor() -> None:
+    global _default_executor
+    if _default_executor is not None:
+        _default_executor.shutdown()
+        _default_executor = None
@@ -0,0 +1,109 @@
+"""
+Rolling compaction of conversation history for prompts.
+
+Short conversations are passed to the persona verbatim. Once a conversation
+no longer fits its persona's token budget, the oldest turns are folded into
+a running extractive summary a block at a time, and only the most recent
+turns stay verbatim. Each fold summarizes the previous summary plus one block
+of turns, so its cost does not grow with the length of the conversation, and
+folds are cached by content so a block is only summarized once no matter how
+many later requests replay it.
+
+Token counts are estimated at four characters per token.
+
+Configuration (environment variables):
+
+- ``HISTORY_TOKEN_BUDGET`` - tokens of history a prompt may carry (default: 1500)
+- ``HISTORY_TOKEN_BUDGET_<PERSONA>`` - per-persona override, e.g. ``HISTORY_TOKEN_BUDGET_PROFESSOR``
+- ``HISTORY_KEEP_TURNS`` - most recent turns always kept verbatim, budget permitting (default: 6)
+- ``HISTORY_SUMMARY_SENTENCES`` - sentences in the summary of older turns (default: 5)
+"""
+import os
+from typing import List, NamedTuple, Tuple
+
+from .cache import analysis_cache
+from .summarizer import ExtractiveSummarizer, iter_sentences
+
+DEFAULT_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "1500"))
+KEEP_TURNS = int(os.environ.get("HISTORY_KEEP_TURNS", "6"))
+SUMMARY_SENTENCES = int(os.environ.get("HISTORY_SUMMARY_SENTENCES", "5"))
+# Turns folded into the summary at a time; aligning folds to blocks lets
+# later requests reuse the cached result of earlier ones
+FOLD_BLOCK = 4
+
+
+class CompactionState(NamedTuple):
+    """How many turns have been folded into ``summary`` so far."""
+    folded: int = 0
+    summary: str = ""
+
+
+def estimate_tokens(text: str) -> int:
+    return tokens_for_chars(len(text))
+
+
+def tokens_for_chars(chars: int) -> int:
+    """Token estimate for a text of ``chars`` characters."""
+    return (chars + 3) // 4
+
+
+def history_token_budget(persona_id: str) -> int:
+    """Token budget for a persona's history, honouring ``HISTORY_TOKEN_BUDGET_<PERSONA>``."""
+    override = os.environ.get(f"HISTORY_TOKEN_BUDGET_{persona_id.upper()}")
+    return int(override) if override else DEFAULT_TOKEN_BUDGET
+
+
+@analysis_cache.cached
+def fold_turns(summary: str, lines: List[str], num_sentences: int = SUMMARY_SENTENCES) -> str:
+    """Fold a block of turns into the running summary of the conversation."""
+    summarizer = ExtractiveSummarizer(num_sentences)
+    for piece in ([summary] if summary else []) + lines:
+        summarizer.add_all(iter_sentences(piece))
+    return summarizer.summary()
+
+
+def _render(summary: str, lines: List[str]) -> str:
+    recent = "\n".join(lines)
+    if not summary:
+        return recent
+    return f"Summary of earlier conversation: {summary}\n{recent}"
+
+
+def compact_history(lines: List[str], state: CompactionState = CompactionState(),
+                    token_budget: int = DEFAULT_TOKEN_BUDGET,
+                    keep_turns: int = KEEP_TURNS) -> Tuple[str, CompactionState]:
+    """
+    Render history for a prompt within ``token_budget``.
+
+    ``lines`` are the ``"sender: message"`` turns not yet folded into
+    ``state``. Returns the prompt text and the new state, which callers that
+    keep the conversation (sessions) pass back in with only the turns added
+    since, so earlier folds are never redone.
+    """
+    summary = state.summary
+    folded = state.folded
+    pending = list(lines)
+
+    text = _render(summary, pending)
+    if not summary and estimate_tokens(text) <= token_budget:
+        return text, state
+
+    # Fold whole blocks of everything but the most recent turns
+    while len(pending) - FOLD_BLOCK >= keep_turns:
+        summary = fold_turns(summary, pending[:FOLD_BLOCK], SUMMARY_SENTENCES)
+        pending = pending[FOLD_BLOCK:]
+        folded += FOLD_BLOCK
+
+    # Recent turns can still be too long; fold more of them, keeping the last one
+    text = _render(summary, pending)
+    while len(pending) > 1 and estimate_tokens(text) > token_budget:
+        step = min(FOLD_BLOCK, len(pending) - 1)
+        summary = fold_turns(summary, pending[:step], SUMMARY_SENTENCES)
+        pending = pending[step:]
+        folded += step
+        text = _render(summary, pending)
+
+    if estimate_tokens(text) > token_budget:
+        # A single oversized message: keep its end, which is what the reply follows from
+        text = text[-token_budget * 4:]
+    return text, CompactionState(folded, summary)
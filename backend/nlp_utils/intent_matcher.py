@@ -0,0 +1,93 @@
+"""
+Single-pass keyword matcher for intent scoring.
+
+The keyword table is compiled once into a word-level trie. Scoring a message
+tokenizes it once and walks the trie from each token, so the cost is linear
+in message length no matter how many intents or keywords there are. Matching
+works on whole words, so "hi" no longer matches inside "this", and
+overlapping keywords ("what" and "what do you mean") are all found.
+"""
+import hashlib
+import json
+import re
+from typing import Dict, List, Set, Tuple
+
+TOKEN_RE = re.compile(r"[\w']+")
+
+# Key under which a trie node stores the keywords that end at it
+_END = ""
+
+
+class IntentMatcher:
+    """Scores intents for a message from a compiled ``{intent: [keywords]}`` table."""
+
+    def __init__(self, keywords: Dict[str, List[str]]):
+        self.keywords = {intent: list(words) for intent, words in keywords.items()}
+        self.fingerprint = hashlib.sha1(
+            json.dumps(self.keywords, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:12]
+        self._trie: Dict[str, dict] = {}
+
+        for intent, words in self.keywords.items():
+            for keyword in words:
+                tokens = TOKEN_RE.findall(keyword.lower())
+                if not tokens:
+                    continue
+                node = self._trie
+                for token in tokens:
+                    node = node.setdefault(token, {})
+                node.setdefault(_END, []).append((intent, keyword))
+
+    def _matches(self, tokens: List[str], first_leads: bool) -> Tuple[Dict[str, Set[str]], Set[Tuple[str, str]]]:
+        """
+        Return the keywords found per intent and those found at the start of the
+        message, which only counts when ``first_leads`` (nothing but whitespace
+        comes before the first token).
+        """
+        found: Dict[str, Set[str]] = {}
+        leading: Set[Tuple[str, str]] = set()
+
+        for i in range(len(tokens)):
+            node = self._trie
+            for j in range(i, len(tokens)):
+                node = node.get(tokens[j])
+                if node is None:
+                    break
+                for intent, keyword in node.get(_END, ()):
+                    found.setdefault(intent, set()).add(keyword)
+                    if i == 0 and first_leads:
+                        leading.add((intent, keyword))
+
+        return found, leading
+
+    def score(self, text: str) -> Dict[str, float]:
+        """
+        Score each intent like the original keyword loop: one point per keyword
+        present, half a point more if the message starts with it, normalized by
+        half the intent's keyword count and capped at 1.0.
+        """
+        text = text.lower()
+        words = list(TOKEN_RE.finditer(text))
+        # "...help" or "(help" doesn't start with the keyword; only whitespace may precede it
+        first_leads = bool(words) and not text[:words[0].start()].strip()
+        found, leading = self._matches([word.group() for word in words], first_leads)
+        intents = {}
+
+        # Iterate in table order so ties resolve the same way as before
+        for intent, keywords in self.keywords.items():
+            matched = found.get(intent)
+            if not matched:
+                continue
+            score = len(matched) + 0.5 * sum(1 for keyword in matched if (intent, keyword) in leading)
+            intents[intent] = min(1.0, score / (len(keywords) * 0.5))
+
+        return intents
+
+
+def load_intent_keywords(path: str) -> Dict[str, List[str]]:
+    """Read an ``{intent: [keywords]}`` table from a JSON file."""
+    with open(path, encoding="utf-8") as f:
+        keywords = json.load(f)
+    if not isinstance(keywords, dict) or not all(isinstance(v, list) for v in keywords.values()):
+        raise ValueError(f"{path} must contain a JSON object mapping intents to keyword lists")
+    return keywords
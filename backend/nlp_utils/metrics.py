@@ -0,0 +1,309 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Request handlers time each stage of a chat (document lookup, NLP analysis,
+history, prompt building, LLM call) into histograms labelled by stage and
+persona, and count the stages that fail. Stages cut short because the client
+went away are counted separately, so shedding load doesn't look like errors.
+Queue depths, cache hits and pool
+sizes are already tracked by the components themselves, so they are read at
+scrape time through callbacks instead of being updated on every request.
+
+Recording an observation is a dictionary lookup, a bisect over the bucket
+bounds and an increment under a lock, so the cost on the hot path is a few
+microseconds. The servers expose everything at ``GET /metrics`` via
+``instrument_app``, which also times every HTTP request.
+"""
+import asyncio
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans a cache hit through a slow LLM completion
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    """A named metric family with a fixed list of label names."""
+
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        # An unlabelled counter is reported as 0 before its first increment
+        self._values: Dict[LabelValues, float] = {} if self.labelnames else {(): 0.0}
+
+    def inc(self, *labelvalues: str, amount: float = 1.0) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: non-cumulative bucket counts (last one is +Inf), sum
+        self._values: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(labelvalues)
+            if entry is None:
+                entry = ([0] * (len(self.buckets) + 1), [0.0])
+                self._values[labelvalues] = entry
+            entry[0][index] += 1
+            entry[1][0] += value
+
+    @contextmanager
+    def time(self, *labelvalues: str) -> Iterator[None]:
+        """Observe the duration of the block, whether or not it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labelvalues)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total[0]) for key, (counts, total) in self._values.items()]
+        lines = []
+        for key, counts, total in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class Sampled(Metric):
+    """
+    A gauge or counter whose values are read from ``callback`` at scrape time.
+    The callback returns a mapping of label value tuples to numbers.
+    """
+
+    def __init__(self, name: str, help: str, type: str, labelnames: Sequence[str],
+                 callback: Callable[[], Dict[LabelValues, float]]):
+        super().__init__(name, help, labelnames)
+        self.type = type
+        self.callback = callback
+
+    def samples(self) -> List[str]:
+        try:
+            values = self.callback()
+        except Exception:
+            return []
+        return [f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in values.items()]
+
+
+class MetricsRegistry:
+    """Every metric family of the process, rendered together for a scrape."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def sampled(self, name: str, help: str, type: str, labelnames: Sequence[str],
+                callback: Callable[[], Dict[LabelValues, float]]) -> Sampled:
+        return self.register(Sampled(name, help, type, labelnames, callback))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return "\n".join(metric.render() for metric in metrics) + "\n"
+
+
+def process_memory(pid: str = "self") -> Dict[str, int]:
+    """
+    Memory of a process in bytes from ``/proc/<pid>/smaps_rollup`` (Linux):
+    ``rss``, ``pss`` (shared pages divided among the processes sharing them),
+    ``uss`` (pages only this process uses) and ``shared``. Empty elsewhere.
+    """
+    fields: Dict[str, int] = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return {}
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+    }
+
+
+registry = MetricsRegistry()
+
+HTTP_REQUEST_SECONDS = registry.histogram(
+    "dialogix_http_request_duration_seconds",
+    "Time from receiving an HTTP request to sending the last byte of its response.",
+    ["method", "route", "status"],
+)
+STAGE_SECONDS = registry.histogram(
+    "dialogix_stage_duration_seconds",
+    "Time spent in each stage of a chat request.",
+    ["stage", "persona"],
+)
+STAGE_ERRORS = registry.counter(
+    "dialogix_stage_errors_total",
+    "Chat request stages that raised an error.",
+    ["stage", "persona"],
+)
+STAGE_CANCELLED = registry.counter(
+    "dialogix_stage_cancelled_total",
+    "Chat request stages cancelled before they finished, e.g. because the client disconnected.",
+    ["stage", "persona"],
+)
+NLP_CALL_SECONDS = registry.histogram(
+    "dialogix_nlp_call_duration_seconds",
+    "Time an NLP function call spent queued and running on the NLP workers.",
+    ["function"],
+)
+NLP_REJECTED = registry.counter(
+    "dialogix_nlp_rejected_total",
+    "NLP calls rejected because the worker queue was full.",
+)
+registry.sampled(
+    "dialogix_process_memory_bytes",
+    "Memory of this server process by kind: rss, pss, uss (private) and shared.",
+    "gauge", ["kind"], lambda: {(kind,): value for kind, value in process_memory().items()},
+)
+
+
+@contextmanager
+def stage(name: str, persona_id: str = "") -> Iterator[None]:
+    """
+    Time one stage of a chat request and count it as an error if it raises,
+    or as cancelled if the request was cancelled during it.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except asyncio.CancelledError:
+        STAGE_CANCELLED.inc(name, persona_id)
+        raise
+    except BaseException:
+        STAGE_ERRORS.inc(name, persona_id)
+        raise
+    finally:
+        STAGE_SECONDS.observe(time.perf_counter() - started, name, persona_id)
+
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """
+    The path template of the route that handled the request, e.g.
+    ``/api/sessions/{session_id}``, so ids in the path don't create a series
+    per request. Routing sets ``scope["route"]`` on the way in.
+    """
+    route = scope.get("route")
+    path = getattr(route, "path", None)
+    if path is None:
+        return "unmatched"
+    return path
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request by route template and status."""
+
+    def __init__(self, app: Any):
+        self.app = app
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = [500]
+
+        async def send_with_status(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(
+                time.perf_counter() - started, scope["method"], route_template(scope), str(status[0])
+            )
+
+
+def instrument_app(app: Any) -> None:
+    """Time every request of a FastAPI app and serve the registry at ``GET /metrics``."""
+    from fastapi.responses import Response
+
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics() -> Response:
+        return Response(registry.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,203 @@
+"""
+Opt-in profiling of single requests.
+
+Aggregate metrics show that requests are slow, not why one particular request
+is. A caller can ask for a deterministic ``cProfile`` of one request by
+sending the ``X-Profile: 1`` header or the ``?profile=1`` query flag, together
+with the configured token in the ``X-Profile-Token`` header, from an address
+on the allowlist. Behind a proxy or ingress the peer address is the proxy's,
+so the allowlist alone would admit every client; the token is what identifies
+the caller. The profile covers the request handler on the event loop thread (routing,
+session and history handling, prompt assembly, streaming) and every NLP call
+the request hands to the worker threads, which are profiled in the worker and
+merged into the same file. The result is a ``pstats`` file in ``PROFILE_DIR``
+that can be opened with ``python -m pstats`` or snakeviz; its name is returned
+in the ``X-Profile-File`` response header.
+
+Only one request is profiled at a time, since a thread can only run one
+profiler. While it runs, the event loop thread is shared with other requests,
+so their coroutines may show up in the profile too; profile on a quiet
+instance for clean numbers. NLP calls made in the ``process`` executor mode are
+not profiled. Requests without the flag only pay for a header lookup.
+
+Configuration (environment variables):
+
+- ``PROFILE_ALLOWED_CLIENTS`` - comma-separated client addresses or networks
+  allowed to request a profile; empty disables profiling (default: ``127.0.0.1,::1``)
+- ``PROFILE_TOKEN`` - secret a request must send in ``X-Profile-Token`` to be
+  profiled; unset disables profiling (default: unset)
+- ``PROFILE_DIR`` - where profiles are written (default: ``dialogix_profiles`` in the temp dir)
+"""
+import contextvars
+import cProfile
+import hmac
+import ipaddress
+import os
+import pstats
+import re
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+from urllib.parse import parse_qs
+
+T = TypeVar("T")
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "dialogix_profiles"))
+
+_SLUG_RE = re.compile(r"[^A-Za-z0-9]+")
+
+
+def parse_networks(value: str) -> List[Any]:
+    """Parse a comma-separated list of addresses and networks."""
+    networks = []
+    for entry in value.split(","):
+        entry = entry.strip()
+        if entry:
+            networks.append(ipaddress.ip_network(entry, strict=False))
+    return networks
+
+
+ALLOWED_CLIENTS = parse_networks(os.environ.get("PROFILE_ALLOWED_CLIENTS", "127.0.0.1,::1"))
+PROFILE_TOKEN = os.environ.get("PROFILE_TOKEN", "")
+
+
+class RequestProfile:
+    """The profiles collected for one request, from the loop thread and NLP workers."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def add(self, profile: cProfile.Profile) -> None:
+        with self._lock:
+            self._profiles.append(profile)
+
+    def dump(self, directory: str) -> str:
+        """Merge the collected profiles into one pstats file and return its path."""
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f"{self.name}.prof")
+        with self._lock:
+            profiles = list(self._profiles)
+        stats = pstats.Stats(profiles[0])
+        for profile in profiles[1:]:
+            stats.add(profile)
+        stats.dump_stats(path)
+        return path
+
+
+_current: contextvars.ContextVar[Optional[RequestProfile]] = contextvars.ContextVar(
+    "dialogix_request_profile", default=None
+)
+
+# A thread can only run one profiler, and every request shares the loop thread
+_profiling = threading.Lock()
+
+
+def profiled(call: Callable[[], T]) -> Callable[[], T]:
+    """
+    Wrap a call about to be handed to a worker thread so it is profiled there
+    when the current request is being profiled. Otherwise ``call`` is returned as is.
+    """
+    request_profile = _current.get()
+    if request_profile is None:
+        return call
+
+    def run() -> T:
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ profiles every thread from the request's own profiler
+            return call()
+        try:
+            return call()
+        finally:
+            profile.disable()
+            request_profile.add(profile)
+
+    return run
+
+
+def client_allowed(host: Optional[str]) -> bool:
+    if not host or not ALLOWED_CLIENTS:
+        return False
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return any(address in network for network in ALLOWED_CLIENTS)
+
+
+def token_valid(scope: Dict[str, Any]) -> bool:
+    if not PROFILE_TOKEN:
+        return False
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile-token":
+            return hmac.compare_digest(value, PROFILE_TOKEN.encode("utf-8"))
+    return False
+
+
+def profile_requested(scope: Dict[str, Any]) -> bool:
+    for name, value in scope.get("headers", ()):
+        if name == b"x-profile":
+            return value.strip() not in (b"", b"0")
+    query = scope.get("query_string", b"")
+    if b"profile" not in query:
+        return False
+    values = parse_qs(query.decode("latin-1")).get("profile")
+    return bool(values) and values[-1] != "0"
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests that carry the profile flag and token from an allowed client."""
+
+    def __init__(self, app: Any, directory: str = PROFILE_DIR):
+        self.app = app
+        self.directory = directory
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        if scope["type"] != "http" or not profile_requested(scope):
+            await self.app(scope, receive, send)
+            return
+        client = scope.get("client")
+        if (not token_valid(scope) or not client_allowed(client[0] if client else None)
+                or not _profiling.acquire(blocking=False)):
+            # Not allowed, or another profile is running: serve the request normally
+            await self.app(scope, receive, send)
+            return
+
+        slug = _SLUG_RE.sub("-", scope["path"]).strip("-") or "root"
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{scope['method'].lower()}-{slug}-{uuid.uuid4().hex[:8]}"
+        request_profile = RequestProfile(name)
+        header = [(b"x-profile-file", f"{name}.prof".encode("latin-1"))]
+
+        async def send_with_header(message: Dict[str, Any]) -> None:
+            if message["type"] == "http.response.start":
+                message = dict(message, headers=list(message.get("headers", [])) + header)
+            await send(message)
+
+        token = _current.set(request_profile)
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+            try:
+                await self.app(scope, receive, send_with_header)
+            finally:
+                profile.disable()
+        finally:
+            _current.reset(token)
+            request_profile.add(profile)
+            try:
+                request_profile.dump(self.directory)
+            except OSError as e:
+                print(f"Could not write profile {name}: {str(e)}")
+            _profiling.release()
+
+
+def enable_profiling(app: Any) -> None:
+    """Let allowlisted callers holding the token profile single requests of a FastAPI app."""
+    if ALLOWED_CLIENTS and PROFILE_TOKEN:
+        app.add_middleware(ProfilingMiddleware)
@@ -0,0 +1,144 @@
+"""
+JSON encoding and compression of responses.
+
+Endpoints that declare a ``response_model`` are serialized straight to bytes
+by pydantic on current FastAPI releases. Older releases validate the result,
+convert it back to plain Python with ``jsonable_encoder`` and run ``json.dumps``
+over it; there ``orjson`` is used for the last step when it is installed.
+Streamed events go through ``dumps``, which uses ``orjson`` too.
+
+Large responses are compressed with brotli when the client accepts it and the
+``brotli`` package is installed, and with gzip otherwise. Small responses and
+streamed ones (server-sent events must reach the client as they are produced)
+are sent as they are.
+
+Configuration (environment variables):
+
+- ``RESPONSE_COMPRESSION`` - compress large responses (default: 1)
+- ``RESPONSE_COMPRESSION_MIN_BYTES`` - smallest response body that is compressed (default: 1024)
+"""
+import asyncio
+import gzip
+import inspect
+import json
+import os
+from typing import Any, Callable, Dict, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION_ENABLED = os.environ.get("RESPONSE_COMPRESSION", "1") == "1"
+COMPRESSION_MIN_BYTES = int(os.environ.get("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+
+# Bodies larger than this are compressed on a worker thread, off the event loop
+THREAD_MIN_BYTES = 256 * 1024
+
+
+def dumps(data: Any) -> str:
+    """Encode ``data`` as compact JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, separators=(",", ":"))
+
+
+def json_response_class() -> Any:
+    """
+    The ``default_response_class`` for an app: FastAPI's own when it serializes
+    response models with pydantic directly, ``ORJSONResponse`` on older
+    releases when orjson is installed.
+    """
+    from fastapi import routing
+    from fastapi.datastructures import Default
+    from fastapi.responses import JSONResponse
+
+    if orjson is None or "dump_json" in inspect.signature(routing.serialize_response).parameters:
+        # Setting any response class would turn the pydantic fast path off
+        return Default(JSONResponse)
+    from fastapi.responses import ORJSONResponse
+    return ORJSONResponse
+
+
+def _accepted_encoding(scope: Dict[str, Any]) -> Optional[str]:
+    for name, value in scope.get("headers", ()):
+        if name == b"accept-encoding":
+            accepted = {part.split(b";")[0].strip() for part in value.lower().split(b",")}
+            if brotli is not None and b"br" in accepted:
+                return "br"
+            if b"gzip" in accepted:
+                return "gzip"
+            return None
+    return None
+
+
+def _compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        # Quality 4 compresses JSON better than gzip at a similar speed
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=6)
+
+
+class CompressionMiddleware:
+    """ASGI middleware compressing complete response bodies of at least ``minimum_size`` bytes."""
+
+    def __init__(self, app: Any, minimum_size: int = COMPRESSION_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable) -> None:
+        encoding = _accepted_encoding(scope) if scope["type"] == "http" else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start: Dict[str, Any] = {}
+        passthrough = [False]
+
+        async def send_compressed(message: Dict[str, Any]) -> None:
+            if passthrough[0]:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Held back until the body shows whether it is worth compressing
+                start.update(message)
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            headers = list(start.get("headers", []))
+            already_encoded = any(name.lower() == b"content-encoding" for name, _ in headers)
+            if message.get("more_body", False) or already_encoded or len(body) < self.minimum_size:
+                # Streamed, already encoded or too small: send everything as is
+                passthrough[0] = True
+                await send(start)
+                await send(message)
+                return
+
+            if len(body) >= THREAD_MIN_BYTES:
+                body = await asyncio.to_thread(_compress, body, encoding)
+            else:
+                body = _compress(body, encoding)
+            headers = [(name, value) for name, value in headers if name.lower() != b"content-length"]
+            headers += [
+                (b"content-encoding", encoding.encode("latin-1")),
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"vary", b"Accept-Encoding"),
+            ]
+            await send(dict(start, headers=headers))
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def enable_compression(app: Any) -> None:
+    """Compress large responses of a FastAPI app unless RESPONSE_COMPRESSION=0."""
+    if COMPRESSION_ENABLED:
+        app.add_middleware(CompressionMiddleware)
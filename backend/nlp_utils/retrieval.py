@@ -0,0 +1,84 @@
+"""
+BM25 retrieval over the passages of an uploaded document.
+
+Instead of pasting a whole document into a prompt, the personas ask the
+index for the passages most relevant to the user's message. The index is
+built once per document, next to its other precomputed artifacts: term counts
+come from scikit-learn's ``CountVectorizer`` and the BM25 weight of every
+(passage, term) pair is stored in a sparse matrix, so a query only touches
+the columns of its own terms.
+
+Configuration (environment variables):
+
+- ``RETRIEVAL_TOP_K`` - passages injected into a prompt (default: 4)
+- ``DOCUMENT_INLINE_CHARS`` - documents up to this size are still pasted whole (default: 4000)
+"""
+import os
+from typing import List, Optional
+
+RETRIEVAL_TOP_K = int(os.environ.get("RETRIEVAL_TOP_K", "4"))
+DOCUMENT_INLINE_CHARS = int(os.environ.get("DOCUMENT_INLINE_CHARS", "4000"))
+
+
+class ChunkIndex:
+    """Okapi BM25 index over a fixed list of passages."""
+
+    def __init__(self, chunks: List[str], k1: float = 1.5, b: float = 0.75):
+        import numpy as np
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        self.chunks = chunks
+        self.vectorizer = CountVectorizer(stop_words='english')
+        try:
+            counts = self.vectorizer.fit_transform(chunks).tocsr().astype(np.float64)
+        except ValueError:
+            # Nothing but stop words and punctuation: there is nothing to match on
+            self.weights = None
+            return
+
+        lengths = np.asarray(counts.sum(axis=1)).ravel()
+        avg_length = lengths.mean() or 1.0
+        doc_freq = np.bincount(counts.indices, minlength=counts.shape[1])
+        idf = np.log(1.0 + (len(chunks) - doc_freq + 0.5) / (doc_freq + 0.5))
+
+        # Turn each stored term frequency into its BM25 weight in place
+        norms = np.repeat(k1 * (1 - b + b * lengths / avg_length), np.diff(counts.indptr))
+        tf = counts.data
+        counts.data = idf[counts.indices] * tf * (k1 + 1) / (tf + norms)
+        # Column-major, so scoring a query reads only its terms' postings
+        self.weights = counts.tocsc()
+
+    def search(self, query: str, k: int = RETRIEVAL_TOP_K) -> List[int]:
+        """Indexes of the ``k`` best passages for ``query``, best first; empty if nothing matches."""
+        import numpy as np
+
+        if self.weights is None:
+            return []
+        terms = self.vectorizer.transform([query]).indices
+        if len(terms) == 0:
+            return []
+        scores = np.asarray(self.weights[:, np.unique(terms)].sum(axis=1)).ravel()
+        matched = np.flatnonzero(scores)
+        if len(matched) > k:
+            matched = matched[np.argpartition(-scores[matched], k - 1)[:k]]
+        return sorted(matched.tolist(), key=lambda i: (-scores[i], i))
+
+    def passages(self, query: str, k: int = RETRIEVAL_TOP_K) -> List[str]:
+        """The best passages for ``query``, in document order."""
+        return [self.chunks[i] for i in sorted(self.search(query, k))]
+
+
+def document_context(text: Optional[str], index: Optional[ChunkIndex], query: str, fallback: str,
+                     k: int = RETRIEVAL_TOP_K, inline_chars: int = DOCUMENT_INLINE_CHARS) -> str:
+    """
+    The part of a document worth putting in a prompt about ``query``: the whole
+    text if it is short, otherwise its ``k`` most relevant passages, or
+    ``fallback`` (the summary) when no passage shares a term with the query.
+    ``text`` is None for long documents whose full text was not kept.
+    """
+    if text is not None and len(text) <= inline_chars:
+        return text
+    passages = index.passages(query, k) if index is not None else []
+    if not passages:
+        return fallback
+    return "\n[...]\n".join(passages)
@@ -0,0 +1,33 @@
+"""
+Shapes of the analysis results returned by ``nlp_utils.text_analysis``.
+
+The functions build these as plain dictionaries with their final types, so the
+servers can validate and serialize them without converting anything. Response
+models use the same TypedDicts; pydantic checks them as dictionaries instead of
+creating a model instance per entity.
+"""
+from typing import Dict, List, Optional
+
+# typing.TypedDict can't be validated by pydantic before Python 3.12
+from typing_extensions import NotRequired, TypedDict
+
+# Score per sentiment, e.g. VADER's "neg", "neu", "pos" and "compound"
+Sentiment = Dict[str, float]
+
+# Intent name -> confidence between 0 and 1
+Intents = Dict[str, float]
+
+
+class Entity(TypedDict):
+    text: str
+    label: str
+    start: int
+    end: int
+
+
+class Analysis(TypedDict):
+    sentiment: Sentiment
+    entities: List[Entity]
+    intents: Intents
+    document_summary: NotRequired[Optional[str]]
+    document_entities: NotRequired[Optional[List[Entity]]]
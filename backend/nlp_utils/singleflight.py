@@ -0,0 +1,94 @@
+"""
+Coalescing of identical concurrent calls.
+
+When a user double-submits, or several tabs send the same message, every
+request used to run the same analysis and the same completion on its own.
+``SingleFlight`` lets the first caller for a key start the work and makes
+every caller that arrives while it is still running wait for that same
+result instead. Nothing is kept once the call finishes, so this only removes
+duplicate work during a burst; caching across bursts is left to the caches.
+
+Each caller still gets its own result: values are deep-copied per caller so
+one request adding fields to its analysis doesn't leak into another's, and
+an exception is raised in every waiting request. The shared work is shielded,
+so a client that disconnects doesn't cancel it for the others. Work a caller
+drives itself (``lead``) does stop with that caller; it is then abandoned, and
+the callers waiting on it get ``LeaderGone`` and do the work themselves.
+"""
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class LeaderGone(Exception):
+    """Raised in callers waiting on a led call that was abandoned before it had an outcome."""
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time and shares its outcome with concurrent callers."""
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Future] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    def _register(self, key: str, future: asyncio.Future) -> None:
+        self._calls[key] = future
+        self.leaders += 1
+
+        def forget(done: asyncio.Future) -> None:
+            if self._calls.get(key) is done:
+                del self._calls[key]
+            # Mark the outcome as retrieved even when nobody else was waiting
+            if not done.cancelled():
+                done.exception()
+
+        future.add_done_callback(forget)
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[T]]) -> T:
+        """Await ``factory()``, or the identical call already in flight for ``key``."""
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._register(key, future)
+        else:
+            self.coalesced += 1
+        return copy.deepcopy(await asyncio.shield(future))
+
+    def join(self, key: str) -> Optional[asyncio.Future]:
+        """The call in flight for ``key``, if any, counted as a coalesced caller."""
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+        return future
+
+    def lead(self, key: str) -> asyncio.Future:
+        """
+        Register a call for ``key`` whose outcome the caller sets itself, for
+        work such as a streamed reply that can't be expressed as one awaitable.
+        The caller must always resolve the returned future.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._register(key, future)
+        return future
+
+    def abandon(self, key: str, future: asyncio.Future) -> None:
+        """
+        Give up a call registered with ``lead`` without an outcome. Callers
+        that joined it get ``LeaderGone``; new callers for ``key`` start over.
+        """
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        if not future.done():
+            future.set_exception(LeaderGone(key))
+
+    def stats(self) -> Dict[str, Any]:
+        calls = self.leaders + self.coalesced
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "coalesced": self.coalesced,
+            "coalesced_ratio": self.coalesced / calls if calls else 0.0,
+        }
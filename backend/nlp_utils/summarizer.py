@@ -0,0 +1,175 @@
+"""
+Extractive summarization that scales to multi-megabyte documents.
+
+Sentences are scored by the sum of their TF-IDF weights, as before, but the
+document is processed as a stream:
+
+- text is segmented into sentences one window at a time instead of handing
+  the whole document to the tokenizer at once
+- sentences are grouped into chunks; each chunk is scored on its own sparse
+  TF-IDF matrix (row sums, no dense conversion) and only its best sentences
+  are kept as candidates (map)
+- the surviving candidates are rescored together to pick the final summary,
+  and are pruned the same way whenever too many pile up (reduce)
+
+Memory therefore depends on the chunk size and candidate cap, not on the
+length of the document. A document that fits in one chunk gets exactly the
+summary the original single-pass algorithm produced.
+
+Configuration (environment variables):
+
+- ``SUMMARY_SENTENCES`` - sentences in a summary (default: 3)
+- ``SUMMARY_CHUNK_CHARS`` - characters of text scored together (default: 100000)
+"""
+import heapq
+import os
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_NUM_SENTENCES = int(os.environ.get("SUMMARY_SENTENCES", "3"))
+DEFAULT_CHUNK_CHARS = int(os.environ.get("SUMMARY_CHUNK_CHARS", "100000"))
+
+
+def sentence_scores(sentences: List[str]) -> List[float]:
+    """Score sentences by the sum of their TF-IDF weights."""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    try:
+        matrix = TfidfVectorizer(stop_words='english').fit_transform(sentences)
+    except ValueError:
+        # Nothing but stop words and punctuation, so every sentence is equally good
+        return [0.0] * len(sentences)
+    # Row sums stay sparse; no per-row dense arrays
+    return matrix.sum(axis=1).A1.tolist()
+
+
+def top_sentences(sentences: List[Tuple[int, str]], count: int) -> List[Tuple[int, str]]:
+    """Pick the ``count`` highest scoring ``(position, sentence)`` pairs, in document order."""
+    if len(sentences) <= count:
+        return list(sentences)
+    scores = sentence_scores([sentence for _, sentence in sentences])
+    best = heapq.nlargest(count, range(len(sentences)), key=lambda i: (scores[i], -i))
+    return [sentences[i] for i in sorted(best)]
+
+
+class SentenceSplitter:
+    """
+    Incremental sentence segmentation. Text can be fed in arbitrary pieces;
+    complete sentences come out and the trailing partial sentence is held back
+    until more text (or the end of input) arrives. A partial sentence longer
+    than ``max_sentence_chars`` is cut at its last whitespace and emitted, so
+    text without punctuation can't grow the buffer without bound.
+    """
+
+    def __init__(self, window_chars: int = 8192, max_sentence_chars: int = 16384):
+        self.window_chars = window_chars
+        self.max_sentence_chars = max_sentence_chars
+        self._buffer = ""
+
+    def feed(self, text: str) -> List[str]:
+        self._buffer += text
+        if len(self._buffer) < self.window_chars:
+            return []
+        return self._split(final=False)
+
+    def close(self) -> List[str]:
+        return self._split(final=True)
+
+    def _split(self, final: bool) -> List[str]:
+        import nltk
+
+        sentences = nltk.sent_tokenize(self._buffer) if self._buffer.strip() else []
+        if final or not sentences:
+            self._buffer = ""
+            return sentences
+        # The last sentence may continue in the next piece. Keep it as it appears
+        # in the buffer, trailing whitespace included, so it isn't glued to the
+        # next piece's first word
+        last = sentences.pop()
+        start = self._buffer.rfind(last)
+        self._buffer = self._buffer[start:] if start >= 0 else last
+        # No sentence boundary in sight: re-tokenizing an ever longer buffer on
+        # every piece would be quadratic, so emit it in sentence-sized parts
+        while len(self._buffer) > self.max_sentence_chars:
+            limit = self.max_sentence_chars
+            cut = max(self._buffer.rfind(" ", 0, limit), self._buffer.rfind("\n", 0, limit))
+            if cut <= 0:
+                cut = limit
+            head = self._buffer[:cut].strip()
+            self._buffer = self._buffer[cut:]
+            if head:
+                sentences.append(head)
+        return sentences
+
+
+def iter_sentences(text: str, window_chars: int = 8192) -> Iterator[str]:
+    """Yield the sentences of ``text``, tokenizing one window at a time."""
+    splitter = SentenceSplitter(window_chars)
+    for start in range(0, len(text), window_chars):
+        yield from splitter.feed(text[start:start + window_chars])
+    yield from splitter.close()
+
+
+class ExtractiveSummarizer:
+    """
+    Map-reduce summarizer fed one sentence at a time.
+
+    Each chunk of ``chunk_chars`` characters contributes its top
+    ``num_sentences`` sentences as candidates; when more than
+    ``max_candidates`` accumulate they are reduced to the best half.
+    """
+
+    def __init__(self, num_sentences: Optional[int] = None, chunk_chars: int = DEFAULT_CHUNK_CHARS,
+                 max_candidates: Optional[int] = None):
+        self.num_sentences = num_sentences or DEFAULT_NUM_SENTENCES
+        self.chunk_chars = chunk_chars
+        self.max_candidates = max_candidates or self.num_sentences * 64
+        self.sentence_count = 0
+        self._chunk: List[Tuple[int, str]] = []
+        self._chunk_chars = 0
+        self._candidates: List[Tuple[int, str]] = []
+        self._chunks_scored = 0
+
+    def add(self, sentence: str) -> None:
+        self._chunk.append((self.sentence_count, sentence))
+        self.sentence_count += 1
+        self._chunk_chars += len(sentence)
+        if self._chunk_chars >= self.chunk_chars:
+            self._flush_chunk()
+
+    def add_all(self, sentences: Iterable[str]) -> None:
+        for sentence in sentences:
+            self.add(sentence)
+
+    def _flush_chunk(self) -> None:
+        if not self._chunk:
+            return
+        self._candidates.extend(top_sentences(self._chunk, self.num_sentences))
+        self._chunk = []
+        self._chunk_chars = 0
+        self._chunks_scored += 1
+        if len(self._candidates) > self.max_candidates:
+            self._candidates = top_sentences(self._candidates, self.max_candidates // 2)
+
+    def summary_sentences(self) -> List[str]:
+        """Return the selected sentences in document order."""
+        if self._chunks_scored == 0:
+            # Everything fit in one chunk: score it in a single pass
+            return [sentence for _, sentence in top_sentences(self._chunk, self.num_sentences)]
+        self._flush_chunk()
+        return [sentence for _, sentence in top_sentences(self._candidates, self.num_sentences)]
+
+    def summary(self) -> str:
+        return " ".join(self.summary_sentences())
+
+
+def summarize_document(text: str, num_sentences: Optional[int] = None,
+                       chunk_chars: int = DEFAULT_CHUNK_CHARS) -> str:
+    """
+    Summarize ``text`` to its ``num_sentences`` most important sentences.
+    Text with no more sentences than that is returned unchanged.
+    """
+    summarizer = ExtractiveSummarizer(num_sentences, chunk_chars=chunk_chars)
+    summarizer.add_all(iter_sentences(text))
+    if summarizer.sentence_count <= summarizer.num_sentences:
+        return text
+    return summarizer.summary()
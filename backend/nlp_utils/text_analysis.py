@@ -1,34 +1,151 @@
-import nltk
-import spacy
-from transformers import pipeline
-from sklearn.feature_extraction.text import TfidfVectorizer
+import os
+import threading
+import time
 from typing import Dict, List, Tuple, Any, Optional
-import re
-
-# Download necessary NLTK resources on first run
-try:
-    nltk.data.find('tokenizers/punkt')
-    nltk.data.find('vader_lexicon')
-except LookupError:
-    nltk.download('punkt')
-    nltk.download('vader_lexicon')
-
-# Load spaCy model
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    # If model is not installed, we'll download a smaller one
-    import subprocess
-    import sys
-    subprocess.check_call([sys.executable, "-m", "spacy", "download", "en_core_web_sm"])
-    nlp = spacy.load("en_core_web_sm")
-
-# Initialize sentiment analyzer
-try:
-    from nltk.sentiment.vader import SentimentIntensityAnalyzer
-    sentiment_analyzer = SentimentIntensityAnalyzer()
-except:
-    sentiment_analyzer = None
+
+from .cache import analysis_cache
+from .intent_matcher import IntentMatcher, load_intent_keywords
+from .schema import Analysis, Entity, Intents, Sentiment
+from .summarizer import summarize_document
+
+# Models are loaded on first use (or by warm_up_in_background) rather than at
+# import time, and nothing is downloaded unless NLP_AUTO_DOWNLOAD=1.
+SPACY_MODEL = os.environ.get("SPACY_MODEL", "en_core_web_sm")
+AUTO_DOWNLOAD = os.environ.get("NLP_AUTO_DOWNLOAD", "0") == "1"
+
+# Only the NER component is used, so the rest of the pipeline is never loaded
+SPACY_EXCLUDE = ["tagger", "morphologizer", "parser", "attribute_ruler", "lemmatizer", "senter"]
+
+NLTK_RESOURCES = {
+    "punkt_tab": "tokenizers/punkt_tab",
+    "punkt": "tokenizers/punkt",
+    "vader_lexicon": "sentiment/vader_lexicon.zip",
+}
+
+_nlp = None
+_sentiment_analyzer = None
+_sentiment_loaded = False
+_load_lock = threading.Lock()
+_model_status: Dict[str, Any] = {
+    "state": "not_loaded",  # not_loaded, loading, ready or failed
+    "spacy": None,
+    "vader": False,
+    "punkt": False,
+    "load_seconds": None,
+    "error": None,
+}
+
+def _ensure_nltk_resource(name: str) -> bool:
+    """Check that an NLTK resource is installed, downloading it only if allowed."""
+    import nltk
+    
+    try:
+        nltk.data.find(NLTK_RESOURCES[name])
+        return True
+    except LookupError:
+        if not AUTO_DOWNLOAD:
+            return False
+        return bool(nltk.download(name, quiet=True))
+
+def _load_spacy():
+    """Load the spaCy model with only the components entity extraction needs."""
+    import spacy
+    
+    try:
+        model = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+    except OSError:
+        if not AUTO_DOWNLOAD:
+            raise OSError(
+                f"spaCy model '{SPACY_MODEL}' is not installed. "
+                f"Run: python -m spacy download {SPACY_MODEL}"
+            )
+        import subprocess
+        import sys
+        subprocess.check_call([sys.executable, "-m", "spacy", "download", SPACY_MODEL])
+        model = spacy.load(SPACY_MODEL, exclude=SPACY_EXCLUDE)
+    
+    # Drop the shared tok2vec layer too when NER carries its own embeddings
+    if "tok2vec" in model.pipe_names:
+        listeners = getattr(model.get_pipe("tok2vec"), "listening_components", [])
+        if "ner" not in listeners:
+            model.remove_pipe("tok2vec")
+    
+    _model_status["spacy"] = model.pipe_names
+    return model
+
+def _load_sentiment_analyzer():
+    """Create the VADER analyzer, or None if its lexicon is unavailable."""
+    if not _ensure_nltk_resource("vader_lexicon"):
+        return None
+    try:
+        from nltk.sentiment.vader import SentimentIntensityAnalyzer
+        analyzer = SentimentIntensityAnalyzer()
+    except Exception:
+        return None
+    _model_status["vader"] = True
+    return analyzer
+
+def get_nlp():
+    """Return the spaCy pipeline, loading it on first use."""
+    global _nlp
+    if _nlp is None:
+        with _load_lock:
+            if _nlp is None:
+                _nlp = _load_spacy()
+    return _nlp
+
+def get_sentiment_analyzer():
+    """Return the VADER analyzer, loading it on first use."""
+    global _sentiment_analyzer, _sentiment_loaded
+    if not _sentiment_loaded:
+        with _load_lock:
+            if not _sentiment_loaded:
+                _sentiment_analyzer = _load_sentiment_analyzer()
+                _sentiment_loaded = True
+    return _sentiment_analyzer
+
+def load_models() -> Dict[str, Any]:
+    """Load every model used by this module and return the resulting status."""
+    _model_status["state"] = "loading"
+    started = time.perf_counter()
+    try:
+        get_nlp()
+        get_sentiment_analyzer()
+        # Newer NLTK releases tokenize sentences with punkt_tab instead of punkt
+        _model_status["punkt"] = _ensure_nltk_resource("punkt_tab") or _ensure_nltk_resource("punkt")
+        if not _model_status["punkt"]:
+            # Summaries and document processing can't work without it, so don't report ready
+            raise LookupError(
+                "NLTK punkt data is not installed. Run: python -m nltk.downloader punkt_tab"
+            )
+        # Importing scikit-learn is slow enough to be worth doing up front
+        from sklearn.feature_extraction.text import TfidfVectorizer  # noqa: F401
+    except Exception as e:
+        _model_status["state"] = "failed"
+        _model_status["error"] = str(e)
+        raise
+    _model_status["load_seconds"] = round(time.perf_counter() - started, 3)
+    _model_status["state"] = "ready"
+    return model_status()
+
+def warm_up_in_background() -> threading.Thread:
+    """Start loading the models on a daemon thread so startup isn't blocked."""
+    def _warm_up():
+        try:
+            load_models()
+        except Exception as e:
+            print(f"Failed to load NLP models: {str(e)}")
+    
+    thread = threading.Thread(target=_warm_up, name="nlp-warm-up", daemon=True)
+    thread.start()
+    return thread
+
+def models_ready() -> bool:
+    return _model_status["state"] == "ready"
+
+def model_status() -> Dict[str, Any]:
+    """Return a copy of the model loading state for readiness checks."""
+    return dict(_model_status)
 
 # Common user intents in a chat context
 INTENT_KEYWORDS = {
@@ -43,56 +160,75 @@ INTENT_KEYWORDS = {
     "confusion": ["confused", "don't understand", "unclear", "what do you mean", "explain"]
 }
 
-def analyze_sentiment(text: str) -> Dict[str, float]:
+def analyze_sentiment(text: str) -> Sentiment:
     """
     Analyze the sentiment of a piece of text.
     Returns a dictionary with sentiment scores: negative, neutral, positive, and compound.
     """
+    sentiment_analyzer = get_sentiment_analyzer()
     if not sentiment_analyzer:
         return {"negative": 0.0, "neutral": 0.5, "positive": 0.0, "compound": 0.0}
     
     scores = sentiment_analyzer.polarity_scores(text)
-    return scores
+    # Coerced here once so callers and the servers never have to
+    return {key: float(value) for key, value in scores.items()}
+
+def _doc_entities(doc) -> List[Entity]:
+    """Convert the entities of a processed spaCy doc into plain dictionaries."""
+    return [
+        {"text": str(ent.text), "label": str(ent.label_), "start": int(ent.start_char), "end": int(ent.end_char)}
+        for ent in doc.ents
+    ]
 
-def extract_entities(text: str) -> List[Dict[str, Any]]:
+@analysis_cache.cached
+def extract_entities(text: str) -> List[Entity]:
     """
     Extract named entities from text.
     Returns a list of dictionaries with entity text, label, and start/end positions.
     """
-    doc = nlp(text)
-    entities = []
-    
-    for ent in doc.ents:
-        entities.append({
-            "text": ent.text,
-            "label": ent.label_,
-            "start": ent.start_char,
-            "end": ent.end_char
-        })
-    
-    return entities
+    return _doc_entities(get_nlp()(text))
 
-def identify_intent(text: str) -> Dict[str, float]:
+# Optional JSON file overriding INTENT_KEYWORDS; edits are picked up without a restart
+INTENT_KEYWORDS_FILE = os.environ.get("INTENT_KEYWORDS_FILE")
+INTENT_RELOAD_INTERVAL = 5.0  # seconds between checks of the keywords file
+
+_intent_matcher = IntentMatcher(INTENT_KEYWORDS)
+_intent_file_mtime: Optional[float] = None
+_intent_checked_at = 0.0
+
+def reload_intent_keywords(keywords: Optional[Dict[str, List[str]]] = None) -> IntentMatcher:
+    """
+    Recompile the intent matcher from ``keywords``, the keywords file or the
+    built-in INTENT_KEYWORDS table, in that order of preference.
+    """
+    global _intent_matcher, _intent_file_mtime
+    if keywords is None and INTENT_KEYWORDS_FILE:
+        _intent_file_mtime = os.path.getmtime(INTENT_KEYWORDS_FILE)
+        keywords = load_intent_keywords(INTENT_KEYWORDS_FILE)
+    # Swapping the reference is atomic, so in-flight calls keep the old matcher
+    _intent_matcher = IntentMatcher(keywords if keywords is not None else INTENT_KEYWORDS)
+    return _intent_matcher
+
+def get_intent_matcher() -> IntentMatcher:
+    """Return the current intent matcher, reloading it if the keywords file changed."""
+    global _intent_checked_at
+    if INTENT_KEYWORDS_FILE:
+        now = time.monotonic()
+        if now - _intent_checked_at >= INTENT_RELOAD_INTERVAL:
+            _intent_checked_at = now
+            try:
+                if os.path.getmtime(INTENT_KEYWORDS_FILE) != _intent_file_mtime:
+                    reload_intent_keywords()
+            except (OSError, ValueError) as e:
+                print(f"Keeping previous intent keywords: {str(e)}")
+    return _intent_matcher
+
+def identify_intent(text: str) -> Intents:
     """
     Identify the likely intent of a message.
     Returns a dictionary mapping intent categories to confidence scores.
     """
-    text = text.lower()
-    intents = {}
-    
-    for intent, keywords in INTENT_KEYWORDS.items():
-        score = 0
-        for keyword in keywords:
-            if keyword in text:
-                # Add score based on keyword match
-                score += 1
-                # Add extra score for keywords at the beginning
-                if re.search(r'^\s*' + re.escape(keyword), text):
-                    score += 0.5
-        
-        if score > 0:
-            # Normalize the score based on the number of keywords for this intent
-            intents[intent] = min(1.0, score / (len(keywords) * 0.5))
+    intents = {intent: float(score) for intent, score in get_intent_matcher().score(text).items()}
     
     # If no intents were identified, use a fallback
     if not intents:
@@ -100,42 +236,26 @@ def identify_intent(text: str) -> Dict[str, float]:
         
     return intents
 
-def summarize_text(text: str, max_length: int = 150) -> str:
+@analysis_cache.cached
+def summarize_text(text: str, max_length: int = 150, num_sentences: Optional[int] = None) -> str:
     """
     Create a simple extractive summary of longer text.
-    Uses TF-IDF to find the most important sentences.
+    Uses TF-IDF to find the most important sentences; long documents are
+    summarized chunk by chunk (see nlp_utils.summarizer). ``num_sentences``
+    defaults to SUMMARY_SENTENCES.
     """
     if len(text) <= max_length:
         return text
-        
-    # Split into sentences
-    sentences = nltk.sent_tokenize(text)
-    
-    # Skip summarization for very short texts
-    if len(sentences) <= 3:
-        return text
-    
-    # Create TF-IDF matrix
-    vectorizer = TfidfVectorizer(stop_words='english')
-    tfidf_matrix = vectorizer.fit_transform(sentences)
-    
-    # Calculate sentence scores based on TF-IDF values
-    sentence_scores = [sum(tfidf_matrix[i].toarray()[0]) for i in range(len(sentences))]
     
-    # Get top sentences
-    top_sentence_indices = sorted(range(len(sentence_scores)), 
-                                key=lambda i: sentence_scores[i], 
-                                reverse=True)[:3]
-    top_sentence_indices = sorted(top_sentence_indices)  # Sort by position in text
-    
-    # Create summary
-    summary = " ".join([sentences[i] for i in top_sentence_indices])
-    return summary
+    return summarize_document(text, num_sentences)
 
-def analyze_message(text: str) -> Dict[str, Any]:
+# Cached results depend on the intent table, so its fingerprint is part of the key
+@analysis_cache.cached(version=lambda: get_intent_matcher().fingerprint)
+def analyze_message(text: str) -> Analysis:
     """
     Comprehensive analysis of a message, combining all NLP functions.
-    Returns a dictionary with sentiment, entities, and intents.
+    Returns a dictionary with sentiment, entities, and intents, already holding
+    the types the response models declare.
     """
     result = {
         "sentiment": analyze_sentiment(text),
@@ -143,4 +263,36 @@ def analyze_message(text: str) -> Dict[str, Any]:
         "intents": identify_intent(text)
     }
     
-    return result
\ No newline at end of file
+    return result
+
+def analyze_with_document(text: str, document: Optional[str] = None) -> Analysis:
+    """
+    Analyze a message and, if a document is given, add its summary and the
+    entities found in that summary. Returns a dictionary shaped like
+    NLPAnalysisResponse, computed in a single call.
+    """
+    analysis = analyze_message(text)
+    
+    if document:
+        summary = summarize_text(document, max_length=500)
+        analysis["document_summary"] = summary
+        analysis["document_entities"] = extract_entities(summary)
+    
+    return analysis
+
+def analyze_batch(texts: List[str], batch_size: int = 64) -> List[Analysis]:
+    """
+    Analyze many messages in one pass.
+    spaCy processes the texts in batches via nlp.pipe, and sentiment and intent
+    scoring run in the same loop. Results are returned in input order.
+    """
+    results = []
+    
+    for text, doc in zip(texts, get_nlp().pipe(texts, batch_size=batch_size)):
+        results.append({
+            "sentiment": analyze_sentiment(text),
+            "entities": _doc_entities(doc),
+            "intents": identify_intent(text)
+        })
+    
+    return results
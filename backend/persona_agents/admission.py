@@ -0,0 +1,349 @@
+"""
+Admission control for the persona chat endpoints.
+
+Without a limit, a burst of chats piles onto the event loop, the NLP workers
+and the LLM provider until every request times out. Each chat now has to be
+admitted before any work is done for it. A fixed number of chats may be
+active at once, both per persona and in total, and the rest wait in bounded
+queues. When a queue is full the request is rejected right away with a 503,
+and a request that waited longer than the queue timeout gets a 503 too. So
+the latency of admitted requests stays bounded instead of growing with the
+backlog. Both carry a ``Retry-After`` estimated from recent chat durations.
+
+Clients may only have a few chats active or queued at a time; beyond that
+they get a 429. Waiting chats are admitted round-robin across clients, so one
+client's burst cannot starve everyone queued behind it.
+
+A client is identified by its address. Behind a reverse proxy or load
+balancer every request comes from the proxy, so all users would share one
+limit. When the peer is one of ``ADMISSION_TRUSTED_PROXIES``, the client is
+instead taken from the header the proxy sets: the last ``X-Forwarded-For``
+entry that isn't itself a trusted proxy, or the value of a custom header such
+as an API gateway's client key. The header is ignored from any other peer,
+since clients could otherwise pick their own identity.
+
+A chat whose client went away stays admitted until the LLM calls it started
+on worker threads have finished, since those keep running regardless.
+
+All state is only touched from the event loop thread, so no locks are needed.
+
+Configuration (environment variables):
+
+- ``ADMISSION_MAX_ACTIVE`` - chats being processed at once across all personas (default: 64)
+- ``ADMISSION_MAX_QUEUE`` - chats waiting for admission across all personas (default: 128)
+- ``ADMISSION_PERSONA_ACTIVE`` - chats being processed at once per persona (default: 16)
+- ``ADMISSION_PERSONA_QUEUE`` - chats waiting for admission per persona (default: 32)
+- ``ADMISSION_CLIENT_LIMIT`` - chats one client may have active or waiting (default: 8)
+- ``ADMISSION_QUEUE_TIMEOUT`` - seconds a chat may wait before it is rejected (default: 10)
+- ``ADMISSION_TRUSTED_PROXIES`` - comma-separated proxy addresses or networks whose client header is trusted (default: none)
+- ``ADMISSION_CLIENT_HEADER`` - header a trusted proxy identifies the client with (default: ``X-Forwarded-For``)
+"""
+import asyncio
+import ipaddress
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.background import BackgroundTask
+
+from ..llm.executor import track_llm_calls
+from ..nlp_utils.metrics import registry
+from ..nlp_utils.profiling import parse_networks
+
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    "dialogix_admission_wait_seconds",
+    "Time persona chats waited for admission.",
+    ["persona"],
+)
+ADMISSION_REJECTED = registry.counter(
+    "dialogix_admission_rejected_total",
+    "Persona chats rejected by admission control.",
+    ["persona", "reason"],
+)
+
+
+class Ticket:
+    """An admitted chat; releasing it lets the next waiting chat in."""
+
+    def __init__(self, controller: "AdmissionController", persona_id: str, client_id: str):
+        self.controller = controller
+        self.persona_id = persona_id
+        self.client_id = client_id
+        self.admitted_at = time.monotonic()
+        self.released = False
+        self._finished = False
+        self._held = 0
+
+    def hold(self, future: Future) -> None:
+        """Keep the chat admitted until ``future``, work running on a worker thread, is done."""
+        loop = asyncio.get_running_loop()
+        self._held += 1
+
+        def done(_: Future) -> None:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(self._unhold)
+
+        future.add_done_callback(done)
+
+    def _unhold(self) -> None:
+        self._held -= 1
+        if self._finished:
+            self.release()
+
+    def release(self) -> None:
+        """Called when the request is done with the chat; the slot frees up once held work is done too."""
+        self._finished = True
+        if not self.released and not self._held:
+            self.released = True
+            self.controller._release(self)
+
+
+class _Waiter:
+    def __init__(self, persona_id: str, client_id: str):
+        self.persona_id = persona_id
+        self.client_id = client_id
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+
+class AdmissionController:
+    """Bounded active and waiting chats, globally and per persona, with per-client fairness."""
+
+    def __init__(self, max_active: int = 64, max_queue: int = 128, persona_active: int = 16,
+                 persona_queue: int = 32, client_limit: int = 8, queue_timeout: float = 10.0):
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.persona_active = persona_active
+        self.persona_queue = persona_queue
+        self.client_limit = client_limit
+        self.queue_timeout = queue_timeout
+
+        self._active = 0
+        self._queued = 0
+        self._active_by_persona: Dict[str, int] = {}
+        self._queued_by_persona: Dict[str, int] = {}
+        self._by_client: Dict[str, int] = {}
+        # Waiting chats per client, in the round-robin order clients are served
+        self._waiting: "OrderedDict[str, Deque[_Waiter]]" = OrderedDict()
+        # Moving average of how long an admitted chat takes, per persona
+        self._durations: Dict[str, float] = {}
+
+    def _has_capacity(self, persona_id: str) -> bool:
+        return (self._active < self.max_active
+                and self._active_by_persona.get(persona_id, 0) < self.persona_active)
+
+    def _admit(self, persona_id: str, client_id: str) -> Ticket:
+        self._active += 1
+        self._active_by_persona[persona_id] = self._active_by_persona.get(persona_id, 0) + 1
+        return Ticket(self, persona_id, client_id)
+
+    def _forget_client(self, client_id: str) -> None:
+        count = self._by_client.get(client_id, 0) - 1
+        if count > 0:
+            self._by_client[client_id] = count
+        else:
+            self._by_client.pop(client_id, None)
+
+    def retry_after(self, persona_id: str) -> int:
+        """Seconds until a slot is likely to free up for ``persona_id``."""
+        duration = self._durations.get(persona_id, 1.0)
+        backlog = self._queued_by_persona.get(persona_id, 0) + 1
+        return max(1, min(60, math.ceil(duration * backlog / self.persona_active)))
+
+    def _reject(self, status_code: int, persona_id: str, reason: str, detail: str) -> HTTPException:
+        ADMISSION_REJECTED.inc(persona_id, reason)
+        return HTTPException(
+            status_code=status_code, detail=detail,
+            headers={"Retry-After": str(self.retry_after(persona_id))},
+        )
+
+    async def acquire(self, persona_id: str, client_id: str) -> Ticket:
+        """
+        Admit a chat, waiting in the queue if necessary. Raises an HTTPException
+        with status 429 or 503 and a ``Retry-After`` header when it is rejected.
+        """
+        if self._by_client.get(client_id, 0) >= self.client_limit:
+            raise self._reject(429, persona_id, "client_limit",
+                               "Too many chats in progress for this client, please retry shortly")
+        # Chats already waiting for this persona go first
+        if not self._queued_by_persona.get(persona_id) and self._has_capacity(persona_id):
+            self._by_client[client_id] = self._by_client.get(client_id, 0) + 1
+            ADMISSION_WAIT_SECONDS.observe(0.0, persona_id)
+            return self._admit(persona_id, client_id)
+        if self._queued >= self.max_queue or self._queued_by_persona.get(persona_id, 0) >= self.persona_queue:
+            raise self._reject(503, persona_id, "queue_full", "The service is busy, please retry shortly")
+
+        waiter = _Waiter(persona_id, client_id)
+        self._by_client[client_id] = self._by_client.get(client_id, 0) + 1
+        self._waiting.setdefault(client_id, deque()).append(waiter)
+        self._queued += 1
+        self._queued_by_persona[persona_id] = self._queued_by_persona.get(persona_id, 0) + 1
+        started = time.monotonic()
+        try:
+            ticket = await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as the wait ended: hand the slot back
+                waiter.future.result().release()
+            else:
+                waiter.future.cancel()
+                self._unqueue(waiter)
+                self._forget_client(client_id)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject(503, persona_id, "queue_timeout", "The service is busy, please retry shortly")
+        ADMISSION_WAIT_SECONDS.observe(time.monotonic() - started, persona_id)
+        return ticket
+
+    def _unqueue(self, waiter: _Waiter) -> None:
+        queue = self._waiting.get(waiter.client_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(waiter)
+        except ValueError:
+            return
+        if not queue:
+            del self._waiting[waiter.client_id]
+        self._queued -= 1
+        self._queued_by_persona[waiter.persona_id] -= 1
+
+    def _release(self, ticket: Ticket) -> None:
+        self._active -= 1
+        self._active_by_persona[ticket.persona_id] -= 1
+        self._forget_client(ticket.client_id)
+        elapsed = time.monotonic() - ticket.admitted_at
+        previous = self._durations.get(ticket.persona_id)
+        self._durations[ticket.persona_id] = elapsed if previous is None else 0.8 * previous + 0.2 * elapsed
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Admit waiting chats while there is room, one client at a time."""
+        progress = True
+        while progress and self._queued and self._active < self.max_active:
+            progress = False
+            for client_id in list(self._waiting):
+                queue = self._waiting[client_id]
+                waiter = next((w for w in queue if self._has_capacity(w.persona_id)), None)
+                if waiter is None:
+                    continue
+                self._unqueue(waiter)
+                waiter.future.set_result(self._admit(waiter.persona_id, client_id))
+                # Served clients go to the back of the line
+                if client_id in self._waiting:
+                    self._waiting.move_to_end(client_id)
+                progress = True
+                break
+
+    @asynccontextmanager
+    async def admit(self, persona_id: str, client_id: str) -> AsyncIterator[Ticket]:
+        ticket = await self.acquire(persona_id, client_id)
+        try:
+            # The slot is released in ``finally``, but not before the LLM calls this
+            # chat started (a cancelled request leaves them running) are done
+            with track_llm_calls(ticket.hold):
+                yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> Dict[str, Any]:
+        personas = set(self._active_by_persona) | set(self._queued_by_persona)
+        return {
+            "active": self._active,
+            "queued": self._queued,
+            "max_active": self.max_active,
+            "max_queue": self.max_queue,
+            "clients": len(self._by_client),
+            "personas": {
+                persona_id: {
+                    "active": self._active_by_persona.get(persona_id, 0),
+                    "queued": self._queued_by_persona.get(persona_id, 0),
+                    "avg_seconds": self._durations.get(persona_id),
+                }
+                for persona_id in sorted(personas)
+            },
+        }
+
+
+TRUSTED_PROXIES = parse_networks(os.environ.get("ADMISSION_TRUSTED_PROXIES", ""))
+CLIENT_HEADER = os.environ.get("ADMISSION_CLIENT_HEADER", "X-Forwarded-For")
+
+
+def _is_trusted(host: str, proxies: List[Any]) -> bool:
+    try:
+        address = ipaddress.ip_address(host.strip())
+    except ValueError:
+        return False
+    return any(address in network for network in proxies)
+
+
+def client_key(peer: Optional[str], header: Optional[str], proxies: List[Any] = TRUSTED_PROXIES) -> str:
+    """
+    The client a chat is counted against: ``peer``, or when that is a trusted
+    proxy, the right-most entry of its client ``header`` that isn't a trusted
+    proxy too.
+    """
+    if not peer:
+        return "unknown"
+    if not header or not _is_trusted(peer, proxies):
+        return peer
+    for entry in reversed(header.split(",")):
+        entry = entry.strip()
+        if entry and not _is_trusted(entry, proxies):
+            return entry
+    return peer
+
+
+def client_id(request: Request) -> str:
+    """The client a chat came from; per-client limits apply to it."""
+    peer = request.client.host if request.client else None
+    return client_key(peer, request.headers.get(CLIENT_HEADER))
+
+
+def hold_until_sent(response: Any, ticket: Ticket, on_sent: Optional[Callable[[], None]] = None) -> Any:
+    """
+    Keep a streamed reply admitted until its last event has been sent, then
+    call ``on_sent`` too. ``on_sent`` may be called more than once.
+    """
+    body = response.body_iterator
+
+    def release() -> None:
+        if on_sent is not None:
+            on_sent()
+        ticket.release()
+
+    async def release_when_done() -> AsyncIterator[Any]:
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            release()
+
+    response.body_iterator = release_when_done()
+    # Also covers a stream that was never started because the client went away
+    response.background = BackgroundTask(release)
+    return response
+
+
+admission = AdmissionController(
+    max_active=int(os.environ.get("ADMISSION_MAX_ACTIVE", "64")),
+    max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", "128")),
+    persona_active=int(os.environ.get("ADMISSION_PERSONA_ACTIVE", "16")),
+    persona_queue=int(os.environ.get("ADMISSION_PERSONA_QUEUE", "32")),
+    client_limit=int(os.environ.get("ADMISSION_CLIENT_LIMIT", "8")),
+    queue_timeout=float(os.environ.get("ADMISSION_QUEUE_TIMEOUT", "10")),
+)
+
+
+def _samples(field: str) -> Dict[Tuple[str, ...], float]:
+    return {(persona_id,): stats[field] for persona_id, stats in admission.stats()["personas"].items()}
+
+
+registry.sampled("dialogix_admission_active", "Persona chats admitted and in progress.", "gauge", ["persona"],
+                 lambda: _samples("active"))
+registry.sampled("dialogix_admission_queued", "Persona chats waiting for admission.", "gauge", ["persona"],
+                 lambda: _samples("queued"))
@@ -0,0 +1,164 @@
+"""
+Shared helpers for the persona chat endpoints.
+"""
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from crewai import Crew, Task
+from fastapi import HTTPException
+
+from ..common_models import ChatRequest
+from ..llm.executor import crew_output_text, run_pooled_crew
+from ..llm.fake import FakeCrew, fake_llm_enabled
+from ..nlp_utils.documents import (
+    DocumentNotFoundError, DocumentProcessingError, StoredDocument, document_store
+)
+from ..nlp_utils.executor import run_nlp, run_nlp_shared
+from ..nlp_utils.history import (
+    CompactionState, compact_history, estimate_tokens, history_token_budget, tokens_for_chars
+)
+from ..nlp_utils.text_analysis import analyze_message
+from ..sessions import Session, SessionNotFoundError, session_store
+
+
+def resolve_session(request: ChatRequest, persona_id: str) -> Optional[Session]:
+    """
+    Return the server-side session a chat request belongs to, if any. A new
+    session is seeded with the ``conversation_history`` the client already has.
+    A session can only be used with the persona it was created for.
+    """
+    if not request.session_id:
+        return None
+    try:
+        session = session_store.get(request.session_id)
+    except SessionNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown session_id: {request.session_id}")
+    if session.persona_id != persona_id:
+        raise HTTPException(
+            status_code=409, detail=f"Session {request.session_id} belongs to another persona"
+        )
+    if not session.turns and request.conversation_history:
+        session_store.append(session, [(msg["sender"], msg["message"]) for msg in request.conversation_history])
+    return session
+
+
+async def lock_turn(session: Optional[Session]) -> Callable[[], None]:
+    """
+    Wait until no other turn is in progress on ``session`` and return the
+    function that ends this one. Calling it more than once is harmless.
+    """
+    if session is None:
+        return lambda: None
+    await session.lock.acquire()
+    released = False
+
+    def release() -> None:
+        nonlocal released
+        if not released:
+            released = True
+            session.lock.release()
+
+    return release
+
+
+@asynccontextmanager
+async def session_turn(session: Optional[Session]) -> AsyncIterator[None]:
+    """Hold the session for one turn: building the prompt, the reply and recording it."""
+    release = await lock_turn(session)
+    try:
+        yield
+    finally:
+        release()
+
+
+async def conversation_text(persona_id: str, request: ChatRequest, session: Optional[Session] = None) -> str:
+    """
+    Prompt-ready conversation history, from the session when there is one,
+    compacted to the persona's token budget once it no longer fits. The
+    caller holds the session's turn, since the compaction state is updated.
+    """
+    budget = history_token_budget(persona_id)
+    if session is not None:
+        if session.compaction is None and tokens_for_chars(session.history_chars) <= budget:
+            return session.history_text()
+        # Only the turns added since the last fold are handed to the compactor
+        state = session.compaction or CompactionState()
+        text, session.compaction = await run_nlp(
+            compact_history, session.history_lines(state.folded), state, budget
+        )
+        return text
+
+    lines = [f"{msg['sender']}: {msg['message']}" for msg in request.conversation_history]
+    text = "\n".join(lines)
+    if estimate_tokens(text) <= budget:
+        return text
+    text, _ = await run_nlp(compact_history, lines, CompactionState(), budget)
+    return text
+
+
+def record_turn(session: Optional[Session], user_message: str, response: str) -> None:
+    """Append the user's message and the persona's reply to the session."""
+    if session is not None:
+        session_store.append(session, [("user", user_message), ("ai", response)])
+
+
+def turn_recorder(session: Optional[Session], user_message: str) -> Optional[Callable[[str], None]]:
+    """Callback for streamed replies that records the turn once the reply is complete."""
+    if session is None:
+        return None
+    return lambda response: record_turn(session, user_message, response)
+
+
+async def resolve_document(request: ChatRequest) -> Optional[StoredDocument]:
+    """
+    Return the document attached to a chat request, with its precomputed
+    summary, entities and chunks. Inline ``document_context`` goes through the
+    content-addressed store too, so resending the same text costs nothing.
+    """
+    try:
+        if request.document_id:
+            return await document_store.get_ready(request.document_id)
+        if request.document_context:
+            return await document_store.ingest(request.document_context).wait_ready()
+    except DocumentNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown document_id: {request.document_id}")
+    except DocumentProcessingError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return None
+
+
+async def analyze_chat_request(request: ChatRequest,
+                               document: Optional[StoredDocument] = None) -> Dict[str, Any]:
+    """
+    Build the ``/api/nlp/analyze`` payload for a chat request, so the result
+    can be returned to the client and reused for prompt building.
+    """
+    analysis = await run_nlp_shared(analyze_message, request.user_message)
+    if document is not None:
+        analysis["document_summary"] = document.summary_for(500)
+        analysis["document_entities"] = document.summary_entities_for(500)
+    return analysis
+
+
+def build_persona_crew(persona: Any) -> Crew:
+    """
+    A single-task crew for the persona whose task description is filled in
+    from the ``task_description`` input at kickoff, so the crew can be pooled.
+    """
+    agent = persona.build_agent()
+    if fake_llm_enabled():
+        return FakeCrew(agent, "{task_description}")
+    task = Task(
+        description="{task_description}",
+        agent=agent,
+        expected_output=persona.expected_output
+    )
+    return Crew(agents=[agent], tasks=[task])
+
+
+async def run_persona_crew(persona: Any, task_description: str) -> str:
+    """Run one of the persona's pooled crews and return the reply text."""
+    result = await run_pooled_crew(
+        persona.id, lambda: build_persona_crew(persona), {"task_description": task_description}
+    )
+    return crew_output_text(result)
@@ -0,0 +1,273 @@
+"""
+Data-driven persona registry.
+
+Personas are described in ``personas.json`` (or the file named by
+``PERSONAS_FILE``): display info, agent role/goal/backstory, LLM settings,
+which NLP features the prompt uses, how an attached document is presented,
+whether replies may be served from the response cache, and the prompt
+template. Templates use ``str.format`` syntax, may be given as
+a list of strings that are concatenated, and are parsed once when the
+registry loads, so building a prompt is a single render. The crewai ``LLM``
+and ``Agent`` of a persona are only created the first time it is used, and
+every ``LLM`` sends its requests through the shared connection pool. With
+``LLM_BACKEND=fake`` personas are backed by the offline fake LLM instead.
+
+Fields available to the main template:
+
+- ``history``, ``user_message``, ``document``
+- ``sentiment_tone``, ``sentiment_compound``, ``entity_mentions``, ``primary_intent``
+- ``sentiment_note``, ``intent_note``, ``entity_section``
+"""
+import hashlib
+import json
+import os
+import string
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ..llm.fake import FakeAgent, fake_llm_enabled, get_fake_llm
+from ..llm.http import get_llm_http
+from ..nlp_utils.documents import StoredDocument
+
+DEFAULT_PERSONAS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "personas.json")
+
+PROMPT_FIELDS = {
+    "history", "user_message", "document",
+    "sentiment_tone", "sentiment_compound", "entity_mentions", "primary_intent",
+    "sentiment_note", "intent_note", "entity_section",
+}
+
+
+class PersonaNotFoundError(KeyError):
+    """Raised for a persona id that is not in the registry."""
+
+
+class PromptTemplate:
+    """A ``str.format`` template parsed once into literal and field pieces."""
+
+    def __init__(self, source: Any, fields: Iterable[str], name: str = "template"):
+        self.source = "".join(source) if isinstance(source, list) else source
+        self._pieces: List[Tuple[str, Optional[str], str]] = []
+        allowed = set(fields)
+        for literal, field, spec, conversion in string.Formatter().parse(self.source):
+            if field is None:
+                self._pieces.append((literal, None, ""))
+                continue
+            if field not in allowed or conversion:
+                raise ValueError(f"{name}: unsupported placeholder {{{field}}}")
+            self._pieces.append((literal, field, spec))
+
+    def render(self, values: Dict[str, Any]) -> str:
+        parts = []
+        for literal, field, spec in self._pieces:
+            parts.append(literal)
+            if field is not None:
+                value = values[field]
+                parts.append(format(value, spec) if spec else str(value))
+        return "".join(parts)
+
+
+def _templates(notes: Dict[str, Any], fields: Iterable[str], name: str) -> Dict[str, PromptTemplate]:
+    return {key: PromptTemplate(text, fields, f"{name}.{key}") for key, text in notes.items()}
+
+
+class Persona:
+    """One registry entry: its prompt templates plus a lazily built agent."""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.id = config["id"]
+        self.name = config["name"]
+        self.role = config["role"]
+        self.description = config["description"]
+        self.agent_config = config["agent"]
+        self.llm_config = config["llm"]
+        self.expected_output = config["expected_output"]
+        self.cache_responses = config.get("response_cache", False)
+        # Changes to any persona setting invalidate its cached replies
+        self.fingerprint = hashlib.sha1(
+            json.dumps(config, sort_keys=True).encode("utf-8")
+        ).hexdigest()[:12]
+        self.nlp_features = set(config.get("nlp_features", []))
+        self.entity_labels = set(config.get("entity_labels", [])) or None
+        self.entities_heading = config.get("entities_heading", "")
+
+        name = f"personas.{self.id}"
+        self.template = PromptTemplate(config["template"], PROMPT_FIELDS, name)
+        self.sentiment_notes = _templates(config.get("sentiment_notes", {}), (), f"{name}.sentiment_notes")
+        self.intent_notes = _templates(config.get("intent_notes", {}), (), f"{name}.intent_notes")
+        self.entity_notes = _templates(config.get("entity_notes", {}), ("text", "label"), f"{name}.entity_notes")
+
+        document = config.get("document", {})
+        self.document_mode = document.get("mode", "passages")
+        self.document_summary_length = document.get("summary_length", 500)
+        self.document_template = PromptTemplate(
+            document.get("template", "{excerpt}\n\n"), ("excerpt",), f"{name}.document"
+        )
+        self.document_entities_heading = document.get("entities_heading")
+        self.document_max_entities = document.get("max_entities", 10)
+
+        self._llm = None
+        self._agent = None
+        self._lock = threading.Lock()
+
+    @property
+    def uses_nlp(self) -> bool:
+        return bool(self.nlp_features)
+
+    @property
+    def temperature(self) -> float:
+        return self.llm_config.get("temperature", 0.7)
+
+    def info(self) -> Dict[str, str]:
+        return {"id": self.id, "name": self.name, "role": self.role, "description": self.description}
+
+    @property
+    def llm(self) -> Any:
+        """The crewai LLM, created on first use and shared by all of the persona's agents."""
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    self._llm = self._build_llm()
+        return self._llm
+
+    @property
+    def agent(self) -> Any:
+        """An agent for reading the persona's prompt settings, created on first use."""
+        if self._agent is None:
+            llm = self.llm
+            with self._lock:
+                if self._agent is None:
+                    self._agent = self.build_agent(llm)
+        return self._agent
+
+    def _build_llm(self) -> Any:
+        if fake_llm_enabled():
+            return get_fake_llm()
+        from crewai import LLM
+
+        llm_kwargs = {"model": self.llm_config["model"], "temperature": self.temperature}
+        api_key_env = self.llm_config.get("api_key_env")
+        if api_key_env:
+            api_key = os.environ.get(api_key_env)
+            if not api_key:
+                raise ValueError(f"{api_key_env} environment variable not set")
+            llm_kwargs["api_key"] = api_key
+        # Passed through to litellm so requests reuse the shared keep-alive connections
+        llm_kwargs["client"] = get_llm_http().sync_handler()
+        return LLM(**llm_kwargs)
+
+    def build_agent(self, llm: Any = None) -> Any:
+        """A new agent for the persona; pooled crews each get their own."""
+        if fake_llm_enabled():
+            return FakeAgent(
+                self.name, self.agent_config["role"], self.agent_config["goal"],
+                self.agent_config["backstory"], llm if llm is not None else self.llm
+            )
+        from crewai import Agent
+
+        return Agent(
+            name=self.name,
+            role=self.agent_config["role"],
+            goal=self.agent_config["goal"],
+            backstory=self.agent_config["backstory"],
+            allow_delegation=False,
+            llm=llm if llm is not None else self.llm
+        )
+
+    def _entities(self, entities: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        if self.entity_labels is None:
+            return entities
+        return [e for e in entities if e["label"] in self.entity_labels]
+
+    def _document_section(self, document: StoredDocument, user_message: str) -> str:
+        if self.document_mode == "summary":
+            # The precomputed summary if the document is long
+            excerpt = document.summary_for(self.document_summary_length)
+        else:
+            # Only the passages relevant to the message, not the whole upload
+            excerpt = document.context_for(user_message)
+        section = self.document_template.render({"excerpt": excerpt})
+
+        if self.document_entities_heading:
+            entities = self._entities(document.entities)[:self.document_max_entities]
+            if entities:
+                section += self.document_entities_heading
+                section += "".join(f"- {e['text']} ({e['label']})\n" for e in entities)
+                section += "\n"
+        return section
+
+    def render_prompt(self, user_message: str, history: str,
+                      document: Optional[StoredDocument] = None,
+                      nlp_analysis: Optional[Dict[str, Any]] = None) -> str:
+        """Build the task description for one chat turn."""
+        values = {
+            "history": history,
+            "user_message": user_message,
+            "document": self._document_section(document, user_message) if document is not None else "",
+            "sentiment_tone": "neutral",
+            "sentiment_compound": 0.0,
+            "entity_mentions": "None",
+            "primary_intent": "general",
+            "sentiment_note": "",
+            "intent_note": "",
+            "entity_section": "",
+        }
+
+        if nlp_analysis is not None:
+            compound = nlp_analysis["sentiment"]["compound"]
+            if compound >= 0.05:
+                values["sentiment_tone"] = "positive"
+            elif compound <= -0.05:
+                values["sentiment_tone"] = "negative"
+            values["sentiment_compound"] = compound
+
+            intents = nlp_analysis["intents"]
+            if intents:
+                values["primary_intent"] = max(intents.items(), key=lambda x: x[1])[0]
+
+            entities = self._entities(nlp_analysis["entities"])
+            if entities:
+                values["entity_mentions"] = ", ".join(f"{e['text']} ({e['label']})" for e in entities)
+                if self.entities_heading:
+                    lines = [self.entities_heading]
+                    lines.extend(f"- {e['text']} ({e['label']})\n" for e in entities)
+                    lines.append("\n")
+                    for e in entities:
+                        note = self.entity_notes.get(e["label"])
+                        if note is not None:
+                            lines.append(note.render(e))
+                    values["entity_section"] = "".join(lines)
+
+            note = self.sentiment_notes.get(values["sentiment_tone"])
+            if note is not None:
+                values["sentiment_note"] = note.render({})
+            note = self.intent_notes.get(values["primary_intent"])
+            if note is not None:
+                values["intent_note"] = note.render({})
+
+        return self.template.render(values)
+
+
+class PersonaRegistry:
+    """All configured personas, in file order."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, encoding="utf-8") as f:
+            config = json.load(f)
+        self.personas: Dict[str, Persona] = {}
+        for entry in config["personas"]:
+            persona = Persona(entry)
+            self.personas[persona.id] = persona
+
+    def get(self, persona_id: str) -> Persona:
+        persona = self.personas.get(persona_id)
+        if persona is None:
+            raise PersonaNotFoundError(persona_id)
+        return persona
+
+    def list(self) -> List[Dict[str, str]]:
+        return [persona.info() for persona in self.personas.values()]
+
+
+persona_registry = PersonaRegistry(os.environ.get("PERSONAS_FILE", DEFAULT_PERSONAS_FILE))
@@ -0,0 +1,178 @@
+"""
+Chat endpoints shared by every persona in the registry.
+"""
+import hashlib
+import json
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+
+from ..common_models import ChatRequest, ChatResponse, ChatWithAnalysisResponse
+from ..llm.cache import response_cache
+from ..llm.streaming import stream_persona_response
+from ..nlp_utils.executor import run_nlp_shared
+from ..nlp_utils.metrics import registry, stage
+from ..nlp_utils.singleflight import SingleFlight
+from ..nlp_utils.text_analysis import analyze_message
+from ..sessions import Session
+from .common import (
+    analyze_chat_request, conversation_text, lock_turn, record_turn, resolve_document, resolve_session,
+    run_persona_crew, session_turn, turn_recorder
+)
+from .admission import admission, client_id, hold_until_sent
+from .registry import Persona, PersonaNotFoundError, persona_registry
+
+router = APIRouter()
+
+# Identical replies being generated at the same time. Crew and streamed replies
+# render different prompts, so each path only shares replies with itself
+reply_flight = SingleFlight()
+registry.sampled("dialogix_llm_coalesced_total", "Persona replies that shared an identical reply in flight.",
+                 "counter", [], lambda: {(): reply_flight.stats()["coalesced"]})
+
+
+def get_persona(persona_id: str) -> Persona:
+    try:
+        return persona_registry.get(persona_id)
+    except PersonaNotFoundError:
+        raise HTTPException(status_code=404, detail=f"Unknown persona: {persona_id}")
+
+
+async def prepare_turn(persona: Persona, request: ChatRequest, session: Optional[Session],
+                       with_analysis: bool = False) -> Tuple[str, Optional[Dict[str, Any]]]:
+    """
+    Resolve the document of a request and build the persona's prompt. Returns
+    the task description and the NLP analysis, which is only computed up front
+    when the prompt or the response needs it.
+    """
+    with stage("document", persona.id):
+        document = await resolve_document(request)
+    analysis = None
+    if with_analysis:
+        with stage("nlp", persona.id):
+            analysis = await analyze_chat_request(request, document)
+    elif persona.uses_nlp:
+        with stage("nlp", persona.id):
+            analysis = await run_nlp_shared(analyze_message, request.user_message)
+    with stage("history", persona.id):
+        history = await conversation_text(persona.id, request, session)
+    with stage("prompt", persona.id):
+        task_description = persona.render_prompt(request.user_message, history, document, analysis)
+    return task_description, analysis
+
+
+def get_agent(persona: Persona) -> Any:
+    try:
+        return persona.agent
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def reply_key(persona: Persona, task_description: str, path: str) -> str:
+    """
+    Requests share a reply only if the persona settings, the exact prompt and
+    the way the reply is generated (``crew`` or ``stream``) match.
+    """
+    payload = json.dumps([persona.id, persona.fingerprint, path, task_description])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+async def generate_reply(persona: Persona, task_description: str) -> str:
+    response = await run_persona_crew(persona, task_description)
+    response_cache.set(persona, task_description, response, path="crew")
+    return response
+
+
+async def reply(persona: Persona, task_description: str) -> str:
+    cached = response_cache.get(persona, task_description, path="crew")
+    if cached is not None:
+        return cached
+    try:
+        with stage("llm", persona.id):
+            return await reply_flight.do(
+                reply_key(persona, task_description, "crew"), lambda: generate_reply(persona, task_description)
+            )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def stream_reply(persona: Persona, request: ChatRequest, session: Optional[Session], task_description: str,
+                 analysis: Optional[Dict[str, Any]], announce_analysis: bool = False) -> StreamingResponse:
+    """
+    Stream the reply from the response cache if possible, otherwise from the
+    provider, or wait for an identical reply another request is generating.
+    """
+    cached = response_cache.get(persona, task_description, path="stream")
+    record = turn_recorder(session, request.user_message)
+
+    def on_complete(response: str) -> None:
+        if cached is None:
+            response_cache.set(persona, task_description, response, path="stream")
+        if record is not None:
+            record(response)
+
+    return stream_persona_response(
+        persona.id, get_agent(persona), task_description, persona.expected_output, request.user_message,
+        analysis, announce_analysis, on_complete=on_complete, cached_response=cached,
+        flight=reply_flight, flight_key=reply_key(persona, task_description, "stream")
+    )
+
+
+async def admitted_stream(persona: Persona, request: ChatRequest, http_request: Request,
+                          with_analysis: bool = False) -> StreamingResponse:
+    """Admit a streamed chat and keep it admitted until the last event has been sent."""
+    ticket = await admission.acquire(persona.id, client_id(http_request))
+    end_turn = None
+    try:
+        session = resolve_session(request, persona.id)
+        # The turn is recorded once the reply is complete, so the session stays held until then
+        end_turn = await lock_turn(session)
+        task_description, analysis = await prepare_turn(persona, request, session, with_analysis)
+        response = stream_reply(persona, request, session, task_description, analysis,
+                                announce_analysis=with_analysis)
+    except BaseException:
+        if end_turn is not None:
+            end_turn()
+        ticket.release()
+        raise
+    return hold_until_sent(response, ticket, end_turn)
+
+
+@router.post("/{persona_id}/chat", response_model=ChatResponse)
+async def chat(persona_id: str, request: ChatRequest, http_request: Request):
+    persona = get_persona(persona_id)
+    async with admission.admit(persona.id, client_id(http_request)):
+        session = resolve_session(request, persona.id)
+        async with session_turn(session):
+            task_description, _ = await prepare_turn(persona, request, session)
+
+            response = await reply(persona, task_description)
+            record_turn(session, request.user_message, response)
+    return {"response": response}
+
+
+@router.post("/{persona_id}/chat/stream")
+async def stream_chat(persona_id: str, request: ChatRequest, http_request: Request):
+    """Stream the reply as server-sent events, ending with the NLP analysis."""
+    return await admitted_stream(get_persona(persona_id), request, http_request)
+
+
+@router.post("/{persona_id}/chat_with_analysis", response_model=ChatWithAnalysisResponse)
+async def chat_with_analysis(persona_id: str, request: ChatRequest, http_request: Request):
+    """Return the NLP analysis of the message together with the reply in one round trip."""
+    persona = get_persona(persona_id)
+    async with admission.admit(persona.id, client_id(http_request)):
+        session = resolve_session(request, persona.id)
+        async with session_turn(session):
+            task_description, analysis = await prepare_turn(persona, request, session, with_analysis=True)
+
+            response = await reply(persona, task_description)
+            record_turn(session, request.user_message, response)
+    return {"response": response, "analysis": analysis}
+
+
+@router.post("/{persona_id}/chat_with_analysis/stream")
+async def stream_chat_with_analysis(persona_id: str, request: ChatRequest, http_request: Request):
+    """Stream an ``analysis`` event as soon as NLP finishes, then the reply tokens."""
+    return await admitted_stream(get_persona(persona_id), request, http_request, with_analysis=True)
@@ -0,0 +1,225 @@
+"""
+Preforked multi-worker launcher.
+
+``uvicorn --workers N`` starts N fresh interpreters, and each one loads the
+spaCy pipeline, the VADER lexicon, NLTK's punkt tables and scikit-learn on
+its own, so memory grows by the full model footprint per worker. This
+launcher imports the app and loads the models once in a parent process,
+moves everything allocated so far out of the garbage collector's reach with
+``gc.freeze()`` (so collections in the workers don't write to, and thereby
+copy, the shared pages), binds the listening socket and then forks the
+workers. They share the loaded models copy-on-write and accept connections
+from the same socket. A worker that dies is replaced by a new fork of the
+warm parent.
+
+Only what exists before the fork is shared; sessions and documents created
+later live in the worker that created them. With more than one worker the
+launcher refuses to start unless both are kept in storage the workers share
+(``SESSION_BACKEND=disk`` and ``DOCUMENT_DIR``).
+
+The parent prints the memory of every worker from ``/proc/<pid>/smaps_rollup``
+once they are up, every ``--memory-interval`` seconds and on ``SIGUSR1``. PSS
+counts each shared page once, divided among the processes sharing it, so the
+PSS total is the real footprint of the whole group. Each worker also reports
+its own figures as ``dialogix_process_memory_bytes`` on ``/metrics``.
+
+Linux and macOS only. Run from the repository root::
+
+    python -m backend.serve --workers 4 --port 8000
+    python -m backend.serve --app simple_nlp_server:app --app-dir backend --port 8001
+"""
+import argparse
+import gc
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from backend.nlp_utils.metrics import process_memory
+
+
+def load_app(target: str) -> Any:
+    module_name, _, attr = target.partition(":")
+    return getattr(importlib.import_module(module_name), attr or "app")
+
+
+def load_models() -> None:
+    """Load the NLP models of whichever copy of ``nlp_utils`` the app imported."""
+    for name, module in list(sys.modules.items()):
+        if name.endswith("nlp_utils.text_analysis") and hasattr(module, "load_models"):
+            try:
+                status = module.load_models()
+            except Exception as e:
+                print(f"Could not load NLP models, each worker will load them on first use: {str(e)}")
+                continue
+            print(f"Loaded NLP models in {status['load_seconds']}s")
+
+
+def process_local_state() -> List[str]:
+    """
+    Stores of the loaded app that live in this process only. Forked workers
+    would each get their own copy, so ids created on one would be unknown
+    to the others.
+    """
+    local = set()
+    for name, module in list(sys.modules.items()):
+        sessions = getattr(module, "session_store", None)
+        if name.split(".")[-1] == "sessions" and sessions is not None and not sessions.backend.shared:
+            local.add("sessions (set SESSION_BACKEND=disk)")
+        documents = getattr(module, "document_store", None)
+        if name.endswith("nlp_utils.documents") and documents is not None and documents.directory is None:
+            local.add("documents (set DOCUMENT_DIR)")
+    return sorted(local)
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app: Any, sock: socket.socket, log_level: str) -> None:
+    import uvicorn
+
+    # The parent's handlers must not run in the worker; uvicorn installs its own
+    for signum in (signal.SIGTERM, signal.SIGINT, signal.SIGUSR1, signal.SIGCHLD):
+        signal.signal(signum, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def format_memory(workers: Dict[int, int]) -> str:
+    rows = [("parent", os.getpid())] + [(f"worker {index}", pid) for pid, index in sorted(workers.items(), key=lambda x: x[1])]
+    lines = [f"{'process':<10}{'pid':>8}{'rss MB':>10}{'pss MB':>10}{'uss MB':>10}{'shared MB':>11}"]
+    totals = {"rss": 0, "pss": 0, "uss": 0}
+    for name, pid in rows:
+        memory = process_memory(str(pid))
+        if not memory:
+            lines.append(f"{name:<10}{pid:>8}  (memory not available)")
+            continue
+        for key in totals:
+            totals[key] += memory[key]
+        lines.append(
+            f"{name:<10}{pid:>8}{memory['rss'] / 2**20:>10.1f}{memory['pss'] / 2**20:>10.1f}"
+            f"{memory['uss'] / 2**20:>10.1f}{memory['shared'] / 2**20:>11.1f}"
+        )
+    lines.append(f"{'total':<10}{'':>8}{totals['rss'] / 2**20:>10.1f}{totals['pss'] / 2**20:>10.1f}{totals['uss'] / 2**20:>10.1f}")
+    return "\n".join(lines)
+
+
+class Prefork:
+    """Parent process that keeps ``count`` forked workers running."""
+
+    def __init__(self, app: Any, sock: socket.socket, count: int, log_level: str = "info"):
+        self.app = app
+        self.sock = sock
+        self.count = count
+        self.log_level = log_level
+        # pid -> worker index
+        self.workers: Dict[int, int] = {}
+        self.stopping = False
+        self.report_requested = False
+
+    def spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            gc.enable()
+            code = 0
+            try:
+                run_worker(self.app, self.sock, self.log_level)
+            except BaseException:
+                import traceback
+                traceback.print_exc()
+                code = 1
+            finally:
+                os._exit(code)
+        self.workers[pid] = index
+
+    def stop(self, signum: int, frame: Any) -> None:
+        self.stopping = True
+        for pid in self.workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def request_report(self, signum: int, frame: Any) -> None:
+        self.report_requested = True
+
+    def reap(self) -> None:
+        """Collect exited workers and replace them unless shutting down."""
+        while self.workers:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            index = self.workers.pop(pid, None)
+            if index is not None and not self.stopping:
+                print(f"Worker {index} (pid {pid}) exited with status {status}, starting a new one")
+                self.spawn(index)
+
+    def run(self, memory_delay: float = 5.0, memory_interval: float = 0.0) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGUSR1, self.request_report)
+        for index in range(self.count):
+            self.spawn(index)
+        print(f"Started {self.count} workers: {', '.join(str(pid) for pid in self.workers)}")
+
+        next_report: Optional[float] = time.monotonic() + memory_delay
+        while self.workers:
+            time.sleep(0.5)
+            self.reap()
+            now = time.monotonic()
+            if self.stopping:
+                continue
+            if self.report_requested or (next_report is not None and now >= next_report):
+                self.report_requested = False
+                print(format_memory(self.workers), flush=True)
+                next_report = now + memory_interval if memory_interval > 0 else None
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Serve a Dialogix app from preforked workers sharing loaded models.")
+    parser.add_argument("--app", default="backend.main:app", help="module:attribute of the ASGI app")
+    parser.add_argument("--app-dir", default=None, help="directory to add to sys.path before importing the app")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--memory-interval", type=float, default=0,
+                        help="seconds between memory reports; 0 reports once after startup")
+    args = parser.parse_args(argv)
+
+    if not hasattr(os, "fork"):
+        sys.exit("Preforked workers need os.fork; run uvicorn directly on this platform")
+    if args.app_dir:
+        sys.path.insert(0, os.path.abspath(args.app_dir))
+
+    # Objects created while loading never become garbage, so keep the collector
+    # from touching (and copying) them while they are built and after the fork
+    gc.disable()
+    app = load_app(args.app)
+    local = process_local_state()
+    if args.workers > 1 and local:
+        sys.exit(f"Workers would not share {' and '.join(local)}; configure shared storage or use --workers 1")
+    load_models()
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    print(f"Listening on http://{args.host}:{args.port}")
+    Prefork(app, sock, args.workers, args.log_level).run(memory_interval=args.memory_interval)
+
+
+if __name__ == "__main__":
+    main()
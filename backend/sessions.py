@@ -0,0 +1,349 @@
+"""
+Server-side conversation sessions.
+
+A session keeps the conversation history on the server, so each chat request
+only carries the new message and a ``session_id`` instead of the whole
+``conversation_history``. Turns are stored once, append-only, as
+``(sender, message)`` tuples. The prompt text is rendered from them on demand;
+only its length is kept up to date, so the token budget can be checked
+without rendering anything. Once a conversation outgrows the budget, only
+the turns added since the last compaction are rendered.
+
+A session belongs to the persona it was created for, and its ``lock`` is held
+for the whole of a turn, so concurrent requests on one session take turns.
+
+Two backends are available:
+
+- ``memory`` - sessions live in the process and are lost on restart
+- ``disk`` - each session is an append-only JSON-lines file, with recently
+  used sessions kept in memory. The directory can be shared by several worker
+  processes: a cached session picks up turns other processes appended to its
+  file before it is used.
+
+Idle sessions expire after a TTL, and the least recently used sessions are
+evicted once there are more than the configured maximum.
+
+Configuration (environment variables):
+
+- ``SESSION_BACKEND`` - ``memory`` (default) or ``disk``
+- ``SESSION_DIR`` - directory for the ``disk`` backend (default: ``dialogix_sessions`` in the temp dir)
+- ``SESSION_TTL`` - seconds a session may stay idle before it expires (default: 86400)
+- ``SESSION_MAX_SESSIONS`` - sessions kept before the least recently used is evicted (default: 10000)
+"""
+import asyncio
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from itertools import islice
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Session ids are generated by the server; anything else is rejected before
+# it can reach the filesystem
+SESSION_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+Turn = Tuple[str, str]
+
+
+class SessionNotFoundError(KeyError):
+    """Raised when a session id is unknown, malformed or has expired."""
+
+
+class Session:
+    """Append-only conversation history, rendered for prompts on demand."""
+
+    def __init__(self, session_id: str, persona_id: Optional[str] = None,
+                 turns: Iterable[Turn] = (), created_at: Optional[float] = None):
+        self.session_id = session_id
+        self.persona_id = persona_id
+        self.created_at = created_at or time.time()
+        self.last_active = time.monotonic()
+        self.turns: List[Turn] = []
+        # Length of ``history_text()``, without rendering it
+        self.history_chars = 0
+        # Rolling summary state kept by the history compactor
+        self.compaction: Optional[Any] = None
+        # Held by a request for the whole of its turn
+        self.lock = asyncio.Lock()
+        # Size of the session's file as of these turns, for the disk backend
+        self.stored_bytes: Optional[int] = None
+        self._extend(turns)
+
+    def _extend(self, turns: Iterable[Turn]) -> List[Turn]:
+        added = [(sender, message) for sender, message in turns]
+        for sender, message in added:
+            # "sender: message", plus the newline separating it from the previous turn
+            self.history_chars += len(sender) + len(message) + (3 if self.turns else 2)
+            self.turns.append((sender, message))
+        return added
+
+    def append(self, turns: Iterable[Turn]) -> List[Turn]:
+        """Add turns and return them as stored."""
+        added = self._extend(turns)
+        self.last_active = time.monotonic()
+        return added
+
+    def history_lines(self, start: int = 0) -> List[str]:
+        """The ``"sender: message"`` lines of the turns from ``start`` on."""
+        return [f"{sender}: {message}" for sender, message in islice(self.turns, start, None)]
+
+    def history_text(self) -> str:
+        """The whole conversation as prompt text."""
+        return "\n".join(self.history_lines())
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "persona_id": self.persona_id,
+            "turns": [{"sender": sender, "message": message} for sender, message in self.turns],
+        }
+
+
+class SessionBackend:
+    """Interface for session storage."""
+
+    # Whether other processes using the same settings see the same sessions
+    shared = False
+
+    def create(self, session: Session) -> None:
+        raise NotImplementedError
+
+    def get(self, session_id: str) -> Optional[Session]:
+        raise NotImplementedError
+
+    def append(self, session: Session, turns: List[Turn]) -> None:
+        raise NotImplementedError
+
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class MemoryBackend(SessionBackend):
+    """Sessions held in an in-process LRU with an idle TTL."""
+
+    def __init__(self, ttl: float = 86400, max_sessions: int = 10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def create(self, session: Session) -> None:
+        with self._lock:
+            self._sessions[session.session_id] = session
+            self._evict()
+
+    def get(self, session_id: str) -> Optional[Session]:
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return None
+            if session.last_active + self.ttl < time.monotonic():
+                del self._sessions[session_id]
+                return None
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def append(self, session: Session, turns: List[Turn]) -> None:
+        # The session object is the storage, so only its recency changes
+        with self._lock:
+            if session.session_id in self._sessions:
+                self._sessions.move_to_end(session.session_id)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        # Least recently used first, so expired sessions are at the front
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if len(self._sessions) <= self.max_sessions and session.last_active + self.ttl >= now:
+                break
+            self._sessions.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "memory", "sessions": len(self._sessions)}
+
+
+class DiskBackend(SessionBackend):
+    """
+    One append-only JSON-lines file per session: a header line with the
+    session metadata followed by one line per turn. Recently used sessions are
+    also kept in memory so a turn costs a single small append, together with
+    the size of the file they reflect. If the file has grown since, another
+    process appended to it, and only the new lines are read.
+    """
+
+    shared = True
+
+    # Check the TTL and size cap every this many new sessions
+    EVICT_EVERY = 64
+
+    def __init__(self, directory: str, ttl: float = 86400, max_sessions: int = 10000,
+                 max_cached: int = 1024):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._cache = MemoryBackend(ttl=ttl, max_sessions=max_cached)
+        self._lock = threading.Lock()
+        self._creates = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{session_id}.jsonl")
+
+    def create(self, session: Session) -> None:
+        header = {"session_id": session.session_id, "persona_id": session.persona_id,
+                  "created_at": session.created_at}
+        lines = [json.dumps(header)] + [json.dumps(turn) for turn in session.turns]
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        with open(self._path(session.session_id), "wb") as f:
+            f.write(data)
+        session.stored_bytes = len(data)
+        self._cache.create(session)
+        with self._lock:
+            self._creates += 1
+            evict = self._creates % self.EVICT_EVERY == 0
+        if evict:
+            self._evict()
+
+    def _refresh(self, session: Session) -> bool:
+        """Bring a cached session up to date with its file; False if it must be reloaded."""
+        try:
+            size = os.path.getsize(self._path(session.session_id))
+            if size == session.stored_bytes:
+                return True
+            if session.stored_bytes is None or size < session.stored_bytes:
+                return False
+            with open(self._path(session.session_id), "rb") as f:
+                f.seek(session.stored_bytes)
+                data = f.read(size - session.stored_bytes)
+            # A line still being written is picked up next time
+            data = data[:data.rfind(b"\n") + 1]
+            turns = [tuple(json.loads(line)) for line in data.splitlines() if line.strip()]
+        except (OSError, ValueError):
+            return False
+        session.append(turns)
+        session.stored_bytes += len(data)
+        return True
+
+    def get(self, session_id: str) -> Optional[Session]:
+        session = self._cache.get(session_id)
+        if session is not None:
+            if self._refresh(session):
+                return session
+            # Deleted, expired or rewritten by another process
+            self._cache.delete(session_id)
+        path = self._path(session_id)
+        try:
+            if os.path.getmtime(path) + self.ttl < time.time():
+                self.delete(session_id)
+                return None
+            with open(path, "rb") as f:
+                data = f.read()
+            lines = data.splitlines()
+            header = json.loads(lines[0])
+            turns = [tuple(json.loads(line)) for line in lines[1:] if line.strip()]
+        except (OSError, ValueError, IndexError):
+            return None
+        session = Session(session_id, header.get("persona_id"), turns, header.get("created_at"))
+        session.stored_bytes = len(data)
+        self._cache.create(session)
+        return session
+
+    def append(self, session: Session, turns: List[Turn]) -> None:
+        data = "".join(json.dumps(turn) + "\n" for turn in turns).encode("utf-8")
+        with open(self._path(session.session_id), "ab") as f:
+            f.write(data)
+            end = f.tell()
+        if session.stored_bytes == end - len(data):
+            session.stored_bytes = end
+            self._cache.append(session, turns)
+        else:
+            # Another process appended in between, so the cached turns are out
+            # of order; the session is read again from its file on next use
+            self._cache.delete(session.session_id)
+
+    def delete(self, session_id: str) -> None:
+        self._cache.delete(session_id)
+        try:
+            os.remove(self._path(session_id))
+        except FileNotFoundError:
+            pass
+
+    def _evict(self) -> None:
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".jsonl"):
+                try:
+                    files.append((entry.stat().st_mtime, entry.name[:-len(".jsonl")]))
+                except FileNotFoundError:
+                    continue
+        files.sort()
+        cutoff = time.time() - self.ttl
+        excess = len(files) - self.max_sessions
+        for i, (mtime, session_id) in enumerate(files):
+            if i >= excess and mtime >= cutoff:
+                break
+            self.delete(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        sessions = sum(1 for name in os.listdir(self.directory) if name.endswith(".jsonl"))
+        return {"backend": "disk", "path": self.directory, "sessions": sessions,
+                "cached": self._cache.stats()["sessions"]}
+
+
+class SessionStore:
+    """Creates sessions and records turns through a pluggable backend."""
+
+    def __init__(self, backend: SessionBackend):
+        self.backend = backend
+
+    def create(self, persona_id: Optional[str] = None, turns: Iterable[Turn] = ()) -> Session:
+        session = Session(uuid.uuid4().hex, persona_id, turns)
+        self.backend.create(session)
+        return session
+
+    def get(self, session_id: str) -> Session:
+        session = None
+        if SESSION_ID_RE.match(session_id):
+            session = self.backend.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+        return session
+
+    def append(self, session: Session, turns: Iterable[Turn]) -> None:
+        """Record new turns for a session."""
+        self.backend.append(session, session.append(turns))
+
+    def delete(self, session_id: str) -> None:
+        if SESSION_ID_RE.match(session_id):
+            self.backend.delete(session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.backend.stats()
+
+
+def backend_from_env() -> SessionBackend:
+    """Create the session backend selected by ``SESSION_BACKEND``."""
+    kind = os.environ.get("SESSION_BACKEND", "memory").lower()
+    ttl = float(os.environ.get("SESSION_TTL", "86400"))
+    max_sessions = int(os.environ.get("SESSION_MAX_SESSIONS", "10000"))
+
+    if kind == "disk":
+        directory = os.environ.get(
+            "SESSION_DIR", os.path.join(tempfile.gettempdir(), "dialogix_sessions")
+        )
+        return DiskBackend(directory, ttl=ttl, max_sessions=max_sessions)
+    return MemoryBackend(ttl=ttl, max_sessions=max_sessions)
+
+
+session_store = SessionStore(backend_from_env())
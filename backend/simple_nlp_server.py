@@ -2,8 +2,16 @@ import os
 import sys
 from fastapi import FastAPI, HTTPException, APIRouter
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from typing import Dict, List, Optional, Any, Union
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing_extensions import Annotated
+
+# Add the current directory to the path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(current_dir)
+
+from nlp_utils.schema import Analysis, Entity
 
 # Create models directly in this file to avoid import issues
 class NLPAnalysisRequest(BaseModel):
@@ -12,23 +20,38 @@ class NLPAnalysisRequest(BaseModel):
 
 class NLPAnalysisResponse(BaseModel):
     sentiment: Dict[str, float]
-    entities: List[Dict[str, Any]]  # Changed to Any to handle both string and int
+    entities: List[Entity]
     intents: Dict[str, float]
     document_summary: Optional[str] = None
-    document_entities: Optional[List[Dict[str, Any]]] = None
+    document_entities: Optional[List[Entity]] = None
 
-# Add the current directory to the path
-current_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.append(current_dir)
+# One batch runs as a handful of worker jobs, so its size is capped to keep
+# a single request from holding the NLP pool
+BATCH_MAX_TEXTS = int(os.environ.get("NLP_BATCH_MAX_TEXTS", "1000"))
+BATCH_MAX_TEXT_CHARS = int(os.environ.get("NLP_BATCH_MAX_TEXT_CHARS", "10000"))
+
+class NLPBatchAnalysisRequest(BaseModel):
+    texts: List[Annotated[str, Field(max_length=BATCH_MAX_TEXT_CHARS)]] = Field(max_length=BATCH_MAX_TEXTS)
+    batch_size: int = Field(default=64, ge=1, le=256)
+
+class NLPBatchAnalysisResponse(BaseModel):
+    results: List[Analysis]  # Checked as dictionaries, not a model per result
 
 # Import NLP utilities directly with relative imports
-from nlp_utils.text_analysis import analyze_message, summarize_text
+from nlp_utils.text_analysis import (
+    analyze_batch, analyze_with_document, model_status, warm_up_in_background
+)
+from nlp_utils.executor import NLPQueueFullError, map_nlp, run_nlp_shared, shutdown_nlp_executor
+from nlp_utils.metrics import instrument_app
+from nlp_utils.profiling import enable_profiling
+from nlp_utils.responses import enable_compression, json_response_class
 
 # Create the FastAPI app
 app = FastAPI(
     title="Dialogix NLP Visualizer",
     description="NLP visualization service for Dialogix",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=json_response_class(),
 )
 
 # Configure CORS
@@ -40,36 +63,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Helper function to sanitize analysis results
-def sanitize_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
-    """Ensure all values in the analysis conform to the expected types."""
-    # Handle entities with proper type conversion
-    if "entities" in analysis and analysis["entities"]:
-        for entity in analysis["entities"]:
-            # Make sure we handle empty entities
-            if entity is None:
-                continue
-                
-            # Convert integer values to strings where needed
-            if "start" in entity and entity["start"] is not None:
-                entity["start"] = entity["start"]  # Keep as is, we've updated the model
-                
-            if "end" in entity and entity["end"] is not None:
-                entity["end"] = entity["end"]  # Keep as is, we've updated the model
-                
-    # Make sure sentiment values are floats
-    if "sentiment" in analysis and analysis["sentiment"]:
-        for key, value in analysis["sentiment"].items():
-            if value is not None:
-                analysis["sentiment"][key] = float(value)
-                
-    # Make sure intent values are floats
-    if "intents" in analysis and analysis["intents"]:
-        for key, value in analysis["intents"].items():
-            if value is not None:
-                analysis["intents"][key] = float(value)
-                
-    return analysis
+# Compress large responses for clients that accept gzip or brotli
+enable_compression(app)
+# Time every request and serve Prometheus metrics at /metrics
+instrument_app(app)
+# Profile single requests that ask for it with X-Profile: 1 or ?profile=1
+enable_profiling(app)
 
 # NLP analysis endpoint
 @app.post("/api/nlp/analyze", response_model=NLPAnalysisResponse)
@@ -78,41 +77,68 @@ async def analyze_text(request: NLPAnalysisRequest):
     Analyze text using NLP techniques and return insights.
     """
     try:
-        print(f"Received analysis request for: {request.text[:30]}...")
-        
         # Add content warning filter to handle potentially offensive content
         if any(word in request.text.lower() for word in ["fuck", "shit", "ass", "bitch"]):
             print("Warning: Potentially offensive content detected. Applying content filter.")
             # Still analyze but apply filter later
             
-        # Analyze the main text content
-        analysis = analyze_message(request.text)
-        
-        # Sanitize the analysis to ensure proper types
-        analysis = sanitize_analysis(analysis)
-        
-        # If document is provided, include a summary
-        if request.document:
-            summary = summarize_text(request.document, max_length=500)
-            analysis["document_summary"] = summary
-            
-            # Also analyze key entities in the document
-            doc_entities = analyze_message(summary)["entities"]
-            # Sanitize document entities too
-            doc_entities_sanitized = sanitize_analysis({"entities": doc_entities})["entities"]
-            analysis["document_entities"] = doc_entities_sanitized
+        # Analyze the main text content, plus a summary of the document if one is provided
+        # Results already carry the response model's types, so they're returned as is
+        analysis = await run_nlp_shared(analyze_with_document, request.text, request.document)
         
-        print("Analysis completed successfully")
         return analysis
+    except NLPQueueFullError:
+        raise
     except Exception as e:
         error_msg = f"Error analyzing text: {str(e)}"
         print(error_msg)
         raise HTTPException(status_code=500, detail=error_msg)
 
+@app.post("/api/nlp/analyze_batch", response_model=NLPBatchAnalysisResponse)
+async def analyze_text_batch(request: NLPBatchAnalysisRequest):
+    """
+    Analyze a list of messages in one request, returning results in input order.
+    """
+    try:
+        results = await map_nlp(analyze_batch, request.texts, batch_size=request.batch_size)
+        return {"results": results}
+    except NLPQueueFullError:
+        raise
+    except Exception as e:
+        error_msg = f"Error analyzing batch: {str(e)}"
+        print(error_msg)
+        raise HTTPException(status_code=500, detail=error_msg)
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to Dialogix NLP Visualizer", "status": "online"}
 
+@app.exception_handler(NLPQueueFullError)
+async def nlp_queue_full_handler(request, exc):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "NLP workers are busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
+@app.on_event("startup")
+def warm_up_models():
+    # Load the NLP models in the background so the server starts accepting
+    # connections immediately; /ready reports when they are usable
+    warm_up_in_background()
+
+@app.get("/ready")
+def readiness():
+    """Readiness probe: 200 once the NLP models are loaded, 503 until then."""
+    status = model_status()
+    if status["state"] != "ready":
+        return JSONResponse(status_code=503, content={"status": status["state"], "models": status})
+    return {"status": "ready", "models": status}
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    shutdown_nlp_executor()
+
 # Add an error fallback route
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
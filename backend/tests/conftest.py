@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Tests import the backend as the ``backend`` package, like the servers do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+# No provider calls or on-disk caches from the test run
+os.environ.setdefault("LLM_BACKEND", "fake")
+os.environ.setdefault("NLP_CACHE_BACKEND", "memory")
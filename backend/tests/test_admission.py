@@ -0,0 +1,58 @@
+import asyncio
+import threading
+
+from backend.llm.executor import LLMExecutor
+from backend.nlp_utils.profiling import parse_networks
+from backend.persona_agents.admission import AdmissionController, client_key
+
+
+def test_cancelled_chat_stays_admitted_until_its_llm_call_finishes():
+    llm_running = threading.Event()
+    finish_llm = threading.Event()
+
+    def slow_kickoff():
+        llm_running.set()
+        finish_llm.wait(10)
+        return "reply"
+
+    async def scenario():
+        controller = AdmissionController(max_active=1, persona_active=1)
+        executor = LLMExecutor(max_concurrency=2, persona_concurrency=2)
+
+        async def chat():
+            async with controller.admit("professor", "client-a"):
+                return await executor.run("professor", slow_kickoff)
+
+        request = asyncio.ensure_future(chat())
+        while not llm_running.is_set():
+            await asyncio.sleep(0.01)
+        request.cancel()
+        await asyncio.gather(request, return_exceptions=True)
+        # The client is gone but the kickoff is still running on its thread
+        assert controller.stats()["active"] == 1
+
+        next_chat = asyncio.ensure_future(controller.acquire("professor", "client-b"))
+        await asyncio.sleep(0.05)
+        assert not next_chat.done()
+
+        finish_llm.set()
+        ticket = await asyncio.wait_for(next_chat, 5)
+        ticket.release()
+        assert controller.stats()["active"] == 0
+        executor.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_client_key_trusts_the_forwarded_header_only_from_proxies():
+    proxies = parse_networks("10.0.0.0/8")
+    # Direct clients can't pick their own identity
+    assert client_key("203.0.113.7", "198.51.100.1", proxies) == "203.0.113.7"
+    assert client_key("10.0.0.2", None, proxies) == "10.0.0.2"
+    # The right-most address that isn't one of our proxies
+    assert client_key("10.0.0.2", "1.2.3.4, 198.51.100.1, 10.0.0.3", proxies) == "198.51.100.1"
+    assert client_key("10.0.0.2", "10.0.0.4", proxies) == "10.0.0.2"
+    # A gateway's client key header
+    assert client_key("10.0.0.2", "tenant-42", proxies) == "tenant-42"
+    assert client_key("10.0.0.2", "198.51.100.1", []) == "10.0.0.2"
+    assert client_key(None, "198.51.100.1", proxies) == "unknown"
@@ -0,0 +1,41 @@
+import os
+import stat
+from concurrent.futures import ThreadPoolExecutor
+
+from backend.nlp_utils.cache import AnalysisCache, MemoryBackend, SQLiteBackend, backend_from_env
+
+
+def test_defaults_to_memory(monkeypatch):
+    monkeypatch.delenv("NLP_CACHE_BACKEND", raising=False)
+    assert isinstance(backend_from_env(), MemoryBackend)
+
+    # No file in a shared temp directory unless the path is chosen explicitly
+    monkeypatch.setenv("NLP_CACHE_BACKEND", "sqlite")
+    monkeypatch.delenv("NLP_CACHE_PATH", raising=False)
+    assert isinstance(backend_from_env(), MemoryBackend)
+
+
+def test_sqlite_file_is_private(tmp_path, monkeypatch):
+    path = tmp_path / "nlp.sqlite3"
+    monkeypatch.setenv("NLP_CACHE_BACKEND", "sqlite")
+    monkeypatch.setenv("NLP_CACHE_PATH", str(path))
+    backend = backend_from_env()
+    assert isinstance(backend, SQLiteBackend)
+    backend.set("key", b"value")
+    assert backend.get("key") == b"value"
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+
+def test_counts_lookups_from_many_threads():
+    cache = AnalysisCache(MemoryBackend())
+
+    @cache.cached
+    def double(value):
+        return value * 2
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda i: double(i % 10), range(2000)))
+    assert results == [(i % 10) * 2 for i in range(2000)]
+    stats = cache.stats()
+    assert stats["hits"] + stats["misses"] == 2000
+    assert stats["misses"] >= 10
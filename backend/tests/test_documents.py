@@ -0,0 +1,156 @@
+import asyncio
+
+import pytest
+
+from backend.nlp_utils import documents
+from backend.nlp_utils.documents import DocumentNotFoundError, DocumentProcessingError, DocumentStore
+from backend.nlp_utils.retrieval import ChunkIndex
+
+
+def fake_artifacts(text):
+    """build_document_artifacts without the spaCy pipeline."""
+    chunks = [text]
+    return {
+        "summary": text[:20],
+        "entities": [],
+        "summary_entities": [],
+        "chunks": chunks,
+        "index": ChunkIndex(chunks),
+        "sentence_count": 1,
+    }
+
+
+def test_upload_document_schedules_processing():
+    pytest.importorskip("crewai")
+    pytest.importorskip("litellm")
+    from fastapi.testclient import TestClient
+
+    from backend.main import app
+
+    content = "Dialogix keeps uploaded documents. They are summarized once."
+    with TestClient(app) as client:
+        response = client.post("/api/documents", json={"content": content, "filename": "notes.txt"})
+        assert response.status_code == 202
+        body = response.json()
+        assert body["document_id"] == DocumentStore.document_id_for(content)
+        assert body["filename"] == "notes.txt"
+
+        response = client.get(f"/api/documents/{body['document_id']}")
+        assert response.status_code == 200
+
+
+def test_documents_are_shared_through_the_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(documents, "build_document_artifacts", fake_artifacts)
+    first = DocumentStore(directory=str(tmp_path))
+    second = DocumentStore(directory=str(tmp_path))
+    text = "A document uploaded to one worker and used through another."
+
+    async def scenario():
+        document = first.ingest(text, "shared.txt")
+        await document.wait_ready()
+        # Wait for the record to be written after the document became ready
+        await asyncio.gather(*first._tasks)
+
+        info = second.get(document.document_id).info()
+        assert info["status"] == "ready"
+        assert info["filename"] == "shared.txt"
+        assert info["summary"] == text[:20]
+
+        loaded = await second.get_ready(document.document_id)
+        assert loaded.text == text
+        assert loaded.context_for("worker") == document.context_for("worker")
+        assert second.stats()["documents"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_waits_for_a_document_another_process_is_processing(tmp_path, monkeypatch):
+    release = None
+
+    def slow_artifacts(text):
+        release.wait(5)
+        return fake_artifacts(text)
+
+    monkeypatch.setattr(documents, "build_document_artifacts", slow_artifacts)
+    monkeypatch.setattr(documents, "SHARED_POLL_SECONDS", 0.01)
+    first = DocumentStore(directory=str(tmp_path))
+    second = DocumentStore(directory=str(tmp_path))
+
+    async def scenario():
+        nonlocal release
+        import threading
+        release = threading.Event()
+        document = first.ingest("Still being processed by the first worker.")
+
+        assert second.get(document.document_id).info()["status"] == "processing"
+        waiting = asyncio.ensure_future(second.get_ready(document.document_id))
+        await asyncio.sleep(0.05)
+        assert not waiting.done()
+
+        release.set()
+        loaded = await asyncio.wait_for(waiting, 5)
+        assert loaded.status == "ready"
+
+    asyncio.run(scenario())
+
+
+def test_failures_and_unknown_ids_are_shared(tmp_path, monkeypatch):
+    def broken_artifacts(text):
+        raise ValueError("unreadable")
+
+    monkeypatch.setattr(documents, "build_document_artifacts", broken_artifacts)
+    first = DocumentStore(directory=str(tmp_path))
+    second = DocumentStore(directory=str(tmp_path))
+
+    async def scenario():
+        document = first.ingest("This one cannot be processed.")
+        with pytest.raises(DocumentProcessingError):
+            await document.wait_ready()
+
+        with pytest.raises(DocumentProcessingError, match="unreadable"):
+            await second.get_ready(document.document_id)
+        with pytest.raises(DocumentNotFoundError):
+            await second.get_ready("0" * 32)
+        with pytest.raises(DocumentNotFoundError):
+            second.get("../" + document.document_id)
+
+    asyncio.run(scenario())
+
+
+def test_shared_directory_is_capped(tmp_path, monkeypatch):
+    monkeypatch.setattr(documents, "build_document_artifacts", fake_artifacts)
+    monkeypatch.setattr(documents, "SHARED_SWEEP_EVERY", 1)
+    store = DocumentStore(directory=str(tmp_path), max_shared=2)
+
+    async def scenario():
+        for i in range(4):
+            await store.ingest(f"Document number {i}.").wait_ready()
+            await asyncio.gather(*store._tasks)
+
+    asyncio.run(scenario())
+    assert len(list(tmp_path.glob("*.json"))) == 2
+
+
+def test_sweep_only_touches_the_stores_own_files(tmp_path, monkeypatch):
+    monkeypatch.setattr(documents, "build_document_artifacts", fake_artifacts)
+    monkeypatch.setattr(documents, "SHARED_SWEEP_EVERY", 1)
+    store = DocumentStore(directory=str(tmp_path), max_shared=1, processing_timeout=0)
+    # A session backend or an operator sharing the directory
+    session = tmp_path / ("a" * 32 + ".jsonl")
+    session.write_text('{"session_id": "x"}\n')
+    notes = tmp_path / "README.txt"
+    notes.write_text("keep me")
+    (tmp_path / ("b" * 32 + ".processing")).mkdir()
+    abandoned = tmp_path / ("c" * 32 + ".json.123.456.tmp")
+    abandoned.write_text("{")
+
+    async def scenario():
+        for i in range(3):
+            await store.ingest(f"Document number {i}.").wait_ready()
+            await asyncio.gather(*store._tasks)
+
+    asyncio.run(scenario())
+    assert session.exists() and notes.exists()
+    assert (tmp_path / ("b" * 32 + ".processing")).is_dir()
+    assert not abandoned.exists()
+    assert len(list(tmp_path.glob("*.json"))) == 1
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+
+import pytest
+
+from backend.llm.executor import LLMExecutor
+from backend.nlp_utils import text_analysis
+from backend.nlp_utils.executor import NLPExecutor, NLPQueueFullError
+
+
+def acquire_load_lock() -> bool:
+    acquired = text_analysis._load_lock.acquire(timeout=5)
+    if acquired:
+        text_analysis._load_lock.release()
+    return acquired
+
+
+def test_process_workers_do_not_inherit_held_locks():
+    executor = NLPExecutor(mode="process", max_workers=1)
+    try:
+        # As if the warm-up thread were loading a model when the first call arrives
+        with text_analysis._load_lock:
+            assert asyncio.run(executor.run(acquire_load_lock))
+    finally:
+        executor.shutdown()
+
+
+def test_cancelled_call_keeps_its_slot_until_the_worker_is_done():
+    executor = NLPExecutor(mode="thread", max_workers=1, max_queue=0)
+    started = threading.Event()
+    unblock = threading.Event()
+
+    def blocking() -> bool:
+        started.set()
+        return unblock.wait(5)
+
+    async def scenario() -> None:
+        task = asyncio.ensure_future(executor.run(blocking))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # The worker is still busy, so there is no room for another call
+        with pytest.raises(NLPQueueFullError):
+            await executor.run(int)
+        unblock.set()
+        while executor.stats()["pending"]:
+            await asyncio.sleep(0.01)
+        assert await executor.run(int) == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
+
+
+def test_cancelled_llm_call_keeps_its_slots_until_the_worker_is_done():
+    executor = LLMExecutor(max_concurrency=4, persona_concurrency=1)
+    started = threading.Event()
+    unblock = threading.Event()
+
+    def blocking() -> bool:
+        started.set()
+        return unblock.wait(5)
+
+    async def scenario() -> None:
+        task = asyncio.ensure_future(executor.run("professor", blocking))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert executor.stats()["personas"]["professor"]["in_flight"] == 1
+
+        # The kickoff is still running, so the persona's only slot stays taken
+        second = asyncio.ensure_future(executor.run("professor", int))
+        await asyncio.sleep(0.05)
+        assert not second.done()
+        assert executor.stats()["personas"]["professor"]["waiting"] == 1
+
+        unblock.set()
+        assert await asyncio.wait_for(second, 5) == 0
+        assert executor.stats()["personas"]["professor"]["in_flight"] == 0
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        executor.shutdown()
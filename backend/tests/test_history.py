@@ -0,0 +1,50 @@
+import re
+
+import nltk
+import pytest
+
+from backend.nlp_utils.history import CompactionState, compact_history, estimate_tokens
+
+
+@pytest.fixture(autouse=True)
+def simple_tokenizer(monkeypatch):
+    # punkt data isn't needed to test how turns are folded
+    monkeypatch.setattr(nltk, "sent_tokenize", lambda text: [s for s in re.split(r"(?<=[.!?])\s+", text) if s])
+
+
+def conversation(turns):
+    return [
+        f"{'user' if i % 2 == 0 else 'ai'}: Turn {i} talks about topic {i % 5}. It adds detail number {i}."
+        for i in range(turns)
+    ]
+
+
+def test_short_history_is_kept_verbatim():
+    lines = conversation(4)
+    text, state = compact_history(lines, token_budget=1000)
+    assert text == "\n".join(lines)
+    assert state == CompactionState()
+
+
+def test_long_history_fits_the_budget_and_keeps_recent_turns():
+    lines = conversation(40)
+    text, state = compact_history(lines, token_budget=200, keep_turns=4)
+    assert estimate_tokens(text) <= 200
+    assert text.startswith("Summary of earlier conversation: ")
+    assert text.endswith("\n".join(lines[-2:]))
+    assert state.folded > 0 and state.summary
+
+
+def test_incremental_compaction_matches_a_full_one():
+    lines = conversation(40)
+    _, state = compact_history(lines[:24], token_budget=200, keep_turns=4)
+    incremental, _ = compact_history(lines[state.folded:], state, token_budget=200, keep_turns=4)
+    full, _ = compact_history(lines, token_budget=200, keep_turns=4)
+    assert incremental == full
+
+
+def test_oversized_message_keeps_its_end():
+    lines = ["user: " + "word " * 2000 + "final question?"]
+    text, _ = compact_history(lines, token_budget=100)
+    assert len(text) <= 400
+    assert text.endswith("final question?")
@@ -0,0 +1,60 @@
+import re
+
+from backend.nlp_utils.intent_matcher import IntentMatcher
+from backend.nlp_utils.text_analysis import INTENT_KEYWORDS
+
+# Messages where substring and whole-word matching agree, so both must score the same
+CORPUS = [
+    "Hello there",
+    "  hello, could you help me?",
+    "...help me please",
+    "(help) I am confused",
+    "Thanks, see you later!",
+    "What do you mean by that?",
+    "\"Why\" is a good question",
+    "yes, I agree, that is correct",
+    "No. That is wrong",
+    "Good morning! Can you explain recursion?",
+    "I don't understand, please assist",
+    "-- farewell and take care",
+    "What are your thoughts on jazz?",
+    "okay sure",
+    "",
+    "!!!",
+]
+
+
+def baseline_intents(text: str) -> dict:
+    """The nested keyword loop the matcher replaced."""
+    text = text.lower()
+    intents = {}
+    for intent, keywords in INTENT_KEYWORDS.items():
+        score = 0
+        for keyword in keywords:
+            if keyword in text:
+                score += 1
+                if re.search(r'^\s*' + re.escape(keyword), text):
+                    score += 0.5
+        if score > 0:
+            intents[intent] = min(1.0, score / (len(keywords) * 0.5))
+    return intents
+
+
+def test_matches_baseline_loop():
+    matcher = IntentMatcher(INTENT_KEYWORDS)
+    for text in CORPUS:
+        assert matcher.score(text) == baseline_intents(text), text
+
+
+def test_keyword_after_leading_punctuation_is_not_leading():
+    matcher = IntentMatcher({"request": ["help", "assist", "please", "would you"]})
+    assert matcher.score("help") == {"request": 0.75}
+    assert matcher.score("   help") == {"request": 0.75}
+    assert matcher.score("...help") == {"request": 0.5}
+    assert matcher.score("(help") == {"request": 0.5}
+
+
+def test_whole_words_only():
+    matcher = IntentMatcher({"greeting": ["hi"]})
+    assert matcher.score("this") == {}
+    assert matcher.score("oh hi") == {"greeting": 1.0}
@@ -0,0 +1,74 @@
+import asyncio
+import sys
+import types
+
+import httpx
+import pytest
+
+from backend.llm.http import LLMConnectionPool
+
+
+class FakeHTTPHandler:
+    def __init__(self, timeout=None, client=None):
+        self.timeout = timeout
+        self.client = client or httpx.Client()
+
+
+class FakeAsyncHTTPHandler:
+    def __init__(self, timeout=None, event_hooks=None, concurrent_limit=1000):
+        self.timeout = timeout
+        # litellm builds its own client with default limits
+        self.client = httpx.AsyncClient()
+
+    async def close(self):
+        await self.client.aclose()
+
+
+@pytest.fixture(autouse=True)
+def fake_litellm(monkeypatch):
+    module = types.ModuleType("litellm.llms.custom_httpx.http_handler")
+    module.HTTPHandler = FakeHTTPHandler
+    module.AsyncHTTPHandler = FakeAsyncHTTPHandler
+    monkeypatch.setitem(sys.modules, "litellm.llms.custom_httpx.http_handler", module)
+
+
+def _pool_settings(client):
+    pool = client._transport._pool
+    return pool._max_connections, pool._max_keepalive_connections, pool._keepalive_expiry
+
+
+def test_both_handlers_use_the_configured_limits():
+    pool = LLMConnectionPool(max_connections=7, max_keepalive=3, keepalive_expiry=11, timeout=13)
+
+    async def handlers():
+        return pool.sync_handler(), await pool.async_handler(), await pool.async_handler()
+
+    sync_handler, async_handler, again = asyncio.run(handlers())
+    for handler in (sync_handler, async_handler):
+        assert _pool_settings(handler.client) == (7, 3, 11)
+        assert handler.client.timeout == httpx.Timeout(13)
+    assert async_handler is again
+
+
+def test_clients_are_closed():
+    pool = LLMConnectionPool()
+    created = []
+
+    class RecordingAsyncHTTPHandler(FakeAsyncHTTPHandler):
+        def __init__(self, **kwargs):
+            super().__init__(**kwargs)
+            created.append(self.client)
+
+    sys.modules["litellm.llms.custom_httpx.http_handler"].AsyncHTTPHandler = RecordingAsyncHTTPHandler
+
+    async def scenario():
+        handler = await pool.async_handler()
+        # The client litellm built is replaced, not leaked
+        assert created[0].is_closed
+        assert not handler.client.is_closed
+        await pool.aclose()
+        return handler
+
+    handler = asyncio.run(scenario())
+    assert handler.client.is_closed
+    assert pool.client.is_closed
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from backend.nlp_utils.metrics import STAGE_CANCELLED, STAGE_ERRORS, stage
+
+
+def count(counter, *labels):
+    return counter._values.get(labels, 0.0)
+
+
+def test_cancelled_stage_is_not_an_error():
+    async def disconnected():
+        with stage("llm", "test-cancel"):
+            raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(disconnected())
+    assert count(STAGE_CANCELLED, "llm", "test-cancel") == 1
+    assert count(STAGE_ERRORS, "llm", "test-cancel") == 0
+
+
+def test_failed_stage_is_an_error():
+    with pytest.raises(ValueError):
+        with stage("nlp", "test-error"):
+            raise ValueError("model failed")
+    assert count(STAGE_ERRORS, "nlp", "test-error") == 1
+    assert count(STAGE_CANCELLED, "nlp", "test-error") == 0
+
+
+def test_route_label_is_the_route_template():
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from backend.nlp_utils.metrics import HTTP_REQUEST_SECONDS, instrument_app
+
+    app = FastAPI()
+    instrument_app(app)
+
+    @app.get("/test-items/{first}/{second}")
+    def item(first: str, second: str):
+        return {"first": first, "second": second}
+
+    with TestClient(app) as client:
+        # Parameter values that repeat each other and match literal segments
+        assert client.get("/test-items/test-items/test-items").status_code == 200
+        assert client.get("/test-missing").status_code == 404
+
+    routes = {key[1] for key in HTTP_REQUEST_SECONDS._values}
+    assert "/test-items/{first}/{second}" in routes
+    assert "unmatched" in routes
+    assert not any(route.startswith("/test-items/test-items") for route in routes)
@@ -0,0 +1,44 @@
+import asyncio
+
+from backend.nlp_utils import profiling
+
+
+async def app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"ok"})
+
+
+def response_headers(directory, headers):
+    scope = {
+        "type": "http", "method": "GET", "path": "/health", "query_string": b"",
+        "headers": [(b"x-profile", b"1")] + headers,
+        # Behind a proxy every request arrives from the proxy's allowlisted address
+        "client": ("127.0.0.1", 50000),
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(profiling.ProfilingMiddleware(app, str(directory))(scope, receive, send))
+    return dict(messages[0]["headers"])
+
+
+def test_profiling_requires_the_token_from_allowlisted_peers(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "s3cret")
+
+    assert b"x-profile-file" not in response_headers(tmp_path, [])
+    assert b"x-profile-file" not in response_headers(tmp_path, [(b"x-profile-token", b"wrong")])
+    assert not list(tmp_path.iterdir())
+
+    name = response_headers(tmp_path, [(b"x-profile-token", b"s3cret")])[b"x-profile-file"]
+    assert (tmp_path / name.decode()).exists()
+
+
+def test_profiling_is_disabled_without_a_token(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", "")
+
+    assert b"x-profile-file" not in response_headers(tmp_path, [(b"x-profile-token", b"")])
@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+from backend.llm.cache import ResponseCache
+from backend.nlp_utils.cache import MemoryBackend
+
+
+def persona(cache_responses=True, fingerprint="f1", temperature=0.3):
+    return SimpleNamespace(id="professor", fingerprint=fingerprint, temperature=temperature,
+                           llm_config={"model": "gemini/test"}, cache_responses=cache_responses)
+
+
+def test_whitespace_is_normalized_but_case_is_kept():
+    cache = ResponseCache(MemoryBackend())
+    cache.set(persona(), "Explain  the\nNaN check", "reply")
+    assert cache.get(persona(), " Explain the NaN check ") == "reply"
+    assert cache.get(persona(), "explain the nan check") is None
+
+
+def test_personas_that_did_not_opt_in_always_miss():
+    cache = ResponseCache(MemoryBackend())
+    cache.set(persona(cache_responses=False), "Hello", "reply")
+    assert cache.get(persona(cache_responses=False), "Hello") is None
+    assert cache.get(persona(), "Hello") is None
+
+
+def test_persona_settings_are_part_of_the_key():
+    cache = ResponseCache(MemoryBackend())
+    cache.set(persona(), "Hello", "reply")
+    assert cache.get(persona(fingerprint="f2"), "Hello") is None
+    assert cache.get(persona(temperature=0.4), "Hello") is None
+
+
+def test_crew_and_streamed_replies_are_cached_apart():
+    cache = ResponseCache(MemoryBackend())
+    cache.set(persona(), "Hello", "crew reply", path="crew")
+    assert cache.get(persona(), "Hello", path="stream") is None
+    cache.set(persona(), "Hello", "streamed reply", path="stream")
+    assert cache.get(persona(), "Hello", path="crew") == "crew reply"
+    assert cache.get(persona(), "Hello", path="stream") == "streamed reply"
+
+
+def test_expired_replies_miss():
+    cache = ResponseCache(MemoryBackend(ttl=0))
+    cache.set(persona(), "Hello", "reply")
+    assert cache.get(persona(), "Hello") is None
+
+
+def test_hit_ratio_per_persona():
+    cache = ResponseCache(MemoryBackend())
+    cache.set(persona(), "Hello", "reply")
+    cache.get(persona(), "Hello")
+    cache.get(persona(), "Goodbye")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+    assert stats["personas"]["professor"]["hit_ratio"] == 0.5
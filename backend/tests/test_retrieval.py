@@ -0,0 +1,38 @@
+from backend.nlp_utils.retrieval import ChunkIndex, document_context
+
+CHUNKS = [
+    "The ship sailed north through the storm.",
+    "Bread dough needs flour, water, salt and yeast.",
+    "The storm broke the mast and flooded the hold.",
+    "Knead the dough for ten minutes before proofing.",
+]
+
+
+def test_best_passages_come_first():
+    index = ChunkIndex(CHUNKS)
+    assert index.search("how do I knead dough", k=2) == [3, 1]
+    assert set(index.search("storm damage to the mast", k=2)) == {0, 2}
+    assert index.search("storm damage to the mast", k=1) == [2]
+
+
+def test_passages_are_returned_in_document_order():
+    index = ChunkIndex(CHUNKS)
+    assert index.passages("dough", k=2) == [CHUNKS[1], CHUNKS[3]]
+
+
+def test_no_shared_terms_matches_nothing():
+    index = ChunkIndex(CHUNKS)
+    assert index.search("quantum entanglement") == []
+    assert index.search("the and of") == []
+    assert ChunkIndex(["the", "and it is"]).search("anything") == []
+
+
+def test_document_context():
+    index = ChunkIndex(CHUNKS)
+    short = " ".join(CHUNKS)
+    assert document_context(short, index, "dough", "summary") == short
+    assert document_context(short, index, "dough", "summary", inline_chars=10) == "\n[...]\n".join(
+        [CHUNKS[1], CHUNKS[3]]
+    )
+    assert document_context(None, index, "quantum", "summary") == "summary"
+    assert document_context(None, None, "dough", "summary") == "summary"
@@ -0,0 +1,117 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.sessions import DiskBackend, MemoryBackend, Session, SessionNotFoundError, SessionStore
+
+
+def test_history_is_rendered_from_the_turns():
+    session = Session("s", "professor", [("user", "Hi"), ("ai", "Hello there")])
+    session.append([("user", "What is entropy?")])
+    assert session.history_text() == "user: Hi\nai: Hello there\nuser: What is entropy?"
+    assert session.history_chars == len(session.history_text())
+    assert session.history_lines(2) == ["user: What is entropy?"]
+
+
+def test_memory_backend_records_turns():
+    store = SessionStore(MemoryBackend())
+    session = store.create("professor", [("user", "Hi")])
+    store.append(session, [("ai", "Hello")])
+    assert store.get(session.session_id).turns == [("user", "Hi"), ("ai", "Hello")]
+    store.delete(session.session_id)
+    with pytest.raises(SessionNotFoundError):
+        store.get(session.session_id)
+
+
+def test_memory_backend_expires_idle_sessions():
+    store = SessionStore(MemoryBackend(ttl=60))
+    session = store.create("professor")
+    session.last_active = time.monotonic() - 61
+    with pytest.raises(SessionNotFoundError):
+        store.get(session.session_id)
+
+
+def test_disk_backend_survives_a_restart(tmp_path):
+    store = SessionStore(DiskBackend(str(tmp_path)))
+    session = store.create("professor", [("user", "Hi")])
+    store.append(session, [("ai", "Hello")])
+
+    restored = SessionStore(DiskBackend(str(tmp_path))).get(session.session_id)
+    assert restored is not session
+    assert restored.persona_id == "professor"
+    assert restored.turns == [("user", "Hi"), ("ai", "Hello")]
+    assert restored.history_chars == len(restored.history_text())
+
+
+def test_disk_backend_shared_by_two_processes(tmp_path):
+    first = SessionStore(DiskBackend(str(tmp_path)))
+    second = SessionStore(DiskBackend(str(tmp_path)))
+    session = first.create("professor", [("user", "Hi")])
+
+    first.append(first.get(session.session_id), [("ai", "Hello")])
+    second.append(second.get(session.session_id), [("user", "Question?")])
+    first.append(first.get(session.session_id), [("ai", "Answer.")])
+
+    expected = [("user", "Hi"), ("ai", "Hello"), ("user", "Question?"), ("ai", "Answer.")]
+    assert first.get(session.session_id).turns == expected
+    assert second.get(session.session_id).turns == expected
+
+    second.delete(session.session_id)
+    with pytest.raises(SessionNotFoundError):
+        first.get(session.session_id)
+
+
+def test_disk_backend_reloads_after_an_interleaved_append(tmp_path):
+    first = SessionStore(DiskBackend(str(tmp_path)))
+    second = SessionStore(DiskBackend(str(tmp_path)))
+    session = first.create("professor")
+    stale = first.get(session.session_id)
+    second.append(second.get(session.session_id), [("user", "From the second worker")])
+    # Appended without seeing the other worker's turn first
+    first.append(stale, [("user", "From the first worker")])
+    assert first.get(session.session_id).turns == [
+        ("user", "From the second worker"), ("user", "From the first worker")
+    ]
+
+
+@pytest.mark.parametrize("session_id", ["../secrets", "A" * 32, "", "0" * 31, "0" * 32 + "/x"])
+def test_malformed_ids_never_reach_the_backend(tmp_path, session_id):
+    store = SessionStore(DiskBackend(str(tmp_path)))
+    with pytest.raises(SessionNotFoundError):
+        store.get(session_id)
+    store.delete(session_id)
+
+
+def test_turns_on_one_session_are_serialized():
+    pytest.importorskip("crewai")
+    from backend.persona_agents.common import session_turn
+
+    session = Session("s", "professor")
+    order = []
+
+    async def turn(name):
+        async with session_turn(session):
+            order.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name} end")
+
+    async def scenario():
+        await asyncio.gather(turn("a"), turn("b"))
+
+    asyncio.run(scenario())
+    assert order == ["a start", "a end", "b start", "b end"]
+
+
+def test_session_is_bound_to_its_persona():
+    pytest.importorskip("crewai")
+    pytest.importorskip("litellm")
+    from fastapi.testclient import TestClient
+
+    from backend.main import app
+
+    with TestClient(app) as client:
+        session = client.post("/api/sessions", json={"persona_id": "professor"}).json()
+        response = client.post("/api/personas/chef/chat",
+                               json={"user_message": "Hi", "session_id": session["session_id"]})
+        assert response.status_code == 409
@@ -0,0 +1,184 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from backend.nlp_utils import executor
+from backend.nlp_utils.executor import NLPExecutor, run_nlp_shared
+from backend.nlp_utils.singleflight import LeaderGone, SingleFlight
+
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"intents": {"greeting": 1.0}}
+
+    async def scenario():
+        return await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert all(result == {"intents": {"greeting": 1.0}} for result in results)
+    assert flight.stats()["leaders"] == 1
+    assert flight.stats()["coalesced"] == 4
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_each_caller_gets_its_own_copy():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        return {"entities": []}
+
+    async def scenario():
+        return await asyncio.gather(flight.do("key", work), flight.do("key", work))
+
+    first, second = asyncio.run(scenario())
+    first["entities"].append("leaked")
+    assert second == {"entities": []}
+
+
+def test_exception_reaches_every_caller():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.01)
+        raise ValueError("model failed")
+
+    async def scenario():
+        return await asyncio.gather(flight.do("key", work), flight.do("key", work), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert [type(result) for result in results] == [ValueError, ValueError]
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_leader_does_not_cancel_the_work_for_followers():
+    flight = SingleFlight()
+    release = None
+
+    async def work():
+        await release.wait()
+        return "reply"
+
+    async def scenario():
+        nonlocal release
+        release = asyncio.Event()
+        leader = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        release.set()
+        return await follower
+
+    assert asyncio.run(scenario()) == "reply"
+
+
+def test_calls_after_completion_run_again():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    async def scenario():
+        return [await flight.do("key", work), await flight.do("key", work)]
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_lead_shares_an_outcome_set_by_the_caller():
+    flight = SingleFlight()
+
+    async def scenario():
+        leading = flight.lead("key")
+        shared = flight.join("key")
+        assert shared is leading
+        leading.set_result("streamed reply")
+        result = await shared
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()) == "streamed reply"
+    assert flight.join("key") is None
+
+
+def count_words(text):
+    count_words.calls += 1
+    return {"words": len(text.split())}
+
+
+def test_run_nlp_shared_coalesces_identical_calls(monkeypatch):
+    monkeypatch.setattr(executor, "_default_executor", NLPExecutor(mode="thread", max_workers=2))
+    count_words.calls = 0
+
+    async def scenario():
+        return await asyncio.gather(
+            run_nlp_shared(count_words, "one two"),
+            run_nlp_shared(count_words, "one two"),
+            run_nlp_shared(count_words, "three"),
+        )
+
+    try:
+        results = asyncio.run(scenario())
+    finally:
+        executor.shutdown_nlp_executor()
+    assert results == [{"words": 2}, {"words": 2}, {"words": 1}]
+    assert count_words.calls == 2
+    results[0]["words"] = 0
+    assert results[1] == {"words": 2}
+
+
+def test_abandoned_lead_lets_followers_take_over():
+    flight = SingleFlight()
+
+    async def scenario():
+        leading = flight.lead("key")
+        shared = flight.join("key")
+        flight.abandon("key", leading)
+        with pytest.raises(LeaderGone):
+            await shared
+        # The next caller leads a fresh call
+        assert flight.join("key") is None
+        assert flight.lead("key") is not leading
+
+    asyncio.run(scenario())
+
+
+def test_streamed_reply_survives_a_cancelled_leader():
+    pytest.importorskip("litellm")
+    from backend.llm.fake import FakeLLM
+    from backend.llm.streaming import persona_event_stream
+
+    flight = SingleFlight()
+    agent = SimpleNamespace(llm=FakeLLM(latency_ms=1, latency_sigma=0, output_tokens=20, tokens_per_second=200))
+    analysis = {"sentiment": "neutral"}
+
+    def events(**kwargs):
+        return persona_event_stream("zen", agent, "task", "answer", "hello", analysis,
+                                    flight=flight, flight_key="key", **kwargs)
+
+    async def collect(stream):
+        return [event async for event in stream]
+
+    async def scenario():
+        leader = events()
+        await leader.__anext__()
+        follower = asyncio.ensure_future(collect(events()))
+        await asyncio.sleep(0.01)
+        # The leading client disconnects mid-stream
+        await leader.aclose()
+        return await asyncio.wait_for(follower, 5)
+
+    sent = asyncio.run(scenario())
+    assert sent[-1].startswith("event: done")
+    assert not any(event.startswith("event: error") for event in sent)
@@ -0,0 +1,50 @@
+import re
+
+import nltk
+import pytest
+
+from backend.nlp_utils.summarizer import SentenceSplitter, iter_sentences
+
+
+@pytest.fixture(autouse=True)
+def simple_tokenizer(monkeypatch):
+    # punkt data isn't needed to test the buffering around the tokenizer
+    monkeypatch.setattr(nltk, "sent_tokenize", lambda text: [s for s in re.split(r"(?<=[.!?])\s+", text) if s])
+
+
+def test_held_back_sentence_keeps_its_whitespace():
+    splitter = SentenceSplitter(window_chars=10)
+    sentences = splitter.feed("One two. Three. ")
+    sentences += splitter.feed("Four.")
+    sentences += splitter.close()
+    assert sentences == ["One two.", "Three.", "Four."]
+
+
+def test_window_boundaries_do_not_change_sentences():
+    text = " ".join(f"Sentence number {i} ends here." for i in range(500))
+    expected = [f"Sentence number {i} ends here." for i in range(500)]
+    for window in (7, 64, 1000):
+        assert list(iter_sentences(text, window_chars=window)) == expected
+
+
+def test_unpunctuated_stream_is_flushed(monkeypatch):
+    tokenized = []
+    tokenize = nltk.sent_tokenize
+
+    def counting_tokenizer(text):
+        tokenized.append(len(text))
+        return tokenize(text)
+
+    monkeypatch.setattr(nltk, "sent_tokenize", counting_tokenizer)
+    text = "word " * 800_000  # 4 MB without a sentence boundary
+    splitter = SentenceSplitter(window_chars=8192, max_sentence_chars=16384)
+    sentences = []
+    for start in range(0, len(text), 65536):
+        sentences += splitter.feed(text[start:start + 65536])
+        assert len(splitter._buffer) <= splitter.max_sentence_chars
+    sentences += splitter.close()
+
+    # Every character is tokenized a bounded number of times, not once per piece
+    assert sum(tokenized) < 2 * len(text)
+    assert all(len(sentence) <= splitter.max_sentence_chars for sentence in sentences)
+    assert " ".join(sentences).split() == text.split()
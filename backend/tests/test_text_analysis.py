@@ -0,0 +1,26 @@
+import pytest
+
+from backend.nlp_utils import text_analysis
+
+
+@pytest.fixture
+def loaded_models(monkeypatch):
+    monkeypatch.setattr(text_analysis, "_model_status", dict(text_analysis._model_status))
+    monkeypatch.setattr(text_analysis, "get_nlp", lambda: object())
+    monkeypatch.setattr(text_analysis, "get_sentiment_analyzer", lambda: object())
+
+
+def test_missing_punkt_is_not_ready(loaded_models, monkeypatch):
+    monkeypatch.setattr(text_analysis, "_ensure_nltk_resource", lambda name: False)
+    with pytest.raises(LookupError):
+        text_analysis.load_models()
+    status = text_analysis.model_status()
+    assert status["state"] == "failed"
+    assert "punkt" in status["error"]
+    assert not text_analysis.models_ready()
+
+
+def test_ready_with_punkt(loaded_models, monkeypatch):
+    monkeypatch.setattr(text_analysis, "_ensure_nltk_resource", lambda name: True)
+    assert text_analysis.load_models()["state"] == "ready"
+    assert text_analysis.models_ready()
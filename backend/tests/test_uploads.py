@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from backend.uploads import MultipartFile, UploadError, UploadTooLargeError
+
+BOUNDARY = "dialogixboundary"
+
+
+class FakeRequest:
+    """The parts of a Starlette request MultipartFile uses, with the body sent in pieces."""
+
+    def __init__(self, body, chunk_size=7, content_type=f"multipart/form-data; boundary={BOUNDARY}",
+                 content_length=None):
+        self.headers = {"content-type": content_type}
+        if content_length is not None:
+            self.headers["content-length"] = str(content_length)
+        self.body = body
+        self.chunk_size = chunk_size
+        self.read = 0
+
+    async def stream(self):
+        for start in range(0, len(self.body), self.chunk_size):
+            self.read += 1
+            yield self.body[start:start + self.chunk_size]
+
+
+def form(*parts, end=True):
+    body = b""
+    for name, filename, data in parts:
+        disposition = f'form-data; name="{name}"'
+        if filename is not None:
+            disposition += f'; filename="{filename}"'
+        body += (f"--{BOUNDARY}\r\nContent-Disposition: {disposition}\r\n"
+                 f"Content-Type: text/plain\r\n\r\n").encode("utf-8") + data + b"\r\n"
+    if end:
+        body += f"--{BOUNDARY}--\r\n".encode("utf-8")
+    return body
+
+
+def read_upload(request, **kwargs):
+    async def scenario():
+        upload = await MultipartFile(request, **kwargs).start()
+        data = b"".join([chunk async for chunk in upload.chunks()])
+        return upload, data
+
+    return asyncio.run(scenario())
+
+
+def test_file_is_read_across_chunk_boundaries():
+    text = "Première ligne.\r\nSecond line with --dialogix inside.\n".encode("utf-8") * 20
+    body = form(("title", None, b"ignored"), ("file", "notes.txt", text), ("after", None, b"also ignored"))
+    upload, data = read_upload(FakeRequest(body))
+    assert data == text
+    assert upload.filename == "notes.txt"
+    assert upload.size == len(text)
+
+
+def test_file_chunks_arrive_before_the_body_ends():
+    request = FakeRequest(form(("file", "big.txt", b"x" * 1000)), chunk_size=100)
+
+    async def scenario():
+        upload = await MultipartFile(request).start()
+        chunks = upload.chunks()
+        await chunks.__anext__()
+        assert request.read < len(request.body) // request.chunk_size
+        await chunks.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_rejects_requests_without_the_file():
+    with pytest.raises(UploadError, match="No 'file' field"):
+        read_upload(FakeRequest(form(("other", "a.txt", b"text"))))
+    with pytest.raises(UploadError, match="multipart/form-data"):
+        read_upload(FakeRequest(b"{}", content_type="application/json"))
+
+
+def test_rejects_a_truncated_upload():
+    body = form(("file", "cut.txt", b"cut short"), end=False)
+    body = body[:body.index(b"cut short") + 3]
+    with pytest.raises(UploadError, match="ended before the file was complete"):
+        read_upload(FakeRequest(body))
+
+
+def test_rejects_files_over_the_limit():
+    body = form(("file", "big.txt", b"x" * 500))
+    with pytest.raises(UploadTooLargeError):
+        read_upload(FakeRequest(body), max_bytes=100)
+
+    # A declared length over the limit is refused before the body is read
+    request = FakeRequest(body, content_length=10 ** 9)
+    with pytest.raises(UploadTooLargeError):
+        read_upload(request, max_bytes=100)
+    assert request.read == 0
+
+    upload, data = read_upload(FakeRequest(body, content_length=len(body)), max_bytes=500)
+    assert len(data) == 500
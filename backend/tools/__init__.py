@@ -0,0 +1,4 @@
+# Operational tools for Dialogix
+"""
+Command-line helpers for exercising a running Dialogix server.
+"""
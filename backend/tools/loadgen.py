@@ -0,0 +1,171 @@
+"""
+Open-loop load generator for the Dialogix API.
+
+Sends persona chat and NLP analysis requests at a fixed rate and reports
+latency percentiles, throughput and error rate per endpoint. Requests are
+started on schedule whether or not earlier ones have finished, and latency is
+measured from the scheduled start, so a server that falls behind shows up as
+growing latency instead of a lower request rate.
+
+Start the server with ``LLM_BACKEND=fake`` to get repeatable numbers without
+calling the provider, then for example::
+
+    python -m backend.tools.loadgen --rps 20 --duration 30 --target mixed --persona zen
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+MESSAGES = [
+    "Hello there!",
+    "Can you help me plan a three day trip to Lisbon in May?",
+    "What is the difference between a list and a tuple in Python?",
+    "I'm feeling a bit stressed about my exams next week.",
+    "How do I make a sourdough starter from scratch?",
+    "Tell me a short story about a lighthouse keeper and a storm.",
+    "Who wrote Pride and Prejudice, and when was it published?",
+    "My code keeps throwing a KeyError when I read the config file. Any idea why?",
+]
+
+TARGETS = ("chat", "analyze", "mixed")
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted ``values``."""
+    if not values:
+        return 0.0
+    rank = max(1, int(round(pct / 100 * len(values))))
+    return values[min(rank, len(values)) - 1]
+
+
+class LoadGenerator:
+    """Fires requests at ``rps`` for ``duration`` seconds and collects their outcomes."""
+
+    def __init__(self, base_url: str, rps: float, duration: float, target: str = "chat",
+                 persona: str = "zen", unique: bool = False, timeout: float = 60,
+                 connections: int = 100):
+        if target not in TARGETS:
+            raise ValueError(f"Unknown target: {target}")
+        self.base_url = base_url.rstrip("/")
+        self.rps = rps
+        self.duration = duration
+        self.target = target
+        self.persona = persona
+        self.unique = unique
+        self.timeout = timeout
+        self.connections = connections
+        self.results: List[Tuple[str, float, Optional[int], bool]] = []
+
+    def request_for(self, i: int) -> Tuple[str, str, Dict[str, Any]]:
+        """Endpoint name, path and JSON body of the ``i``-th request."""
+        message = MESSAGES[i % len(MESSAGES)]
+        if self.unique:
+            # Defeats the response and analysis caches so every request does the full work
+            message = f"{message} (#{i})"
+        kind = self.target
+        if kind == "mixed":
+            kind = "chat" if i % 2 == 0 else "analyze"
+        if kind == "chat":
+            return "chat", f"/api/personas/{self.persona}/chat", {"user_message": message}
+        return "analyze", "/api/nlp/analyze", {"text": message}
+
+    async def _send(self, client: httpx.AsyncClient, i: int, scheduled: float) -> None:
+        name, path, body = self.request_for(i)
+        status = None
+        try:
+            response = await client.post(path, json=body)
+            status = response.status_code
+            ok = response.is_success
+        except httpx.HTTPError:
+            ok = False
+        self.results.append((name, time.perf_counter() - scheduled, status, ok))
+
+    async def run(self) -> Dict[str, Any]:
+        limits = httpx.Limits(max_connections=self.connections, max_keepalive_connections=self.connections)
+        total = int(self.rps * self.duration)
+        async with httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=limits) as client:
+            start = time.perf_counter()
+            tasks = []
+            for i in range(total):
+                scheduled = start + i / self.rps
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.ensure_future(self._send(client, i, scheduled)))
+            await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - start
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        report = {
+            "target_rps": self.rps,
+            "elapsed_s": round(elapsed, 3),
+            "overall": self._summarize(self.results, elapsed),
+            "endpoints": {},
+        }
+        for name in sorted({result[0] for result in self.results}):
+            results = [result for result in self.results if result[0] == name]
+            report["endpoints"][name] = self._summarize(results, elapsed)
+        return report
+
+    @staticmethod
+    def _summarize(results: List[Tuple[str, float, Optional[int], bool]], elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(result[1] * 1000 for result in results if result[3])
+        errors = sum(1 for result in results if not result[3])
+        return {
+            "requests": len(results),
+            "errors": errors,
+            "error_rate": errors / len(results) if results else 0.0,
+            "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "max_ms": latencies[-1] if latencies else 0.0,
+            "status_codes": dict(Counter(str(result[2]) for result in results)),
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"target {report['target_rps']} req/s over {report['elapsed_s']}s"]
+    rows = [("overall", report["overall"])] + list(report["endpoints"].items())
+    lines.append(f"{'endpoint':<10}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}")
+    for name, stats in rows:
+        lines.append(
+            f"{name:<10}{stats['requests']:>10}{stats['error_rate']:>8.1%}{stats['throughput_rps']:>9.1f}"
+            f"{stats['p50_ms']:>9.0f}{stats['p95_ms']:>9.0f}{stats['p99_ms']:>9.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Drive the Dialogix API at a fixed request rate.")
+    parser.add_argument("--url", default="http://localhost:8000", help="server base URL")
+    parser.add_argument("--rps", type=float, default=10, help="requests started per second")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to send requests for")
+    parser.add_argument("--target", choices=TARGETS, default="chat",
+                        help="persona chat, NLP analysis, or both alternately")
+    parser.add_argument("--persona", default="zen", help="persona to chat with")
+    parser.add_argument("--unique", action="store_true", help="make every message distinct to bypass caches")
+    parser.add_argument("--timeout", type=float, default=60, help="seconds before a request counts as failed")
+    parser.add_argument("--connections", type=int, default=100, help="maximum open connections")
+    parser.add_argument("--json", metavar="PATH", help="also write the report as JSON")
+    args = parser.parse_args(argv)
+
+    generator = LoadGenerator(
+        args.url, args.rps, args.duration, args.target, args.persona,
+        unique=args.unique, timeout=args.timeout, connections=args.connections,
+    )
+    report = asyncio.run(generator.run())
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Streaming reader for multipart file uploads.
+
+Starlette's ``request.form()`` spools the whole request to a temporary file
+before the handler sees any of it. ``MultipartFile`` instead runs
+python-multipart's push parser over the request body as it arrives and hands
+out the bytes of one file field chunk by chunk, so an upload can be processed
+while it is still being received and only the chunk in hand is held in memory.
+Other form fields are ignored.
+
+What is built from the file (a document's passages and entities) still grows
+with it, so files are capped at ``DOCUMENT_UPLOAD_MAX_BYTES``. Requests whose
+``Content-Length`` already exceeds the cap are refused before any of the body
+is read.
+
+Configuration (environment variables):
+
+- ``DOCUMENT_UPLOAD_MAX_BYTES`` - largest file accepted by a streaming upload (default: 20000000)
+"""
+import os
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:
+    # python-multipart releases before 0.0.13 install the package as ``multipart``
+    from multipart.multipart import MultipartParser, parse_options_header
+
+DOCUMENT_UPLOAD_MAX_BYTES = int(os.environ.get("DOCUMENT_UPLOAD_MAX_BYTES", "20000000"))
+# Room for the multipart boundaries, part headers and other form fields
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadError(ValueError):
+    """Raised when a request is not a multipart upload with the expected file field."""
+
+
+class UploadTooLargeError(UploadError):
+    """Raised when an uploaded file is larger than the configured limit."""
+
+
+class MultipartFile:
+    """
+    The file sent in the ``field`` form field of a multipart/form-data request,
+    read as it arrives. Call ``start`` first; ``filename`` is known after it.
+    """
+
+    def __init__(self, request: Any, field: str = "file", max_bytes: int = DOCUMENT_UPLOAD_MAX_BYTES):
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise UploadError("Expected a multipart/form-data request with a boundary")
+        try:
+            length = int(request.headers.get("content-length", ""))
+        except ValueError:
+            length = None
+        if length is not None and length > max_bytes + MULTIPART_OVERHEAD_BYTES:
+            raise UploadTooLargeError(f"Uploaded file is larger than {max_bytes} bytes")
+        self.field = field
+        self.max_bytes = max_bytes
+        self.filename: Optional[str] = None
+        self.size = 0
+        self._body = request.stream().__aiter__()
+        self._parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_headers_finished": self._on_headers_finished,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+        self._headers: Dict[bytes, bytes] = {}
+        self._header_field = b""
+        self._header_value = b""
+        # Parts: before the file, inside it, after it
+        self._state = "before"
+        self._in_part = False
+        self._data: List[bytes] = []
+        self._body_done = False
+
+    def _on_part_begin(self) -> None:
+        self._headers = {}
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        self._headers[self._header_field.lower()] = self._header_value
+        self._header_field = b""
+        self._header_value = b""
+
+    def _on_headers_finished(self) -> None:
+        _, options = parse_options_header(self._headers.get(b"content-disposition", b""))
+        if self._state == "before" and options.get(b"name") == self.field.encode("latin-1"):
+            self._state = "inside"
+            self._in_part = True
+            filename = options.get(b"filename")
+            self.filename = filename.decode("utf-8", "replace") if filename else None
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._in_part:
+            self.size += end - start
+            self._data.append(data[start:end])
+
+    def _on_part_end(self) -> None:
+        if self._in_part:
+            self._in_part = False
+            self._state = "after"
+
+    async def _read(self) -> None:
+        try:
+            chunk = await self._body.__anext__()
+        except StopAsyncIteration:
+            chunk = None
+        try:
+            if chunk is None:
+                self._parser.finalize()
+                self._body_done = True
+                return
+            self._parser.write(chunk)
+        except ValueError as e:
+            # python-multipart's parse errors are ValueErrors
+            raise UploadError(f"Malformed multipart upload: {str(e)}")
+        if self.size > self.max_bytes:
+            raise UploadTooLargeError(f"Uploaded file is larger than {self.max_bytes} bytes")
+
+    async def start(self) -> "MultipartFile":
+        """Read up to the start of the file field."""
+        while self._state == "before" and not self._body_done:
+            await self._read()
+        if self._state == "before":
+            raise UploadError(f"No '{self.field}' field in the upload")
+        return self
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        """Yield the file's bytes as they arrive."""
+        while True:
+            if self._data:
+                data = b"".join(self._data)
+                self._data = []
+                yield data
+            if self._state == "after" or self._body_done:
+                if self._state == "inside":
+                    raise UploadError("The upload ended before the file was complete")
+                return
+            await self._read()
@@ -0,0 +1,44 @@
+// Minimal reader for server-sent events delivered over a fetch() POST response.
+// EventSource only supports GET, so the persona stream endpoints are read manually.
+
+export interface SSEEvent {
+  event: string;
+  data: any;
+}
+
+export async function readSSE(response: Response, onEvent: (event: SSEEvent) => void) {
+  if (!response.body) {
+    throw new Error("Response has no body to stream");
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // Events are separated by a blank line
+    let boundary = buffer.indexOf("\n\n");
+    while (boundary !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      boundary = buffer.indexOf("\n\n");
+
+      let event = "message";
+      const dataLines: string[] = [];
+      for (const line of rawEvent.split("\n")) {
+        if (line.startsWith("event:")) {
+          event = line.slice(6).trim();
+        } else if (line.startsWith("data:")) {
+          dataLines.push(line.slice(5).trim());
+        }
+      }
+      if (dataLines.length > 0) {
+        onEvent({ event, data: JSON.parse(dataLines.join("\n")) });
+      }
+    }
+  }
+}
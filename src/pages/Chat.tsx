@@ -7,6 +7,7 @@ import { Textarea } from "@/components/ui/textarea";
 import { Separator } from "@/components/ui/separator";
 import { Upload, Send, FileText, X, ChevronDown, ChevronUp, BrainCircuit } from "lucide-react";
 import ChatMessage from "@/components/ChatMessage";
+import { readSSE } from "@/lib/sse";
 
 // Interface for NLP analysis results
 interface NLPAnalysis {
@@ -40,11 +41,12 @@ const Chat = () => {
   const [isLoading, setIsLoading] = useState(false);
   const [isTyping, setIsTyping] = useState(false);
   const [uploadedFile, setUploadedFile] = useState<File | null>(null);
-  const [fileContent, setFileContent] = useState<string>("");
+  const [documentId, setDocumentId] = useState<string>("");
   const [fileName, setFileName] = useState<string>("");
   const [showDebugInfo, setShowDebugInfo] = useState(false);
   const [lastNLPAnalysis, setLastNLPAnalysis] = useState<NLPAnalysis | null>(null);
   const messagesEndRef = useRef<HTMLDivElement>(null);
+  const sessionIdRef = useRef<string | null>(null);
   const persona = personas.find(p => p.id === personaId) || personas[0];
   
   // Add welcome message when chat loads
@@ -88,9 +90,33 @@ const Chat = () => {
     }
   };
 
+  // The server keeps the conversation history, so each request only carries the new message
+  const getSessionId = async () => {
+    if (sessionIdRef.current) return sessionIdRef.current;
+    const response = await fetch("http://localhost:8000/api/sessions", {
+      method: "POST",
+      headers: {
+        "Content-Type": "application/json",
+      },
+      body: JSON.stringify({
+        persona_id: persona.id,
+        conversation_history: messages.map(msg => ({
+          sender: msg.role === "user" ? "user" : "ai",
+          message: msg.content
+        })),
+      }),
+    });
+    if (!response.ok) {
+      throw new Error(`API responded with status: ${response.status}`);
+    }
+    const session = await response.json();
+    sessionIdRef.current = session.session_id;
+    return session.session_id as string;
+  };
+
   const handleSendMessage = async (e: React.FormEvent) => {
     e.preventDefault();
-    if ((!input.trim() && !fileContent) || isLoading) return;
+    if ((!input.trim() && !documentId) || isLoading) return;
     
     // Add user message
     const userMessage: Message = {
@@ -106,74 +132,65 @@ const Chat = () => {
     setIsTyping(true);
     
     try {
-      // Prepare conversation history for API
-      const conversationHistory = messages.map(msg => ({
-        sender: msg.role === "user" ? "user" : "assistant",
-        message: msg.content
-      }));
-
-      // First, get NLP analysis of the user's message for visualization
-      // Using port 8001 for the dedicated NLP server
-      const nlpResponse = await fetch("http://localhost:8001/api/nlp/analyze", {
-        method: "POST",
-        headers: {
-          "Content-Type": "application/json",
-        },
-        body: JSON.stringify({
-          text: input || `Please analyze this file: ${fileName}`,
-          document: fileContent || undefined
-        }),
-      });
-
-      if (nlpResponse.ok) {
-        const nlpData = await nlpResponse.json();
-        setLastNLPAnalysis(nlpData);
-        
-        // Update the user message with NLP analysis
-        setMessages(prev => 
-          prev.map(msg => 
-            msg.id === userMessage.id 
-              ? { ...msg, nlpAnalysis: nlpData } 
-              : msg
-          )
-        );
-      } else {
-        console.error("Error fetching NLP analysis:", await nlpResponse.text());
-      }
+      const sessionId = await getSessionId();
 
-      // Make API call to backend for the persona response
-      // Using port 8000 for the main server with personas
-      const response = await fetch(`http://localhost:8000/api/personas/${persona.id}/chat`, {
+      // Get the NLP analysis and the streamed persona response in a single request
+      // to the main server on port 8000
+      const response = await fetch(`http://localhost:8000/api/personas/${persona.id}/chat_with_analysis/stream`, {
         method: "POST",
         headers: {
           "Content-Type": "application/json",
         },
         body: JSON.stringify({
           user_message: input || "Please analyze this file content.",
-          conversation_history: conversationHistory,
-          document_context: fileContent || undefined
+          session_id: sessionId,
+          document_id: documentId || undefined
         }),
       });
 
       if (!response.ok) {
+        if (response.status === 404) {
+          // The session expired on the server; start a new one next time
+          sessionIdRef.current = null;
+        }
         throw new Error(`API responded with status: ${response.status}`);
       }
 
-      const data = await response.json();
-      
-      // Add response from API
-      const responseMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        content: data.response,
-        role: "assistant",
-        timestamp: new Date(),
-      };
-      
-      setMessages(prev => [...prev, responseMessage]);
+      // Show the reply as soon as the first token arrives
+      const responseId = (Date.now() + 1).toString();
+      let streamedContent = "";
+      await readSSE(response, ({ event, data }) => {
+        if (event === "analysis") {
+          // The analysis arrives before the first token
+          setLastNLPAnalysis(data);
+          setMessages(prev => 
+            prev.map(msg => 
+              msg.id === userMessage.id 
+                ? { ...msg, nlpAnalysis: data } 
+                : msg
+            )
+          );
+        } else if (event === "token") {
+          if (!streamedContent) {
+            setIsTyping(false);
+            setMessages(prev => [...prev, {
+              id: responseId,
+              content: "",
+              role: "assistant",
+              timestamp: new Date(),
+            }]);
+          }
+          streamedContent += data.token;
+          const content = streamedContent;
+          setMessages(prev => prev.map(msg => msg.id === responseId ? { ...msg, content } : msg));
+        } else if (event === "error") {
+          throw new Error(data.detail);
+        }
+      });
       
       // Clear file content after sending
-      if (fileContent) {
-        setFileContent("");
+      if (documentId) {
+        setDocumentId("");
         setFileName("");
         setUploadedFile(null);
       }
@@ -202,42 +219,50 @@ const Chat = () => {
       setUploadedFile(file);
       setFileName(file.name);
       
-      // Read file content as text
-      const reader = new FileReader();
-      reader.onload = (e) => {
-        if (typeof e.target?.result === "string") {
-          setFileContent(e.target.result);
-          
-          // Add upload notification as a user message
-          const fileMessage: Message = {
-            id: Date.now().toString(),
-            content: `Uploaded file: ${file.name}`,
-            role: "user",
-            timestamp: new Date(),
-          };
-          
-          setMessages(prev => [...prev, fileMessage]);
+      // Add upload notification as a user message
+      const fileMessage: Message = {
+        id: Date.now().toString(),
+        content: `Uploaded file: ${file.name}`,
+        role: "user",
+        timestamp: new Date(),
+      };
+      
+      setMessages(prev => [...prev, fileMessage]);
+      
+      // Stream the file to the server, which processes it as it arrives
+      const uploadFile = async () => {
+        try {
+          const formData = new FormData();
+          formData.append("file", file, file.name);
+          const uploadResponse = await fetch("http://localhost:8000/api/documents/upload", {
+            method: "POST",
+            body: formData,
+          });
+          if (!uploadResponse.ok) {
+            throw new Error(`API responded with status: ${uploadResponse.status}`);
+          }
+          const uploaded = await uploadResponse.json();
+          setDocumentId(uploaded.document_id);
           
           // Automatically send file for analysis
-          handleSendFileAnalysis(file.name, e.target.result);
+          handleSendFileAnalysis(file.name, uploaded.document_id, uploaded.size);
+        } catch (error) {
+          console.error("Error uploading document:", error);
+          clearUploadedFile();
         }
       };
-      reader.readAsText(file);
+      uploadFile();
     }
   };
   
-  const handleSendFileAnalysis = async (filename: string, content: string) => {
+  const handleSendFileAnalysis = async (filename: string, uploadedDocumentId: string, contentLength: number) => {
     setIsLoading(true);
     setIsTyping(true);
     
     try {
-      // Prepare conversation history for API
-      const conversationHistory = messages.map(msg => ({
-        sender: msg.role === "user" ? "user" : "assistant",
-        message: msg.content
-      }));
+      const sessionId = await getSessionId();
 
-      // Make API call to backend with file content in document_context
+      // Make API call to backend referencing the stored document
       const response = await fetch(`http://localhost:8000/api/personas/${persona.id}/chat`, {
         method: "POST",
         headers: {
@@ -245,12 +270,16 @@ const Chat = () => {
         },
         body: JSON.stringify({
           user_message: `Please analyze this file: ${filename}`,
-          conversation_history: conversationHistory,
-          document_context: content
+          session_id: sessionId,
+          document_id: uploadedDocumentId
         }),
       });
 
       if (!response.ok) {
+        if (response.status === 404) {
+          // The session expired on the server; start a new one next time
+          sessionIdRef.current = null;
+        }
         throw new Error(`API responded with status: ${response.status}`);
       }
 
@@ -271,7 +300,7 @@ const Chat = () => {
       // Fallback to mock response if API fails
       const fallbackResponse: Message = {
         id: (Date.now() + 1).toString(),
-        content: `I've received your file "${filename}". It appears to be ${content.length} characters long, but I'm having trouble analyzing it at the moment.`,
+        content: `I've received your file "${filename}". It appears to be ${contentLength} characters long, but I'm having trouble analyzing it at the moment.`,
         role: "assistant",
         timestamp: new Date(),
       };
@@ -281,7 +310,7 @@ const Chat = () => {
       setIsLoading(false);
       setIsTyping(false);
       // Clear file content after analysis
-      setFileContent("");
+      setDocumentId("");
       setFileName("");
       setUploadedFile(null);
     }
@@ -289,7 +318,7 @@ const Chat = () => {
   
   const clearUploadedFile = () => {
     setUploadedFile(null);
-    setFileContent("");
+    setDocumentId("");
     setFileName("");
   };
 
@@ -486,7 +515,7 @@ const Chat = () => {
             <Textarea
               value={input}
               onChange={(e) => setInput(e.target.value)}
-              placeholder={fileContent ? "Add a message about the file or press Send to analyze..." : "Type your message..."}
+              placeholder={documentId ? "Add a message about the file or press Send to analyze..." : "Type your message..."}
               className="resize-none min-h-[3rem]"
               onKeyDown={(e) => {
                 if (e.key === 'Enter' && !e.shiftKey) {
@@ -511,7 +540,7 @@ const Chat = () => {
                 type="submit" 
                 size="icon" 
                 className="h-9 w-9" 
-                disabled={isLoading || (!input.trim() && !fileContent)}
+                disabled={isLoading || (!input.trim() && !documentId)}
               >
                 <Send className="h-4 w-4" />
               </Button>